@@ -0,0 +1,2 @@
+# Importing the benchmark modules registers their benchmarks.
+from benchmarks import bench_commands, bench_datastore, bench_protocol, bench_resp
@@ -0,0 +1,87 @@
+import sys
+
+import typer
+
+import benchmarks  # noqa: F401 - registers the benchmarks
+from benchmarks.runner import (
+    MIN_MEASURE_TIME,
+    REGRESSION_THRESHOLD,
+    REPEAT,
+    BENCHMARKS,
+    compare as compare_results,
+    load_results,
+    regressions,
+    run_benchmarks,
+    save_results,
+)
+
+DEFAULT_OUTPUT = "benchmark-results.json"
+
+app = typer.Typer(help="Micro-benchmarks of PyRedis hot paths.")
+
+
+@app.command("list")
+def list_benchmarks():
+    """Print the name of every benchmark."""
+    for bench in BENCHMARKS:
+        typer.echo(bench.name)
+
+
+@app.command()
+def run(
+    patterns: list[str] = typer.Argument(
+        None, help="Glob patterns of benchmarks to run, all by default"
+    ),
+    output: str = typer.Option(DEFAULT_OUTPUT, help="JSON file for the results"),
+    min_time: float = typer.Option(MIN_MEASURE_TIME, help="Seconds per timed run"),
+    repeat: int = typer.Option(REPEAT, help="Timed runs per benchmark"),
+    baseline: str = typer.Option("", help="Results to compare against afterwards"),
+    threshold: float = typer.Option(REGRESSION_THRESHOLD, help="Allowed slowdown"),
+):
+    """Run benchmarks and save their results as JSON."""
+
+    def progress(name: str, result: dict):
+        typer.echo(
+            f"{name:<48} {result['best_ns']:>12.1f} ns/op "
+            f"(median {result['median_ns']:.1f}, {result['loops']} loops)"
+        )
+
+    results = run_benchmarks(patterns, min_time, repeat, progress)
+    save_results(results, output)
+    typer.echo(f"Saved {len(results['benchmarks'])} results to {output}")
+    if baseline:
+        _report(load_results(baseline), results, threshold)
+
+
+@app.command()
+def compare(
+    baseline: str,
+    current: str = typer.Argument(DEFAULT_OUTPUT),
+    threshold: float = typer.Option(REGRESSION_THRESHOLD, help="Allowed slowdown"),
+):
+    """Compare two result files and fail if anything got slower."""
+    _report(load_results(baseline), load_results(current), threshold)
+
+
+def _report(baseline: dict, current: dict, threshold: float) -> None:
+    comparisons = compare_results(baseline, current)
+    for comparison in comparisons:
+        if comparison.change > threshold:
+            mark = "REGRESSION"
+        elif comparison.change < -threshold:
+            mark = "faster"
+        else:
+            mark = ""
+        typer.echo(
+            f"{comparison.name:<48} {comparison.baseline_ns:>12.1f} -> "
+            f"{comparison.current_ns:>12.1f} ns/op {comparison.change:>+8.1%} {mark}"
+        )
+    slower = regressions(comparisons, threshold)
+    if slower:
+        typer.echo(f"{len(slower)} of {len(comparisons)} benchmarks regressed")
+        sys.exit(1)
+    typer.echo(f"No regressions over {threshold:.0%} in {len(comparisons)} benchmarks")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,40 @@
+from benchmarks.runner import benchmark
+from pyredis.commands import handle_command
+from pyredis.datastore import DataStore
+from pyredis.persistence import NoPersistence
+from pyredis.resp_datatypes import Array, BulkString
+
+LIST_LENGTH = 100
+
+
+def _command(*args: bytes) -> Array:
+    return Array([BulkString(arg) for arg in args])
+
+
+COMMANDS = {
+    "ping": _command(b"PING"),
+    "set": _command(b"SET", b"key", b"value"),
+    "get": _command(b"GET", b"key"),
+    "incr": _command(b"INCR", b"counter"),
+    "lpush": _command(b"LPUSH", b"pushed", b"element"),
+    f"lrange_{LIST_LENGTH}": _command(b"LRANGE", b"list", b"0", b"%d" % LIST_LENGTH),
+    "set_ex": _command(b"SET", b"volatile", b"value", b"EX", b"3600"),
+    "lowercase_get": _command(b"get", b"key"),
+    "unknown": _command(b"NOSUCHCOMMAND", b"key"),
+    "wrong_arity": _command(b"GET"),
+}
+
+
+def _register(name: str, command: Array) -> None:
+    @benchmark(f"commands.handle_command/{name}")
+    def dispatch():
+        datastore = DataStore()
+        persistence = NoPersistence()
+        datastore[b"key"] = b"value"
+        for i in range(LIST_LENGTH):
+            datastore.append(b"list", b"element:%d" % i)
+        return lambda: handle_command(command, datastore, persistence)
+
+
+for _name, _command_array in COMMANDS.items():
+    _register(_name, _command_array)
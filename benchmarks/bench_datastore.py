@@ -0,0 +1,99 @@
+import itertools
+import random
+
+from benchmarks.runner import benchmark
+from pyredis.datastore import DataStore
+
+SIZES = {"1k": 1_000, "1m": 1_000_000}
+SAMPLED_KEYS = 4096
+LIST_LENGTH = 100
+TTL_SECONDS = 3600
+
+
+def _keys(size: int) -> list[bytes]:
+    return [b"key:%d" % i for i in range(size)]
+
+
+def _filled(size: int, volatile: bool = False) -> tuple[DataStore, list[bytes]]:
+    datastore = DataStore()
+    keys = _keys(size)
+    for key in keys:
+        if volatile:
+            datastore.set_with_expiry(key, b"value", TTL_SECONDS)
+        else:
+            datastore[key] = b"value"
+    return datastore, keys
+
+
+def _cycle(keys: list[bytes]):
+    # A fixed random sample, so every size pays for the same hash lookups.
+    sample = random.Random(0).sample(keys, min(SAMPLED_KEYS, len(keys)))
+    return itertools.cycle(sample).__next__
+
+
+def _register(label: str, size: int) -> None:
+    @benchmark(f"datastore.get/{label}")
+    def get():
+        datastore, keys = _filled(size)
+        next_key = _cycle(keys)
+        return lambda: datastore[next_key()]
+
+    @benchmark(f"datastore.set/{label}")
+    def set_():
+        datastore, keys = _filled(size)
+        next_key = _cycle(keys)
+
+        def operation():
+            datastore[next_key()] = b"other"
+
+        return operation
+
+    @benchmark(f"datastore.increment/{label}")
+    def increment():
+        datastore, keys = _filled(size)
+        counters = [b"counter:%d" % i for i in range(SAMPLED_KEYS)]
+        next_key = _cycle(counters)
+        return lambda: datastore.increment(next_key())
+
+    @benchmark(f"datastore.prepend/{label}")
+    def prepend():
+        datastore, keys = _filled(size)
+        lists = [b"list:%d" % i for i in range(SAMPLED_KEYS)]
+        next_key = _cycle(lists)
+        return lambda: datastore.prepend(next_key(), b"element")
+
+    @benchmark(f"datastore.range_{LIST_LENGTH}/{label}")
+    def range_():
+        datastore, keys = _filled(size)
+        for i in range(LIST_LENGTH):
+            datastore.append(b"list", b"element:%d" % i)
+        return lambda: datastore.range(b"list", 0, LIST_LENGTH - 1)
+
+    @benchmark(f"datastore.remove_expired_keys/{label}")
+    def remove_expired_keys():
+        # Nothing is due, so this is the steady cost of sampling the keyspace.
+        datastore, keys = _filled(size, volatile=True)
+        return datastore.remove_expired_keys
+
+    for policy in ("allkeys-lru", "allkeys-lfu"):
+        _register_eviction(label, size, policy)
+
+
+def _register_eviction(label: str, size: int, policy: str) -> None:
+    @benchmark(f"datastore.set_evicting_{policy}/{label}")
+    def set_evicting():
+        # The keyspace sits at maxmemory, so every new key evicts another.
+        datastore, keys = _filled(size)
+        datastore.maxmemory_policy = policy
+        datastore.maxmemory = datastore.used_memory
+        new_keys = (b"new:%d" % i for i in itertools.count())
+
+        def operation():
+            datastore[next(new_keys)] = b"value"
+            datastore.evict()
+
+        return operation
+
+
+for _label, _size in SIZES.items():
+    _register(_label, _size)
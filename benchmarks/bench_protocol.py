@@ -0,0 +1,75 @@
+from benchmarks.runner import benchmark
+from pyredis.protocol import Parser, parse
+from pyredis.resp_datatypes import Array, BulkString
+
+
+def _frame(*args: bytes) -> bytes:
+    return Array([BulkString(arg) for arg in args]).resp_encode()
+
+
+SET_FRAME = _frame(b"SET", b"key:000123", b"x" * 32)
+RPUSH_FRAME = _frame(b"RPUSH", b"list", *(b"element:%03d" % i for i in range(100)))
+
+
+@benchmark("protocol.parse/set")
+def parse_set():
+    return lambda: parse(SET_FRAME)
+
+
+@benchmark("protocol.parse/rpush_100")
+def parse_rpush_100():
+    return lambda: parse(RPUSH_FRAME)
+
+
+@benchmark("protocol.parser/set")
+def parser_set():
+    parser = Parser()
+
+    def operation():
+        parser.feed(SET_FRAME)
+        return parser.get_frame()
+
+    return operation
+
+
+@benchmark("protocol.parser/split_set")
+def parser_split_set():
+    # Cut inside the value, as when a read ends mid-frame.
+    head, tail = SET_FRAME[:30], SET_FRAME[30:]
+    parser = Parser()
+
+    def operation():
+        parser.feed(head)
+        parser.get_frame()
+        parser.feed(tail)
+        return parser.get_frame()
+
+    return operation
+
+
+@benchmark("protocol.parser/split_rpush_100")
+def parser_split_rpush_100():
+    middle = len(RPUSH_FRAME) // 2
+    head, tail = RPUSH_FRAME[:middle], RPUSH_FRAME[middle:]
+    parser = Parser()
+
+    def operation():
+        parser.feed(head)
+        parser.get_frame()
+        parser.feed(tail)
+        return parser.get_frame()
+
+    return operation
+
+
+@benchmark("protocol.parser/pipeline_100_set")
+def parser_pipeline_100_set():
+    pipeline = SET_FRAME * 100
+    parser = Parser()
+
+    def operation():
+        parser.feed(pipeline)
+        for _ in parser:
+            pass
+
+    return operation
@@ -0,0 +1,43 @@
+from benchmarks.runner import benchmark
+from pyredis.resp_datatypes import (
+    NULL_BULK_STRING,
+    OK,
+    Array,
+    BulkString,
+    Error,
+    Integer,
+    SimpleString,
+)
+
+VALUES = {
+    "simple_string_ok": OK,
+    "simple_string": SimpleString("Background saving started"),
+    "error": Error("ERR value is not an integer or out of range"),
+    "integer_shared": Integer(42),
+    "integer": Integer(1234567),
+    "bulk_string_16": BulkString(b"x" * 16),
+    "bulk_string_1k": BulkString(b"x" * 1024),
+    "bulk_string_null": NULL_BULK_STRING,
+    "array_10": Array([BulkString(b"element:%03d" % i) for i in range(10)]),
+    "array_100": Array([BulkString(b"element:%03d" % i) for i in range(100)]),
+}
+
+
+def _register(name: str, value) -> None:
+    @benchmark(f"resp.encode/{name}")
+    def encode():
+        return value.resp_encode
+
+    @benchmark(f"resp.encode_into/{name}")
+    def encode_into():
+        buffer = bytearray()
+
+        def operation():
+            value.resp_encode_into(buffer)
+            buffer.clear()
+
+        return operation
+
+
+for _name, _value in VALUES.items():
+    _register(_name, _value)
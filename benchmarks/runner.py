@@ -0,0 +1,132 @@
+import fnmatch
+import json
+import platform
+import statistics
+from dataclasses import dataclass
+from time import perf_counter_ns, time
+from typing import Callable
+
+MIN_MEASURE_TIME = 0.2
+REPEAT = 5
+REGRESSION_THRESHOLD = 0.1
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """A named hot path measured in isolation.
+
+    ``setup`` builds whatever state the benchmark needs, outside the timed
+    region, and returns the operation to time. The operation should do one
+    unit of work per call so results read as nanoseconds per operation.
+    """
+
+    name: str
+    setup: Callable[[], Callable[[], object]]
+
+
+BENCHMARKS: list[Benchmark] = []
+
+
+def benchmark(name: str):
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS.append(Benchmark(name, setup))
+        return setup
+
+    return register
+
+
+@dataclass(frozen=True)
+class Comparison:
+    name: str
+    baseline_ns: float
+    current_ns: float
+
+    @property
+    def change(self) -> float:
+        return self.current_ns / self.baseline_ns - 1
+
+
+def measure(
+    operation: Callable[[], object],
+    min_time: float = MIN_MEASURE_TIME,
+    repeat: int = REPEAT,
+) -> dict:
+    """Time operation like timeit: calibrate a loop count, then repeat it.
+
+    The loop count grows until one run takes at least ``min_time``
+    seconds. The best of the ``repeat`` runs is the figure least disturbed
+    by the rest of the machine, the median shows how noisy they were.
+    """
+    loops = 1
+    while True:
+        elapsed = _time_loops(operation, loops)
+        if elapsed >= min_time * 10**9:
+            break
+        loops *= 10 if elapsed < min_time * 10**8 else 2
+    timings = [elapsed / loops]
+    for _ in range(repeat - 1):
+        timings.append(_time_loops(operation, loops) / loops)
+    return {
+        "loops": loops,
+        "best_ns": min(timings),
+        "median_ns": statistics.median(timings),
+    }
+
+
+def run_benchmarks(
+    patterns: list[str] | None = None,
+    min_time: float = MIN_MEASURE_TIME,
+    repeat: int = REPEAT,
+    progress: Callable[[str, dict], None] | None = None,
+) -> dict:
+    """Run the registered benchmarks whose names match any of patterns."""
+    results = {}
+    for bench in BENCHMARKS:
+        if patterns and not any(fnmatch.fnmatch(bench.name, p) for p in patterns):
+            continue
+        operation = bench.setup()
+        results[bench.name] = measure(operation, min_time, repeat)
+        if progress is not None:
+            progress(bench.name, results[bench.name])
+    return {
+        "created": time(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "benchmarks": results,
+    }
+
+
+def compare(baseline: dict, current: dict) -> list[Comparison]:
+    """Pair up the benchmarks present in both result sets, by best time."""
+    comparisons = []
+    for name, result in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is not None:
+            comparisons.append(Comparison(name, base["best_ns"], result["best_ns"]))
+    return comparisons
+
+
+def regressions(
+    comparisons: list[Comparison], threshold: float = REGRESSION_THRESHOLD
+) -> list[Comparison]:
+    return [comparison for comparison in comparisons if comparison.change > threshold]
+
+
+def save_results(results: dict, filename: str) -> None:
+    with open(filename, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def load_results(filename: str) -> dict:
+    with open(filename) as file:
+        return json.load(file)
+
+
+def _time_loops(operation: Callable[[], object], loops: int) -> int:
+    iterations = range(loops)
+    started = perf_counter_ns()
+    for _ in iterations:
+        operation()
+    return perf_counter_ns() - started
@@ -1,45 +1,360 @@
 import asyncio
 import logging
+import os
+from time import perf_counter_ns
 
 import typer
 
-from pyredis.asyncserver import RedisServerProtocol
+from pyredis.asyncserver import (
+    DEFAULT_CLIENT_OUTPUT_BUFFER_LIMIT,
+    ClientOutputBufferLimit,
+    RedisServerProtocol,
+    parse_client_output_buffer_limit,
+)
+from pyredis.cluster import ClusterState, parse_addresses
+from pyredis.commands import free_memory
 from pyredis.datastore import DataStore
-from pyredis.persistence import AppendOnlyFilePersistence, restore_from_file
+from pyredis.eviction import MAXMEMORY_POLICY, parse_maxmemory_policy, parse_memory
+from pyredis.expiry import ExpiryScheduler
+from pyredis.network import (
+    LOOP_AUTO,
+    TCP_BACKLOG,
+    SocketOptions,
+    create_listening_socket,
+    install_event_loop,
+)
+from pyredis.persistence import (
+    APPENDFSYNC_EVERYSEC,
+    APPENDFSYNC_POLICIES,
+    AUTO_AOF_REWRITE_MIN_SIZE,
+    AUTO_AOF_REWRITE_PERCENTAGE,
+    AppendOnlyFilePersistence,
+    RedisPersistence,
+)
+from pyredis.replication import REPL_BACKLOG_SIZE, ReplicationPersistence
+from pyredis.slots import SlotIndex
+from pyredis.snapshot import (
+    DEFAULT_SAVE_RULES,
+    SnapshotPersistence,
+    parse_save_rules,
+    restore,
+)
+from pyredis.stats import (
+    LATENCY_MONITOR_THRESHOLD,
+    SLOWLOG_LOG_SLOWER_THAN,
+    SLOWLOG_MAX_LEN,
+    latency_monitor,
+    server_stats,
+    slow_log,
+)
+from pyredis.workers import Shard, ShardRouter, plan_shards, run_workers
 
 REDIS_DEFAULT_PORT = 6379
 REDIS_DEFAULT_HOST = "127.0.0.1"
 FILENAME = "ccdb.aof"
+SNAPSHOT_FILENAME = "ccdb.snapshot"
+PERSISTENCE_CRON_INTERVAL = 0.1
+EVICTION_CRON_INTERVAL = 0.1
+LOOP_LAG_CHECK_INTERVAL = 0.1
 logging.basicConfig(level=logging.INFO)
 
 
 async def cache_monitor(datastore: DataStore):
     while True:
+        started = perf_counter_ns()
         datastore.remove_expired_keys()
-        await asyncio.sleep(0.1)
+        latency = (perf_counter_ns() - started) // 10**6
+        latency_monitor.add_sample("expire-cycle", latency)
+        await asyncio.sleep(datastore.expire_cycle_interval)
 
 
-async def main(port=None):
+async def loop_lag_monitor(interval: float = LOOP_LAG_CHECK_INTERVAL):
+    """Measure how late the event loop wakes this task up.
+
+    Anything that blocks the loop, a command, an expire cycle or a flush,
+    delays every client by as much, and shows up here as lag.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag_ms = max(0, int((loop.time() - started - interval) * 1000))
+        server_stats.event_loop_lag_ms = lag_ms
+        latency_monitor.add_sample("event-loop-lag", lag_ms)
+
+
+async def persistence_monitor(persistence: RedisPersistence, datastore: DataStore):
+    while True:
+        persistence.cron(datastore)
+        await asyncio.sleep(PERSISTENCE_CRON_INTERVAL)
+
+
+async def eviction_monitor(datastore: DataStore, persistence: RedisPersistence):
+    """Carry on evictions that ran out of time, like Redis's eviction timer.
+
+    Every pass is bounded by maxmemory-eviction-tenacity, so clients are
+    served between passes while memory is brought back under maxmemory.
+    """
+    while True:
+        if datastore.eviction_pending:
+            free_memory(datastore, persistence)
+            await asyncio.sleep(0)
+        else:
+            await asyncio.sleep(EVICTION_CRON_INTERVAL)
+
+
+async def main(
+    port=None,
+    expiry_scheduler=False,
+    appendfsync=APPENDFSYNC_EVERYSEC,
+    auto_aof_rewrite_percentage: int = AUTO_AOF_REWRITE_PERCENTAGE,
+    auto_aof_rewrite_min_size: int = AUTO_AOF_REWRITE_MIN_SIZE,
+    save_rules=DEFAULT_SAVE_RULES,
+    client_output_buffer_limit: ClientOutputBufferLimit = (
+        DEFAULT_CLIENT_OUTPUT_BUFFER_LIMIT
+    ),
+    socket_options: SocketOptions = SocketOptions(),
+    shard: Shard | None = None,
+    router: ShardRouter | None = None,
+    cluster: ClusterState | None = None,
+    replicaof: tuple[str, int] | None = None,
+    repl_backlog_size: int = REPL_BACKLOG_SIZE,
+    maxmemory: int = 0,
+    maxmemory_policy: str = MAXMEMORY_POLICY,
+    directory: str | None = None,
+    ready: asyncio.Future | None = None,
+):
+    """Serve until cancelled.
+
+    AOF and snapshot files go to ``directory``, the working directory by
+    default. With port 0 the OS picks a free port, which ``ready`` is
+    resolved with once the server is listening. ``maxmemory`` bounds the
+    keyspace of this process, of each worker with several.
+    """
     if port is None:
         port = REDIS_DEFAULT_PORT
     else:
         port = int(port)
 
-    logging.getLogger(__name__).info(f"Starting PyRedis on port {port}")
+    logger = logging.getLogger(__name__)
+    logger.info(f"Starting PyRedis on port {port}")
 
-    datastore = DataStore()
-    persistence = AppendOnlyFilePersistence(filename=FILENAME)
-    restore_from_file(FILENAME, datastore)
+    aof_filename = FILENAME
+    snapshot_filename = SNAPSHOT_FILENAME
+    if shard is not None:
+        aof_filename = shard.aof_filename
+        snapshot_filename = shard.snapshot_filename
+    elif cluster is not None or replicaof is not None:
+        # Local cluster nodes and replicas usually share a directory, so files
+        # are per port.
+        aof_filename = f"ccdb-{port}.aof"
+        snapshot_filename = f"ccdb-{port}.snapshot"
+    if directory is not None:
+        aof_filename = os.path.join(directory, aof_filename)
+        snapshot_filename = os.path.join(directory, snapshot_filename)
+    scheduler = ExpiryScheduler() if expiry_scheduler else None
+    datastore = DataStore(
+        expiry_scheduler=scheduler,
+        maxmemory=maxmemory,
+        maxmemory_policy=maxmemory_policy,
+        slot_index=SlotIndex() if cluster is not None else None,
+    )
+    # Opening the AOF creates it, so restore has to look at the files first.
+    aof_exists = os.path.exists(aof_filename)
+    restore(datastore, aof_filename, snapshot_filename)
+    aof = AppendOnlyFilePersistence(
+        filename=aof_filename,
+        appendfsync=appendfsync,
+        auto_rewrite_percentage=auto_aof_rewrite_percentage,
+        auto_rewrite_min_size=auto_aof_rewrite_min_size,
+    )
+    persistence = ReplicationPersistence(
+        SnapshotPersistence(snapshot_filename, aof, save_rules), repl_backlog_size
+    )
+    if not aof_exists and os.path.exists(snapshot_filename):
+        # The new AOF lacks the snapshot's checkpoint, so the next start
+        # would skip the snapshot unless one is taken against this AOF.
+        persistence.save(datastore)
     loop = asyncio.get_running_loop()
-    _ = loop.create_task(cache_monitor(datastore))
+    if replicaof is not None:
+        persistence.replicaof(*replicaof, datastore)
+    monitors = [
+        loop.create_task(cache_monitor(datastore)),
+        loop.create_task(loop_lag_monitor()),
+        loop.create_task(persistence_monitor(persistence, datastore)),
+        loop.create_task(eviction_monitor(datastore, persistence)),
+    ]
 
-    server = await loop.create_server(
-        lambda: RedisServerProtocol(datastore, persistence), REDIS_DEFAULT_HOST, port
-    )
+    def protocol_factory():
+        connection_router = router if cluster is None else cluster.connection()
+        return RedisServerProtocol(
+            datastore, persistence, client_output_buffer_limit, connection_router
+        )
+
+    sock = create_listening_socket(REDIS_DEFAULT_HOST, port, socket_options)
+    server = await loop.create_server(protocol_factory, sock=sock)
+    server_stats.tcp_port = sock.getsockname()[1]
+    if ready is not None:
+        ready.set_result(server_stats.tcp_port)
+    shard_servers = []
+    if shard is not None:
+        # Other workers forward commands here; they already own the keys.
+        if os.path.exists(shard.socket_path):
+            os.remove(shard.socket_path)
+        shard_servers.append(
+            await loop.create_unix_server(
+                lambda: RedisServerProtocol(
+                    datastore, persistence, client_output_buffer_limit
+                ),
+                path=shard.socket_path,
+            )
+        )
+        shard_sock = create_listening_socket(shard.host, shard.port, socket_options)
+        shard_servers.append(
+            await loop.create_server(
+                lambda: RedisServerProtocol(
+                    datastore, persistence, client_output_buffer_limit, router
+                ),
+                sock=shard_sock,
+            )
+        )
+        logger.info(
+            f"Worker {shard.index} serving slots {shard.first_slot}-"
+            f"{shard.last_slot} on port {shard.port}"
+        )
 
     async with server:
-        await server.serve_forever()
+        try:
+            await server.serve_forever()
+        finally:
+            for shard_server in shard_servers:
+                shard_server.close()
+            if router is not None:
+                router.close()
+            # The monitors use the persistence, so they stop before it closes.
+            for monitor in monitors:
+                monitor.cancel()
+            await asyncio.gather(*monitors, return_exceptions=True)
+            persistence.close()
+
+
+def run(
+    port: int = REDIS_DEFAULT_PORT,
+    event_loop: str = typer.Option(LOOP_AUTO, help="auto, asyncio or uvloop"),
+    tcp_backlog: int = TCP_BACKLOG,
+    reuse_port: bool = False,
+    receive_buffer_size: int = typer.Option(0, help="SO_RCVBUF, 0 for default"),
+    send_buffer_size: int = typer.Option(0, help="SO_SNDBUF, 0 for default"),
+    workers: int = typer.Option(1, help="Processes sharing the keyspace by slot"),
+    redirect: bool = typer.Option(
+        False, help="Answer MOVED instead of forwarding to other workers"
+    ),
+    cluster_nodes: str = typer.Option(
+        "", help="host:port of every cluster node, including this one"
+    ),
+    replicaof: str = typer.Option("", help="host:port of a primary to replicate"),
+    repl_backlog_size: int = REPL_BACKLOG_SIZE,
+    slowlog_log_slower_than: int = typer.Option(
+        SLOWLOG_LOG_SLOWER_THAN, help="Microseconds, negative to disable"
+    ),
+    slowlog_max_len: int = SLOWLOG_MAX_LEN,
+    latency_monitor_threshold: int = typer.Option(
+        LATENCY_MONITOR_THRESHOLD, help="Milliseconds, 0 to disable"
+    ),
+    maxmemory: str = typer.Option(
+        "0", help="Keyspace size limit such as 100mb, 0 for none"
+    ),
+    maxmemory_policy: str = typer.Option(
+        MAXMEMORY_POLICY, help="Which keys to evict at maxmemory"
+    ),
+    appendfsync: str = typer.Option(
+        APPENDFSYNC_EVERYSEC, help="always, everysec or no"
+    ),
+    auto_aof_rewrite_percentage: int = typer.Option(
+        AUTO_AOF_REWRITE_PERCENTAGE,
+        help="AOF growth since the last rewrite that triggers one, 0 to disable",
+    ),
+    auto_aof_rewrite_min_size: str = typer.Option(
+        "64mb", help="Smallest AOF that is rewritten automatically"
+    ),
+    save: str = typer.Option(
+        " ".join(f"{seconds} {changes}" for seconds, changes in DEFAULT_SAVE_RULES),
+        help="Snapshot after seconds and changes pairs, empty to disable",
+    ),
+    client_output_buffer_limit: str = typer.Option(
+        "256mb 64mb 60", help="Hard limit, soft limit and soft seconds, 0 to disable"
+    ),
+    expiry_scheduler: bool = typer.Option(
+        False, help="Expire keys on a timer instead of by sampling"
+    ),
+):
+    try:
+        memory_limit = parse_memory(maxmemory)
+        maxmemory_policy = parse_maxmemory_policy(maxmemory_policy)
+        rewrite_min_size = parse_memory(auto_aof_rewrite_min_size)
+        save_rules = parse_save_rules(save)
+        output_limit = parse_client_output_buffer_limit(client_output_buffer_limit)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    if appendfsync not in APPENDFSYNC_POLICIES:
+        raise typer.BadParameter(
+            "argument(s) must be one of the following: "
+            + ", ".join(APPENDFSYNC_POLICIES)
+        )
+    server_options = dict(
+        expiry_scheduler=expiry_scheduler,
+        appendfsync=appendfsync,
+        auto_aof_rewrite_percentage=auto_aof_rewrite_percentage,
+        auto_aof_rewrite_min_size=rewrite_min_size,
+        save_rules=save_rules,
+        client_output_buffer_limit=output_limit,
+        socket_options=SocketOptions(
+            backlog=tcp_backlog,
+            reuse_port=reuse_port or workers > 1,
+            receive_buffer_size=receive_buffer_size,
+            send_buffer_size=send_buffer_size,
+        ),
+        maxmemory=memory_limit,
+        maxmemory_policy=maxmemory_policy,
+    )
+    slow_log.threshold_usec = slowlog_log_slower_than
+    slow_log.max_len = slowlog_max_len
+    latency_monitor.threshold_ms = latency_monitor_threshold
+    if workers == 1:
+        loop_name = install_event_loop(event_loop)
+        logging.getLogger(__name__).info(f"Using the {loop_name} event loop")
+        cluster = None
+        if cluster_nodes:
+            addresses = parse_addresses(cluster_nodes)
+            cluster = ClusterState.from_addresses(addresses, REDIS_DEFAULT_HOST, port)
+        primary = parse_addresses(replicaof)[0] if replicaof else None
+        asyncio.run(
+            main(
+                port=port,
+                cluster=cluster,
+                replicaof=primary,
+                repl_backlog_size=repl_backlog_size,
+                **server_options,
+            )
+        )
+        return
+
+    shards = plan_shards(workers, REDIS_DEFAULT_HOST, port, FILENAME, SNAPSHOT_FILENAME)
+
+    def serve(shard: Shard):
+        install_event_loop(event_loop)
+        router = ShardRouter(shards, shard.index, redirect)
+        asyncio.run(
+            main(
+                port=port,
+                shard=shard,
+                router=router,
+                **server_options,
+            )
+        )
+
+    run_workers(shards, serve)
 
 
 if __name__ == "__main__":
-    typer.run(asyncio.run(main(port=None)))
+    typer.run(run)
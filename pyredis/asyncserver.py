@@ -1,30 +1,316 @@
 import asyncio
 import logging
+from collections import deque
+from dataclasses import dataclass
 
-from pyredis.commands import handle_command
+from pyredis.commands import handle_command, is_command
 from pyredis.datastore import DataStore
+from pyredis.eviction import parse_memory
+from pyredis.network import set_nodelay
 from pyredis.persistence import RedisPersistence
-from pyredis.protocol import parse
+from pyredis.protocol import Parser, ProtocolError
+from pyredis.replication import ReplicaHandoff
+from pyredis.resp_datatypes import Error
+from pyredis.stats import server_stats
+
+
+@dataclass(frozen=True)
+class ClientOutputBufferLimit:
+    """Limits on the replies queued for one client, in bytes.
+
+    Like Redis's ``client-output-buffer-limit``, a client is disconnected
+    as soon as its queued output reaches ``hard_limit``, or once it has
+    stayed above ``soft_limit`` for ``soft_seconds``. A limit of 0 turns
+    that check off.
+    """
+
+    hard_limit: int = 256 * 1024 * 1024
+    soft_limit: int = 64 * 1024 * 1024
+    soft_seconds: float = 60
+
+
+DEFAULT_CLIENT_OUTPUT_BUFFER_LIMIT = ClientOutputBufferLimit()
+# Replies to pipelined commands are written out in chunks of about this
+# many bytes, or sooner when they would take the client over its hard limit.
+REPLY_CHUNK_SIZE = 64 * 1024
+
+
+def parse_client_output_buffer_limit(value: str) -> ClientOutputBufferLimit:
+    """Parse the hard limit, soft limit and soft seconds, as in "256mb 64mb 60"."""
+    parts = value.split()
+    if len(parts) != 3 or not parts[2].isdigit():
+        raise ValueError("argument must be a hard limit, a soft limit and seconds")
+    return ClientOutputBufferLimit(
+        parse_memory(parts[0]), parse_memory(parts[1]), int(parts[2])
+    )
 
 
 class RedisServerProtocol(asyncio.Protocol):
-    def __init__(self, datastore: DataStore, persistence: RedisPersistence):
+    """One client connection.
+
+    Replies go straight to the transport until it asks us to pause
+    writing. From then on they are held in the connection's own output
+    buffer and the client is no longer read from or parsed, so a client
+    that does not consume its replies cannot make us queue more of them.
+    Once the transport drains, the held replies are written, the commands
+    already received are run and reading resumes.
+
+    With a router, commands for keys another worker owns are forwarded
+    without waiting for each other. Replies after a forwarded command are
+    queued behind it, so they keep the order of requests, and the client
+    is not read from until every forwarded reply came back.
+    """
+
+    def __init__(
+        self,
+        datastore: DataStore,
+        persistence: RedisPersistence,
+        output_limit: ClientOutputBufferLimit = DEFAULT_CLIENT_OUTPUT_BUFFER_LIMIT,
+        router=None,
+    ):
         self._transport = None
-        self._buffer = bytearray()
+        self._parser = Parser()
         self._datastore = datastore
         self._persistence = persistence
+        self._output = bytearray()
+        self._output_limit = output_limit
+        self._writing_paused = False
+        self._soft_limit_timer = None
+        self._drained_callbacks = []
+        self._closing = False
+        self._router = router
+        self._queued = deque()
+        self._queued_size = 0
+        self._replication = None
+        self._client_address = ""
         self._logger = logging.getLogger(__name__)
 
     def connection_made(self, transport):
         self._transport = transport
+        set_nodelay(transport)
+        peer = transport.get_extra_info("peername")
+        if isinstance(peer, tuple):
+            self._client_address = f"{peer[0]}:{peer[1]}"
+        server_stats.connected_clients += 1
+        server_stats.total_connections_received += 1
+
+    def connection_lost(self, exc):
+        if self._replication is not None:
+            self._replication.detach(self)
+        self._closing = True
+        self._output.clear()
+        self._queued.clear()
+        self._drained_callbacks.clear()
+        self._cancel_soft_limit_timer()
+        server_stats.connected_clients -= 1
 
     def data_received(self, data: bytes):
+        # Once a replica is streaming, it sends nothing that needs a reply.
+        if self._closing or self._replication is not None:
+            return
         if not data:
             self._transport.close()
-        self._buffer.extend(data)
-        command, size = parse(self._buffer)
-        self._logger.debug(f"Command received: {command}")
-        if command:
-            self._buffer = self._buffer[size:]
-            result = handle_command(command, self._datastore, self._persistence)
-            self._transport.write(result.resp_encode())
+            return
+        server_stats.total_net_input_bytes += len(data)
+        self._parser.feed(data)
+        self._process_commands()
+
+    def _process_commands(self) -> None:
+        replies = bytearray()
+        buffered = self.output_buffer_size()
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        server_stats.current_client = self._client_address
+
+        try:
+            for command in self._parser:
+                if debug:
+                    self._logger.debug("Command received: %s", command)
+                if not is_command(command):
+                    continue
+                if self._router is None:
+                    result = handle_command(command, self._datastore, self._persistence)
+                else:
+                    result = self._router.handle(
+                        command, self._datastore, self._persistence
+                    )
+                    if isinstance(result, asyncio.Future):
+                        self._emit(replies)
+                        replies = bytearray()
+                        self._wait_for_forwarded_reply(result)
+                        continue
+                result.resp_encode_into(replies)
+                if type(result) is ReplicaHandoff:
+                    self._write(replies)
+                    self._replication = result.replication
+                    self._replication.attach(self, result.transfer)
+                    return
+                if self._over_reply_limit(len(replies), buffered):
+                    self._emit(replies)
+                    replies = bytearray()
+                    if self._closing or self._writing_paused:
+                        return
+                    buffered = self.output_buffer_size()
+        except ProtocolError as e:
+            Error(f"ERR Protocol error: {e}").resp_encode_into(replies)
+            self._emit(replies)
+            if self._queued:
+                self._queued.append(None)
+                self._transport.pause_reading()
+            else:
+                self._transport.close()
+            return
+
+        self._emit(replies)
+        if self._queued:
+            self._transport.pause_reading()
+
+    def _over_reply_limit(self, pending: int, buffered: int) -> bool:
+        """Whether replies not written yet must be written before parsing on.
+
+        The soft limit only starts a timer, which _check_output_limit does
+        once the replies are written, so it does not split them up.
+        """
+        hard_limit = self._output_limit.hard_limit
+        return pending >= REPLY_CHUNK_SIZE or 0 < hard_limit <= pending + buffered
+
+    def _emit(self, replies: bytearray) -> None:
+        """Write replies, or queue them behind forwarded commands."""
+        if not replies:
+            return
+        if not self._queued:
+            self._write(replies)
+            return
+        self._queued.append(replies)
+        self._queued_size += len(replies)
+        self._check_output_limit()
+
+    def _wait_for_forwarded_reply(self, future: asyncio.Future) -> None:
+        self._queued.append(future)
+        future.add_done_callback(self._forwarded_reply_received)
+
+    def _forwarded_reply_received(self, future: asyncio.Future) -> None:
+        if self._closing:
+            return
+        replies = bytearray()
+        queued = self._queued
+        while queued and queued[0] is not None:
+            head = queued[0]
+            if isinstance(head, asyncio.Future):
+                if not head.done():
+                    break
+                head.result().resp_encode_into(replies)
+            else:
+                replies += head
+                self._queued_size -= len(head)
+            queued.popleft()
+        if replies:
+            self._write(replies)
+        if queued and queued[0] is None:
+            # A protocol error was queued behind the forwarded commands.
+            self._transport.close()
+        elif not (queued or self._writing_paused or self._closing):
+            self._process_commands()
+            if not (queued or self._writing_paused or self._closing):
+                self._transport.resume_reading()
+
+    def pause_writing(self):
+        self._writing_paused = True
+        self._transport.pause_reading()
+
+    def resume_writing(self):
+        self._writing_paused = False
+        if self._output:
+            output, self._output = self._output, bytearray()
+            self._transport.write(output)
+        self._check_output_limit()
+        if self._writing_paused or self._closing:
+            return
+        callbacks, self._drained_callbacks = self._drained_callbacks, []
+        for callback in callbacks:
+            callback()
+        if self._queued:
+            return
+        if self._replication is None:
+            self._process_commands()
+        if not (self._writing_paused or self._closing or self._queued):
+            self._transport.resume_reading()
+
+    @property
+    def peer(self):
+        return self._transport.get_extra_info("peername")
+
+    @property
+    def writing_paused(self) -> bool:
+        return self._writing_paused
+
+    def call_when_drained(self, callback) -> None:
+        """Call callback once writing resumes after being paused."""
+        self._drained_callbacks.append(callback)
+
+    def feed_replica(self, data: bytes) -> None:
+        """Send part of the replication stream to this replica."""
+        if not self._closing:
+            self._send(data)
+
+    def close_replica(self) -> None:
+        self._transport.close()
+
+    def output_buffer_size(self) -> int:
+        """Bytes of replies not yet sent, ours plus the transport's."""
+        return (
+            len(self._output)
+            + self._queued_size
+            + self._transport.get_write_buffer_size()
+        )
+
+    def _write(self, replies: bytearray) -> None:
+        self._persistence.before_reply()
+        self._send(replies)
+
+    def _send(self, replies: bytes) -> None:
+        server_stats.total_net_output_bytes += len(replies)
+        if self._writing_paused:
+            self._output += replies
+        else:
+            self._transport.write(replies)
+        self._check_output_limit()
+
+    def _check_output_limit(self) -> None:
+        if self._closing:
+            return
+        limit = self._output_limit
+        size = self.output_buffer_size()
+
+        if limit.hard_limit and size >= limit.hard_limit:
+            self._disconnect(f"{size} bytes of output reached the hard limit")
+        elif not limit.soft_limit or size < limit.soft_limit:
+            self._cancel_soft_limit_timer()
+        elif self._soft_limit_timer is None:
+            loop = asyncio.get_running_loop()
+            self._soft_limit_timer = loop.call_later(
+                limit.soft_seconds, self._soft_limit_expired
+            )
+
+    def _soft_limit_expired(self) -> None:
+        self._soft_limit_timer = None
+        size = self.output_buffer_size()
+        if not self._closing and size >= self._output_limit.soft_limit:
+            self._disconnect(
+                f"{size} bytes of output stayed over the soft limit for "
+                f"{self._output_limit.soft_seconds} seconds"
+            )
+
+    def _cancel_soft_limit_timer(self) -> None:
+        if self._soft_limit_timer is not None:
+            self._soft_limit_timer.cancel()
+            self._soft_limit_timer = None
+
+    def _disconnect(self, reason: str) -> None:
+        self._logger.warning(
+            f"Client {self.peer} closed for overcoming of output buffer limits: {reason}"
+        )
+        self._closing = True
+        self._output.clear()
+        self._queued.clear()
+        self._cancel_soft_limit_timer()
+        self._transport.abort()
@@ -0,0 +1,269 @@
+import asyncio
+import random
+import re
+import tempfile
+from dataclasses import dataclass, field
+from time import perf_counter_ns
+from typing import Callable
+
+import typer
+
+from pyredis.protocol import Parser
+from pyredis.resp_datatypes import Array, BulkString, Error
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 6379
+DEFAULT_TESTS = "set,get,incr,lpush,lrange_100,lrange_300,lrange_500,lrange_600"
+READ_SIZE = 64 * 1024
+LIST_KEY = b"mylist"
+LRANGE_TEST = re.compile(r"lrange_(\d+)")
+
+
+@dataclass
+class BenchmarkResult:
+    """Latencies of every request of one test, in nanoseconds.
+
+    With pipelining, a request's latency runs from the moment its whole
+    pipeline was written to the moment its own reply was parsed, like
+    redis-benchmark reports it.
+    """
+
+    test: str
+    elapsed_ns: int = 0
+    latencies: list[int] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests * 10**9 / self.elapsed_ns if self.elapsed_ns else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """Latency in milliseconds below which percent of requests fell."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+        return ordered[rank] / 10**6
+
+    def summary(self) -> str:
+        return (
+            f"{self.test.upper()}: {self.throughput:.2f} requests per second, "
+            f"p50={self.percentile(50):.3f} msec, p99={self.percentile(99):.3f} "
+            f"msec, p999={self.percentile(99.9):.3f} msec"
+        )
+
+
+def command_factory(
+    test: str, keyspace: int = 0, data_size: int = 3, seed: int | None = None
+) -> Callable[[], Array]:
+    """Return a function building the next command of a test.
+
+    Like redis-benchmark's ``-r``, a keyspace spreads requests over that
+    many random keys instead of hitting a single one.
+    """
+    test = test.lower()
+    value = BulkString(b"x" * data_size)
+    rand = random.Random(seed)
+
+    def key(prefix: bytes) -> BulkString:
+        if keyspace:
+            return BulkString(b"%s:%012d" % (prefix, rand.randrange(keyspace)))
+        return BulkString(prefix + b":__rand_int__")
+
+    if test == "set":
+        name = BulkString(b"SET")
+        return lambda: Array([name, key(b"key"), value])
+    if test == "get":
+        name = BulkString(b"GET")
+        return lambda: Array([name, key(b"key")])
+    if test == "incr":
+        name = BulkString(b"INCR")
+        return lambda: Array([name, key(b"counter")])
+    if test == "lpush":
+        name = BulkString(b"LPUSH")
+        return lambda: Array([name, BulkString(LIST_KEY), value])
+    if match := LRANGE_TEST.fullmatch(test):
+        command = Array(
+            [
+                BulkString(b"LRANGE"),
+                BulkString(LIST_KEY),
+                BulkString(b"0"),
+                BulkString(b"%d" % (int(match.group(1)) - 1)),
+            ]
+        )
+        return lambda: command
+    raise ValueError(f"unknown test {test}")
+
+
+async def run_benchmark(
+    host: str,
+    port: int,
+    test: str,
+    requests: int = 100000,
+    clients: int = 50,
+    pipeline: int = 1,
+    keyspace: int = 0,
+    data_size: int = 3,
+) -> BenchmarkResult:
+    """Send requests of a test over concurrent, pipelined connections."""
+    result = BenchmarkResult(test)
+    next_command = command_factory(test, keyspace, data_size)
+    remaining = requests
+
+    async def client():
+        nonlocal remaining
+        reader, writer = await asyncio.open_connection(host, port)
+        parser = Parser()
+        try:
+            while remaining > 0:
+                batch_size = min(pipeline, remaining)
+                remaining -= batch_size
+                batch = bytearray()
+                for _ in range(batch_size):
+                    next_command().resp_encode_into(batch)
+                started = perf_counter_ns()
+                writer.write(batch)
+                received = 0
+                while received < batch_size:
+                    data = await reader.read(READ_SIZE)
+                    if not data:
+                        raise ConnectionError("server closed the connection")
+                    parser.feed(data)
+                    for reply in parser:
+                        result.latencies.append(perf_counter_ns() - started)
+                        if type(reply) is Error:
+                            result.errors += 1
+                        received += 1
+        finally:
+            writer.close()
+
+    started = perf_counter_ns()
+    await asyncio.gather(*(client() for _ in range(min(clients, requests))))
+    result.elapsed_ns = perf_counter_ns() - started
+    return result
+
+
+async def run_tests(
+    host: str,
+    port: int,
+    tests: list[str],
+    requests: int = 100000,
+    clients: int = 50,
+    pipeline: int = 1,
+    keyspace: int = 0,
+    data_size: int = 3,
+    progress: Callable[[BenchmarkResult], None] | None = None,
+) -> list[BenchmarkResult]:
+    """Run tests one after the other, filling the list LRANGE tests read."""
+    results = []
+    lrange_lengths = [
+        int(match.group(1))
+        for test in tests
+        if (match := LRANGE_TEST.fullmatch(test.lower()))
+    ]
+    for test in tests:
+        if LRANGE_TEST.fullmatch(test.lower()) and lrange_lengths:
+            await _fill_list(host, port, max(lrange_lengths), data_size)
+            lrange_lengths = []
+        result = await run_benchmark(
+            host, port, test, requests, clients, pipeline, keyspace, data_size
+        )
+        if progress is not None:
+            progress(result)
+        results.append(result)
+    return results
+
+
+async def start_server(directory: str, port: int = 0) -> tuple[int, asyncio.Task]:
+    """Run ``pyredis.__main__.main`` in this event loop, on a free port.
+
+    Cancel the returned task to stop the server.
+    """
+    from pyredis.__main__ import main
+
+    ready = asyncio.get_running_loop().create_future()
+    task = asyncio.create_task(main(port=port, directory=directory, ready=ready))
+    await asyncio.wait((ready, task), return_when=asyncio.FIRST_COMPLETED)
+    if task.done():
+        task.result()
+    return ready.result(), task
+
+
+async def stop_server(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def _fill_list(host: str, port: int, length: int, data_size: int) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    lpush = command_factory("lpush", data_size=data_size)
+    batch = bytearray()
+    for _ in range(length):
+        lpush().resp_encode_into(batch)
+    writer.write(batch)
+    parser = Parser()
+    received = 0
+    while received < length:
+        data = await reader.read(READ_SIZE)
+        if not data:
+            raise ConnectionError("server closed the connection")
+        parser.feed(data)
+        received += sum(1 for _ in parser)
+    writer.close()
+
+
+def run(
+    host: str = typer.Option(DEFAULT_HOST, "-h", "--host"),
+    port: int = typer.Option(DEFAULT_PORT, "-p", "--port"),
+    clients: int = typer.Option(50, "-c", "--clients", help="Parallel connections"),
+    requests: int = typer.Option(100000, "-n", "--requests", help="Requests per test"),
+    pipeline: int = typer.Option(1, "-P", "--pipeline", help="Requests per write"),
+    data_size: int = typer.Option(3, "-d", "--data-size", help="Value size in bytes"),
+    keyspace: int = typer.Option(
+        0, "-r", "--keyspace", help="Spread keys over this many random ones"
+    ),
+    tests: str = typer.Option(DEFAULT_TESTS, "-t", "--tests"),
+    start: bool = typer.Option(
+        False, "--start-server", help="Benchmark a server started in this process"
+    ),
+):
+    """Benchmark a PyRedis (or Redis) server, like redis-benchmark."""
+
+    def report(result: BenchmarkResult):
+        typer.echo(result.summary())
+        if result.errors:
+            typer.echo(f"  {result.errors} error replies")
+
+    async def benchmark(port: int):
+        server = None
+        with tempfile.TemporaryDirectory() as directory:
+            if start:
+                port, server = await start_server(directory)
+            try:
+                await run_tests(
+                    host,
+                    port,
+                    tests.split(","),
+                    requests,
+                    clients,
+                    pipeline,
+                    keyspace,
+                    data_size,
+                    report,
+                )
+            finally:
+                if server is not None:
+                    await stop_server(server)
+
+    asyncio.run(benchmark(port))
+
+
+if __name__ == "__main__":
+    typer.run(run)
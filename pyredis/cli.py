@@ -2,9 +2,9 @@ import typer
 import socket
 from typing_extensions import Annotated
 
-from pyredis.protocol import encode_message, parse
+from pyredis.protocol import encode_message, Parser
 from pyredis.commands import encode_command
-from pyredis.resp_datatypes import Array
+from pyredis.resp_datatypes import Array, BulkString
 
 DEFAULT_PORT = 6379
 DEFAULT_SERVER = "127.0.0.1"
@@ -17,7 +17,7 @@ def main(
 ):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client:
         client.connect((server, port))
-        buffer = bytearray()
+        parser = Parser()
 
         while True:
             command = input(f"{server}:{port}>")
@@ -28,23 +28,19 @@ def main(
             encoded_message = encode_message(encode_command(command))
             client.sendall(encoded_message)
 
-            while True:
+            data_type = None
+            while data_type is None:
                 response = client.recv(RECV_SIZE)
-                buffer.extend(response)
-
-                data_type, size = parse(buffer)
-
-                if data_type:
-                    buffer = buffer[size:]
-                    if type(data_type) is Array:
-                        for count, item in enumerate(data_type):
-                            print(f'{count + 1} "{str(item)}"')
-                    else:
-                        print(data_type)
-                    break
-                else:
-                    print("(nil)")
-                    break
+                parser.feed(response)
+                data_type = parser.get_frame()
+
+            if type(data_type) is Array:
+                for count, item in enumerate(data_type):
+                    print(f'{count + 1} "{str(item)}"')
+            elif data_type == BulkString(None):
+                print("(nil)")
+            else:
+                print(data_type)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,382 @@
+import hashlib
+from dataclasses import dataclass
+
+from pyredis.commands import command_keys, handle_command, lookup_command
+from pyredis.datastore import DataStore
+from pyredis.persistence import RedisPersistence
+from pyredis.resp_datatypes import (
+    Array,
+    BulkString,
+    Error,
+    Integer,
+    OK,
+    RedisType,
+)
+from pyredis.slots import SLOT_COUNT, key_hash_slot
+
+CROSSSLOT_ERROR = Error("CROSSSLOT Keys in request don't hash to the same slot")
+TRYAGAIN_ERROR = Error("TRYAGAIN Multiple keys request during rehashing of slot")
+
+
+@dataclass(frozen=True)
+class ClusterNode:
+    id: str
+    host: str
+    port: int
+
+    @classmethod
+    def from_address(cls, host: str, port: int) -> "ClusterNode":
+        """A node whose id is derived from its address.
+
+        There is no gossip between nodes, so deriving the id lets every
+        node name every other one without a handshake.
+        """
+        return cls(hashlib.sha1(f"{host}:{port}".encode()).hexdigest(), host, port)
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+
+class ClusterState:
+    """This node's view of the cluster: nodes, slot owners and migrations.
+
+    The view is configured rather than gossiped: every node starts from
+    the same node list with the slots split evenly in list order, and
+    CLUSTER ADDSLOTS/DELSLOTS/SETSLOT/MEET change it on the node they are
+    sent to, the way an administration tool drives a Redis Cluster.
+    """
+
+    def __init__(self, myself: ClusterNode, nodes: list[ClusterNode]):
+        self.myself = myself
+        self._nodes = {node.id: node for node in nodes}
+        self._nodes[myself.id] = myself
+        self._slot_owners: list[ClusterNode | None] = [None] * SLOT_COUNT
+        self._migrating: dict[int, ClusterNode] = {}
+        self._importing: dict[int, ClusterNode] = {}
+
+    @classmethod
+    def from_addresses(
+        cls, addresses: list[tuple[str, int]], host: str, port: int
+    ) -> "ClusterState":
+        nodes = [ClusterNode.from_address(*address) for address in addresses]
+        myself = ClusterNode.from_address(host, port)
+        if myself not in nodes:
+            raise ValueError(f"{myself.address} is not one of the cluster nodes")
+        state = cls(myself, nodes)
+        for index, node in enumerate(nodes):
+            first_slot = index * SLOT_COUNT // len(nodes)
+            last_slot = (index + 1) * SLOT_COUNT // len(nodes) - 1
+            state.assign_slots(range(first_slot, last_slot + 1), node)
+        return state
+
+    def owner(self, slot: int) -> ClusterNode | None:
+        return self._slot_owners[slot]
+
+    def migrating(self, slot: int) -> ClusterNode | None:
+        """The node this node's slot is being moved to, if any."""
+        return self._migrating.get(slot)
+
+    def importing(self, slot: int) -> ClusterNode | None:
+        """The node a slot is being moved from to this node, if any."""
+        return self._importing.get(slot)
+
+    def assign_slots(self, slots, node: ClusterNode | None) -> None:
+        for slot in slots:
+            self._slot_owners[slot] = node
+            self._migrating.pop(slot, None)
+            self._importing.pop(slot, None)
+
+    def connection(self) -> "ClusterConnection":
+        return ClusterConnection(self)
+
+    def handle_cluster(self, command_args: Array, datastore: DataStore) -> RedisType:
+        subcommand = bytes(command_args[0]).upper()
+        args = command_args[1:]
+        try:
+            match subcommand, len(args):
+                case b"MYID", 0:
+                    return BulkString(self.myself.id.encode())
+                case b"KEYSLOT", 1:
+                    return Integer(key_hash_slot(bytes(args[0])))
+                case b"SLOTS", 0:
+                    return self._slots_reply()
+                case b"SHARDS", 0:
+                    return self._shards_reply()
+                case b"NODES", 0:
+                    return BulkString(self._nodes_reply().encode())
+                case b"INFO", 0:
+                    return BulkString(self._info_reply().encode())
+                case b"MEET", 2:
+                    node = ClusterNode.from_address(str(args[0]), _integer(args[1]))
+                    self._nodes[node.id] = node
+                    return OK
+                case b"ADDSLOTS", count if count > 0:
+                    return self._add_slots([_slot(arg) for arg in args])
+                case b"ADDSLOTSRANGE", count if count > 0 and count % 2 == 0:
+                    return self._add_slots(_slot_ranges(args))
+                case b"DELSLOTS", count if count > 0:
+                    return self._delete_slots([_slot(arg) for arg in args])
+                case b"DELSLOTSRANGE", count if count > 0 and count % 2 == 0:
+                    return self._delete_slots(_slot_ranges(args))
+                case b"SETSLOT", 2 | 3:
+                    return self._set_slot(args)
+                case b"COUNTKEYSINSLOT", 1:
+                    return Integer(datastore.count_keys_in_slot(_slot(args[0])))
+                case b"GETKEYSINSLOT", 2:
+                    slot, count = _slot(args[0]), _integer(args[1])
+                    keys = datastore.keys_in_slot(slot, count)
+                    return Array([BulkString(key) for key in keys])
+        except ValueError as e:
+            return Error(f"ERR {e}")
+        return Error(
+            f"ERR unknown subcommand or wrong number of arguments for "
+            f"'{command_args[0]}'. Try CLUSTER HELP."
+        )
+
+    def _add_slots(self, slots: list[int]) -> RedisType:
+        for slot in slots:
+            if self._slot_owners[slot] is not None:
+                return Error(f"ERR Slot {slot} is already busy")
+        self.assign_slots(slots, self.myself)
+        return OK
+
+    def _delete_slots(self, slots: list[int]) -> RedisType:
+        for slot in slots:
+            if self._slot_owners[slot] is None:
+                return Error(f"ERR Slot {slot} is already unassigned")
+        self.assign_slots(slots, None)
+        return OK
+
+    def _set_slot(self, args: Array) -> RedisType:
+        slot = _slot(args[0])
+        action = bytes(args[1]).upper()
+        if action == b"STABLE" and len(args) == 2:
+            self._migrating.pop(slot, None)
+            self._importing.pop(slot, None)
+            return OK
+        if len(args) != 3 or action not in (b"NODE", b"MIGRATING", b"IMPORTING"):
+            return Error("ERR Invalid CLUSTER SETSLOT action or number of arguments")
+        node = self._nodes.get(str(args[2]))
+        if node is None:
+            return Error(f"ERR I don't know about node {args[2]}")
+
+        match action:
+            case b"NODE":
+                self.assign_slots([slot], node)
+            case b"MIGRATING":
+                if self._slot_owners[slot] != self.myself:
+                    return Error(f"ERR I'm not the owner of hash slot {slot}")
+                self._migrating[slot] = node
+            case b"IMPORTING":
+                if self._slot_owners[slot] == self.myself:
+                    return Error(f"ERR I'm already the owner of hash slot {slot}")
+                self._importing[slot] = node
+        return OK
+
+    def _slot_ranges(self) -> list[tuple[int, int, ClusterNode]]:
+        ranges = []
+        for slot, node in enumerate(self._slot_owners):
+            if node is None:
+                continue
+            if ranges and ranges[-1][2] == node and ranges[-1][1] == slot - 1:
+                ranges[-1] = (ranges[-1][0], slot, node)
+            else:
+                ranges.append((slot, slot, node))
+        return ranges
+
+    def _slots_reply(self) -> Array:
+        return Array(
+            [
+                Array(
+                    [
+                        Integer(first_slot),
+                        Integer(last_slot),
+                        Array(
+                            [
+                                BulkString(node.host.encode()),
+                                Integer(node.port),
+                                BulkString(node.id.encode()),
+                            ]
+                        ),
+                    ]
+                )
+                for first_slot, last_slot, node in self._slot_ranges()
+            ]
+        )
+
+    def _shards_reply(self) -> Array:
+        slots = {node.id: [] for node in self._nodes.values()}
+        for first_slot, last_slot, node in self._slot_ranges():
+            slots[node.id] += [Integer(first_slot), Integer(last_slot)]
+        return Array(
+            [
+                Array(
+                    [
+                        BulkString(b"slots"),
+                        Array(slots[node.id]),
+                        BulkString(b"nodes"),
+                        Array([_node_description(node)]),
+                    ]
+                )
+                for node in self._nodes.values()
+            ]
+        )
+
+    def _nodes_reply(self) -> str:
+        ranges = {node.id: [] for node in self._nodes.values()}
+        for first_slot, last_slot, node in self._slot_ranges():
+            slots = str(first_slot)
+            if last_slot != first_slot:
+                slots += f"-{last_slot}"
+            ranges[node.id].append(slots)
+        for slot, node in self._migrating.items():
+            ranges[self.myself.id].append(f"[{slot}->-{node.id}]")
+        for slot, node in self._importing.items():
+            ranges[self.myself.id].append(f"[{slot}-<-{node.id}]")
+
+        lines = []
+        for node in self._nodes.values():
+            flags = "myself,master" if node == self.myself else "master"
+            fields = [
+                node.id,
+                f"{node.address}@{node.port + 10000}",
+                flags,
+                "-",
+                "0",
+                "0",
+                "0",
+                "connected",
+                *ranges[node.id],
+            ]
+            lines.append(" ".join(fields))
+        return "".join(f"{line}\n" for line in lines)
+
+    def _info_reply(self) -> str:
+        assigned = sum(1 for node in self._slot_owners if node is not None)
+        info = {
+            "cluster_enabled": 1,
+            "cluster_state": "ok" if assigned == SLOT_COUNT else "fail",
+            "cluster_slots_assigned": assigned,
+            "cluster_slots_ok": assigned,
+            "cluster_known_nodes": len(self._nodes),
+            "cluster_size": len({node.id for node in self._slot_owners if node}),
+        }
+        return "".join(f"{name}:{value}\r\n" for name, value in info.items())
+
+
+class ClusterConnection:
+    """Routes one client's commands, remembering whether it sent ASKING.
+
+    Keys in slots this node does not own are answered with MOVED. While a
+    slot migrates away, keys already moved are answered with ASK, and the
+    importing node accepts them only right after ASKING.
+    """
+
+    def __init__(self, state: ClusterState):
+        self._state = state
+        self._asking = False
+
+    def handle(
+        self, command: Array, datastore: DataStore, persistence: RedisPersistence
+    ) -> RedisType:
+        redis_command = lookup_command(bytes(command[0]))
+        if redis_command is None or not redis_command.accepts(len(command)):
+            return handle_command(command, datastore, persistence)
+        if redis_command.name == "cluster":
+            return self._state.handle_cluster(command[1:], datastore)
+        if redis_command.name == "asking":
+            self._asking = True
+            return OK
+
+        asking = self._asking or "asking" in redis_command.flags
+        self._asking = False
+        keys = [bytes(key) for key in command_keys(redis_command, command)]
+        if keys:
+            redirect = self._redirect(keys, asking, datastore)
+            if redirect is not None:
+                return redirect
+        return handle_command(command, datastore, persistence)
+
+    def _redirect(
+        self, keys: list[bytes], asking: bool, datastore: DataStore
+    ) -> Error | None:
+        slot = key_hash_slot(keys[0])
+        for key in keys[1:]:
+            if key_hash_slot(key) != slot:
+                return CROSSSLOT_ERROR
+
+        state = self._state
+        owner = state.owner(slot)
+        if owner is None:
+            return Error("CLUSTERDOWN Hash slot not served")
+        if owner != state.myself:
+            if asking and state.importing(slot) is not None:
+                return None
+            return Error(f"MOVED {slot} {owner.address}")
+
+        target = state.migrating(slot)
+        if target is not None:
+            missing = sum(1 for key in keys if key not in datastore)
+            if missing == len(keys):
+                return Error(f"ASK {slot} {target.address}")
+            if missing:
+                return TRYAGAIN_ERROR
+        return None
+
+
+def parse_addresses(addresses: str) -> list[tuple[str, int]]:
+    """Parse ``host:port,host:port`` into address tuples."""
+    parsed = []
+    for address in addresses.split(","):
+        host, _, port = address.strip().rpartition(":")
+        parsed.append((host, int(port)))
+    return parsed
+
+
+def _node_description(node: ClusterNode) -> Array:
+    return Array(
+        [
+            BulkString(b"id"),
+            BulkString(node.id.encode()),
+            BulkString(b"port"),
+            Integer(node.port),
+            BulkString(b"ip"),
+            BulkString(node.host.encode()),
+            BulkString(b"endpoint"),
+            BulkString(node.host.encode()),
+            BulkString(b"role"),
+            BulkString(b"master"),
+            BulkString(b"replication-offset"),
+            Integer(0),
+            BulkString(b"health"),
+            BulkString(b"online"),
+        ]
+    )
+
+
+def _integer(value: BulkString) -> int:
+    try:
+        return int(bytes(value))
+    except ValueError:
+        raise ValueError("value is not an integer or out of range")
+
+
+def _slot(value: BulkString) -> int:
+    try:
+        slot = int(bytes(value))
+    except ValueError:
+        slot = -1
+    if not 0 <= slot < SLOT_COUNT:
+        raise ValueError("Invalid or out of range slot")
+    return slot
+
+
+def _slot_ranges(args: Array) -> list[int]:
+    slots = []
+    for index in range(0, len(args), 2):
+        first_slot, last_slot = _slot(args[index]), _slot(args[index + 1])
+        if first_slot > last_slot:
+            raise ValueError(f"start slot number {first_slot} is greater than end")
+        slots.extend(range(first_slot, last_slot + 1))
+    return slots
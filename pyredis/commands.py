@@ -1,105 +1,342 @@
+import fnmatch
 import logging
+import os
+import platform
+import resource
+import socket
+import struct
+import sys
+from dataclasses import dataclass, field
+from time import perf_counter_ns, time_ns
+from typing import Callable
 
 from pyredis.datastore import DataStore
-from pyredis.persistence import RedisPersistence
-from pyredis.resp_datatypes import SimpleString, BulkString, Error, Array, Integer
+from pyredis.eviction import parse_maxmemory_policy, parse_memory
+from pyredis.persistence import (
+    RedisPersistence,
+    ReplicationDisabledError,
+    RewriteInProgressError,
+    SaveInProgressError,
+)
+from pyredis.protocol import Parser, ProtocolError
+from pyredis.redislist import RedisList
+from pyredis.resp_datatypes import (
+    SimpleString,
+    BulkString,
+    Error,
+    Array,
+    Integer,
+    OK,
+    PONG,
+    NULL_BULK_STRING,
+    NULL_ARRAY,
+    RedisType,
+)
+from pyredis.snapshot import SnapshotError, dump_value, load_value
+from pyredis.stats import (
+    PERCENTILES,
+    CommandStats,
+    latency_monitor,
+    server_stats,
+    slow_log,
+)
 
 
 logger = logging.getLogger(__name__)
 
+SET = BulkString(b"SET")
+PXAT = BulkString(b"PXAT")
+PEXPIREAT = BulkString(b"PEXPIREAT")
+PERSIST = BulkString(b"PERSIST")
+MSET = BulkString(b"MSET")
+DEL = BulkString(b"DEL")
+RESTORE = BulkString(b"RESTORE")
+RESTORE_ASKING = BulkString(b"RESTORE-ASKING")
+REPLACE = BulkString(b"REPLACE")
+ABSTTL = BulkString(b"ABSTTL")
+NO_TTL = BulkString(b"0")
+MIGRATE_DEFAULT_TIMEOUT = 1000
+REDIS_VERSION = "7.2.0"
+SLOWLOG_GET_DEFAULT_COUNT = 10
+CLUSTER_DISABLED = Error("ERR This instance has cluster support disabled")
+REPLICATION_DISABLED = Error("ERR This instance has replication disabled")
+READONLY_ERROR = Error("READONLY You can't write against a read only replica.")
+OOM_ERROR = Error("OOM command not allowed when used memory > 'maxmemory'.")
+
+
+def now_ms() -> int:
+    return time_ns() // 10**6
+
+
+@dataclass(frozen=True)
+class RedisCommand:
+    """A command table entry, described the way Redis's COMMAND reports it.
+
+    ``arity`` counts the command name: a positive arity is the exact number
+    of arguments, a negative one the minimum. ``first_key``, ``last_key``
+    and ``step`` locate the key arguments, with a negative ``last_key``
+    counting from the end. Write commands are appended to the AOF once
+    they succeed, unless ``logs_itself`` is set because the handler logs a
+    rewritten form, such as an absolute deadline instead of a relative TTL.
+    ``stats`` accumulates the command's calls, time and errors for INFO.
+    """
+
+    name: str
+    handler: Callable[[Array, DataStore, RedisPersistence], RedisType]
+    arity: int
+    flags: tuple[str, ...]
+    first_key: int = 0
+    last_key: int = 0
+    step: int = 0
+    logs_itself: bool = False
+    stats: CommandStats = field(default_factory=CommandStats, compare=False, repr=False)
+
+    @property
+    def propagates(self) -> bool:
+        return "write" in self.flags and not self.logs_itself
+
+    def accepts(self, argument_count: int) -> bool:
+        if self.arity >= 0:
+            return argument_count == self.arity
+        return argument_count >= -self.arity
+
+    def info(self) -> Array:
+        return Array(
+            [
+                BulkString(self.name.encode()),
+                Integer(self.arity),
+                Array([SimpleString(flag) for flag in self.flags]),
+                Integer(self.first_key),
+                Integer(self.last_key),
+                Integer(self.step),
+            ]
+        )
+
+
+def is_command(frame: RedisType) -> bool:
+    """Check a frame sent by a client before it is run as a command.
+
+    Like Redis, an empty array is silently ignored, and anything but an
+    array of bulk strings is a protocol error.
+    """
+    if type(frame) is not Array or frame == NULL_ARRAY:
+        raise ProtocolError("expected an array of bulk strings")
+    for arg in frame:
+        if type(arg) is not BulkString or arg == NULL_BULK_STRING:
+            raise ProtocolError("expected an array of bulk strings")
+    return len(frame) > 0
+
 
 def handle_command(array: Array, datastore: DataStore, persistence: RedisPersistence):
     command, *command_args = array
-    match str(command).upper():
-        case "PING":
-            return handle_ping(command_args)
-        case "ECHO":
-            return handle_echo(command_args)
-        case "SET":
-            persistence.log_command(array)
-            return handle_set(command_args, datastore)
-        case "GET":
-            return handle_get(command_args, datastore)
-        case "EXISTS":
-            return handle_exists(command_args, datastore)
-        case "DEL":
-            persistence.log_command(array)
-            return handle_del(command_args, datastore)
-        case "INCR":
-            persistence.log_command(array)
-            return handle_incr(command_args, datastore)
-        case "DECR":
-            persistence.log_command(array)
-            return handle_decr(command_args, datastore)
-        case "LPUSH":
-            persistence.log_command(array)
-            return handle_lpush(command_args, datastore)
-        case "RPUSH":
-            persistence.log_command(array)
-            return handle_rpush(command_args, datastore)
-        case "LRANGE":
-            return handle_lrange(command_args, datastore)
-
-    return handle_unknown(command, command_args)
-
-
-def handle_ping(command_args: Array) -> SimpleString | BulkString | Error:
+    redis_command = lookup_command(bytes(command))
+    if redis_command is None:
+        return _error_reply(handle_unknown(command, command_args))
+    if not redis_command.accepts(len(array)):
+        return _rejected(
+            redis_command,
+            Error(f"ERR wrong number of arguments for '{redis_command.name}' command"),
+        )
+    if persistence.read_only and "write" in redis_command.flags:
+        return _rejected(redis_command, READONLY_ERROR)
+    # Like Redis, nothing is evicted while the AOF is being loaded.
+    if "write" in redis_command.flags and datastore.maxmemory and not datastore.loading:
+        fits = free_memory(datastore, persistence)
+        if not fits and "denyoom" in redis_command.flags:
+            return _rejected(redis_command, OOM_ERROR)
+
+    started = perf_counter_ns()
+    result = redis_command.handler(command_args, datastore, persistence)
+    duration = perf_counter_ns() - started
+    # CommandStats.record, inlined as it runs for every command.
+    stats = redis_command.stats
+    stats.duration_ns += duration
+    stats.buckets[(duration // 1000).bit_length()] += 1
+    if duration >= slow_log.threshold_ns:
+        slow_log.add(array, duration, server_stats.current_client)
+    if duration >= latency_monitor.threshold_ns:
+        event = "fast-command" if "fast" in redis_command.flags else "command"
+        latency_monitor.add_sample(event, duration // 10**6)
+    # RedisType's subclass hook makes isinstance() match any reply type.
+    if type(result) is Error:
+        stats.failed_calls += 1
+        return _error_reply(result)
+    if redis_command.propagates:
+        persistence.log_command(array)
+    return result
+
+
+def free_memory(datastore: DataStore, persistence: RedisPersistence) -> bool:
+    """Evict keys towards maxmemory, return whether a write may go ahead.
+
+    The keys a pass evicts are logged as one DEL, so the AOF and replicas
+    drop them too. A pass that runs out of time is carried on by
+    eviction_monitor, and writes are not refused meanwhile, as in Redis.
+    """
+    if datastore.used_memory <= datastore.maxmemory:
+        return True
+    started = perf_counter_ns()
+    evicted = datastore.evict()
+    if evicted:
+        persistence.log_command(Array([DEL, *(BulkString(key) for key in evicted)]))
+    latency_monitor.add_sample("eviction-cycle", (perf_counter_ns() - started) // 10**6)
+    return datastore.used_memory <= datastore.maxmemory or datastore.eviction_pending
+
+
+def _rejected(redis_command: RedisCommand, error: Error) -> Error:
+    redis_command.stats.rejected_calls += 1
+    return _error_reply(error)
+
+
+def _error_reply(error: Error) -> Error:
+    server_stats.error_reply(str(error))
+    return error
+
+
+def command_keys(redis_command: RedisCommand, array: Array) -> list[BulkString]:
+    """Return the key arguments of a command, following its key positions."""
+    if redis_command.first_key == 0:
+        return []
+    last_key = redis_command.last_key
+    if last_key < 0:
+        last_key += len(array)
+    return array[redis_command.first_key : last_key + 1 : redis_command.step]
+
+
+def lookup_command(name: bytes) -> RedisCommand | None:
+    redis_command = COMMAND_TABLE.get(name)
+    if redis_command is None:
+        redis_command = COMMAND_TABLE.get(name.lower())
+    return redis_command
+
+
+def handle_ping(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString | BulkString | Error:
     if len(command_args) == 0:
-        return SimpleString("PONG")
+        return PONG
     if len(command_args) == 1:
         return command_args[0]
     return Error("ERR wrong number of arguments for 'ping' command")
 
 
-def handle_echo(command_args: Array) -> BulkString | Error:
-    if len(command_args) == 1:
-        return command_args[0]
-    return Error("ERR wrong number of arguments for 'echo' command")
+def handle_echo(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> BulkString:
+    return command_args[0]
 
 
-def handle_set(command_args: Array, datastore) -> SimpleString | Error:
-    if len(command_args) < 2:
-        return Error("ERR wrong number of arguments for 'set' command")
-    key = str(command_args[0])
-    value = str(command_args[1])
+def handle_set(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString | Error:
+    key = bytes(command_args[0])
+    value = bytes(command_args[1])
     if len(command_args) == 2:
         datastore[key] = value
-        return SimpleString("OK")
+        persistence.log_command(Array([SET, command_args[0], command_args[1]]))
+        return OK
     if len(command_args) == 4:
-        option = str(command_args[2])
+        option = bytes(command_args[2])
         try:
-            expiry = int(str(command_args[3]))
+            expiry = int(bytes(command_args[3]))
         except ValueError:
             return Error("ERR value is not an integer or out of range")
 
         match option.upper():
-            case "EX":
-                datastore.set_with_expiry(key=key, value=value, expiry=expiry)
-                return SimpleString("OK")
-            case "PX":
-                datastore.set_with_expiry(key=key, value=value, expiry=expiry / 1000)
-                return SimpleString("OK")
+            case b"EX":
+                deadline_ms = now_ms() + expiry * 1000
+            case b"PX":
+                deadline_ms = now_ms() + expiry
+            case b"EXAT":
+                deadline_ms = expiry * 1000
+            case b"PXAT":
+                deadline_ms = expiry
+            case _:
+                return Error("ERR syntax error")
+
+        if expiry <= 0:
+            return Error("ERR invalid expire time in 'set' command")
+        datastore.set_with_deadline(key, value, deadline_ms * 10**6)
+        persistence.log_command(
+            Array(
+                [
+                    SET,
+                    command_args[0],
+                    command_args[1],
+                    PXAT,
+                    BulkString(b"%d" % deadline_ms),
+                ]
+            )
+        )
+        return OK
     return Error("ERR syntax error")
 
 
-def handle_get(command_args: Array, datastore) -> BulkString | Error:
-    if len(command_args) != 1:
-        return Error("ERR wrong number of arguments for 'get' command")
+def handle_get(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> BulkString | Error:
     try:
-        key = str(command_args[0])
+        key = bytes(command_args[0])
         value = datastore[key]
     except KeyError:
-        return BulkString(None)
-    return BulkString(value.encode())
+        return NULL_BULK_STRING
+    if isinstance(value, RedisList):
+        return Error(
+            "WRONGTYPE Operation against a key holding the wrong kind of value"
+        )
+    return BulkString(value)
+
+
+def handle_mget(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Array:
+    values = datastore.get_many([bytes(command_arg) for command_arg in command_args])
+    return Array(
+        [
+            BulkString(value) if isinstance(value, bytes) else NULL_BULK_STRING
+            for value in values
+        ]
+    )
 
 
-def handle_exists(command_args: Array, datastore) -> Integer | Error:
-    if len(command_args) < 1:
-        return Error("ERR wrong number of arguments for 'exists' command")
+def handle_mset(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString | Error:
+    items = _pairs(command_args, "mset")
+    if isinstance(items, Error):
+        return items
+    datastore.set_many(items)
+    return OK
+
+
+def handle_msetnx(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
+    items = _pairs(command_args, "msetnx")
+    if isinstance(items, Error):
+        return items
+    if not datastore.set_many_if_absent(items):
+        return Integer(0)
+    persistence.log_command(Array([MSET, *command_args]))
+    return Integer(1)
+
+
+def _pairs(command_args: Array, name: str) -> list[tuple[bytes, bytes]] | Error:
+    if len(command_args) % 2:
+        return Error(f"ERR wrong number of arguments for '{name}' command")
+    return [
+        (bytes(command_args[i]), bytes(command_args[i + 1]))
+        for i in range(0, len(command_args), 2)
+    ]
+
+
+def handle_exists(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
     count = 0
     try:
         for command_arg in command_args:
-            key = str(command_arg)
+            key = bytes(command_arg)
             if key in datastore:
                 count += 1
     except KeyError as e:
@@ -109,13 +346,13 @@ def handle_exists(command_args: Array, datastore) -> Integer | Error:
     return Integer(count)
 
 
-def handle_del(command_args: Array, datastore: DataStore) -> Integer | Error:
-    if len(command_args) < 1:
-        return Error("ERR wrong number of arguments for 'del' command")
+def handle_del(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
     count = 0
     try:
         for command_arg in command_args:
-            key = str(command_arg)
+            key = bytes(command_arg)
             del datastore[key]
             count += 1
     except KeyError as e:
@@ -123,36 +360,48 @@ def handle_del(command_args: Array, datastore: DataStore) -> Integer | Error:
     return Integer(count)
 
 
-def handle_incr(command_args: Array, datastore: DataStore) -> Integer | Error:
-    if len(command_args) != 1:
-        return Error("ERR wrong number of arguments for 'incr' command")
+def handle_incr(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
     try:
-        key = str(command_args[0])
+        key = bytes(command_args[0])
         result = datastore.increment(key)
         return Integer(result)
     except ValueError:
         return Error("ERR value is not an integer or out of range")
+    except OverflowError:
+        return Error("ERR increment or decrement would overflow")
+    except TypeError:
+        return Error(
+            "WRONGTYPE Operation against a key holding the wrong kind of value"
+        )
 
 
-def handle_decr(command_args: Array, datastore: DataStore) -> Integer | Error:
-    if len(command_args) != 1:
-        return Error("ERR wrong number of arguments for 'decr' command")
+def handle_decr(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
     try:
-        key = str(command_args[0])
+        key = bytes(command_args[0])
         result = datastore.decrement(key)
         return Integer(result)
     except ValueError:
         return Error("ERR value is not an integer or out of range")
+    except OverflowError:
+        return Error("ERR increment or decrement would overflow")
+    except TypeError:
+        return Error(
+            "WRONGTYPE Operation against a key holding the wrong kind of value"
+        )
 
 
-def handle_lpush(command_args: Array, datastore: DataStore) -> Integer | Error:
-    if len(command_args) < 2:
-        return Error("ERR wrong number of arguments for 'lpush' command")
+def handle_lpush(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
     count = 0
     try:
-        key = str(command_args[0])
+        key = bytes(command_args[0])
         for value in command_args[1:]:
-            count = datastore.prepend(key, str(value))
+            count = datastore.prepend(key, bytes(value))
     except TypeError:
         return Error(
             "WRONGTYPE Operation against a key holding the wrong kind of value"
@@ -160,14 +409,14 @@ def handle_lpush(command_args: Array, datastore: DataStore) -> Integer | Error:
     return Integer(count)
 
 
-def handle_rpush(command_args: Array, datastore: DataStore) -> Integer | Error:
-    if len(command_args) < 2:
-        return Error("ERR wrong number of arguments for 'rpush' command")
+def handle_rpush(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
     count = 0
     try:
-        key = str(command_args[0])
+        key = bytes(command_args[0])
         for value in command_args[1:]:
-            count = datastore.append(key, str(value))
+            count = datastore.append(key, bytes(value))
     except TypeError:
         return Error(
             "WRONGTYPE Operation against a key holding the wrong kind of value"
@@ -175,19 +424,796 @@ def handle_rpush(command_args: Array, datastore: DataStore) -> Integer | Error:
     return Integer(count)
 
 
-def handle_lrange(command_args: Array, datastore: DataStore) -> Array | Error:
-    if len(command_args) < 3:
-        return Error("ERR wrong number of arguments for 'lrange' command")
+def handle_lrange(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Array | Error:
     try:
-        key = str(command_args[0])
-        start = int(str(command_args[1]))
-        stop = int(str(command_args[2])) + 1
+        key = bytes(command_args[0])
+        start = int(bytes(command_args[1]))
+        stop = int(bytes(command_args[2]))
         values = datastore.range(key, start, stop)
-        return Array([BulkString(value.encode()) for value in values])
+        return Array([BulkString(value) for value in values])
+    except ValueError:
+        return Error("ERR value is not an integer or out of range")
+    except TypeError:
+        return Error(
+            "WRONGTYPE Operation against a key holding the wrong kind of value"
+        )
+
+
+def handle_lpop(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> RedisType:
+    return _handle_pop(command_args, datastore.pop_left, "lpop")
+
+
+def handle_rpop(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> RedisType:
+    return _handle_pop(command_args, datastore.pop_right, "rpop")
+
+
+def _handle_pop(command_args: Array, pop, name: str) -> RedisType:
+    if len(command_args) not in (1, 2):
+        return Error(f"ERR wrong number of arguments for '{name}' command")
+    try:
+        key = bytes(command_args[0])
+        if len(command_args) == 1:
+            values = pop(key)
+            return BulkString(values[0]) if values else NULL_BULK_STRING
+        count = int(bytes(command_args[1]))
+        if count < 0:
+            return Error("ERR value is out of range, must be positive")
+        values = pop(key, count)
+        if not values and count:
+            return Array(None)
+        return Array([BulkString(value) for value in values])
+    except ValueError:
+        return Error("ERR value is out of range, must be positive")
+    except TypeError:
+        return Error(
+            "WRONGTYPE Operation against a key holding the wrong kind of value"
+        )
+
+
+def handle_lindex(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> BulkString | Error:
+    try:
+        key = bytes(command_args[0])
+        index = int(bytes(command_args[1]))
+        return BulkString(datastore.index(key, index))
+    except ValueError:
+        return Error("ERR value is not an integer or out of range")
+    except IndexError:
+        return NULL_BULK_STRING
+    except TypeError:
+        return Error(
+            "WRONGTYPE Operation against a key holding the wrong kind of value"
+        )
+
+
+def handle_llen(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
+    try:
+        return Integer(datastore.length(bytes(command_args[0])))
+    except TypeError:
+        return Error(
+            "WRONGTYPE Operation against a key holding the wrong kind of value"
+        )
+
+
+def handle_ltrim(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString | Error:
+    try:
+        key = bytes(command_args[0])
+        start = int(bytes(command_args[1]))
+        stop = int(bytes(command_args[2]))
+        datastore.trim(key, start, stop)
+        return OK
+    except ValueError:
+        return Error("ERR value is not an integer or out of range")
+    except TypeError:
+        return Error(
+            "WRONGTYPE Operation against a key holding the wrong kind of value"
+        )
+
+
+def handle_expire(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
+    return _handle_expire(
+        command_args, datastore, persistence, lambda t: now_ms() + t * 1000
+    )
+
+
+def handle_pexpire(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
+    return _handle_expire(command_args, datastore, persistence, lambda t: now_ms() + t)
+
+
+def handle_expireat(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
+    return _handle_expire(command_args, datastore, persistence, lambda t: t * 1000)
+
+
+def handle_pexpireat(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
+    return _handle_expire(command_args, datastore, persistence, lambda t: t)
+
+
+def _handle_expire(
+    command_args: Array,
+    datastore: DataStore,
+    persistence: RedisPersistence,
+    to_deadline_ms,
+) -> Integer | Error:
+    try:
+        deadline_ms = to_deadline_ms(int(bytes(command_args[1])))
     except ValueError:
         return Error("ERR value is not an integer or out of range")
+    if not datastore.expire_at(bytes(command_args[0]), deadline_ms * 10**6):
+        return Integer(0)
+    persistence.log_command(
+        Array([PEXPIREAT, command_args[0], BulkString(b"%d" % deadline_ms)])
+    )
+    return Integer(1)
+
+
+def handle_ttl(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
+    remaining = _remaining_ms(bytes(command_args[0]), datastore)
+    if remaining < 0:
+        return Integer(remaining)
+    return Integer((remaining + 500) // 1000)
+
+
+def handle_pttl(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
+    return Integer(_remaining_ms(bytes(command_args[0]), datastore))
+
+
+def _remaining_ms(key: bytes, datastore: DataStore) -> int:
+    try:
+        deadline = datastore.deadline(key)
+    except KeyError:
+        return -2
+    if deadline is None:
+        return -1
+    return max(deadline // 10**6 - now_ms(), 0)
+
+
+def handle_persist(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Integer | Error:
+    if not datastore.persist(bytes(command_args[0])):
+        return Integer(0)
+    persistence.log_command(Array([PERSIST, command_args[0]]))
+    return Integer(1)
+
+
+def handle_info(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> BulkString:
+    sections = [bytes(arg).lower().decode() for arg in command_args] or ["default"]
+    names = []
+    for section in sections:
+        if section == "default":
+            names.extend(DEFAULT_INFO_SECTIONS)
+        elif section in ("all", "everything"):
+            names.extend(INFO_SECTIONS)
+        elif section in INFO_SECTIONS:
+            names.append(section)
+
+    lines = []
+    for name in dict.fromkeys(names):
+        title, section_info = INFO_SECTIONS[name]
+        if lines:
+            lines.append("")
+        lines.append(f"# {title}")
+        for field, value in section_info(datastore, persistence).items():
+            lines.append(f"{field}:{value}")
+    return BulkString("".join(f"{line}\r\n" for line in lines).encode())
+
+
+def _server_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    uptime = server_stats.uptime
+    return {
+        "redis_version": REDIS_VERSION,
+        "redis_mode": "standalone",
+        "os": f"{platform.system()} {platform.release()} {platform.machine()}",
+        "arch_bits": struct.calcsize("P") * 8,
+        "python_version": platform.python_version(),
+        "process_id": os.getpid(),
+        "tcp_port": server_stats.tcp_port,
+        "uptime_in_seconds": uptime,
+        "uptime_in_days": uptime // 86400,
+    }
+
+
+def _clients_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    return {"connected_clients": server_stats.connected_clients}
+
+
+def _memory_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak *= 1024
+    return {
+        "used_memory": datastore.used_memory,
+        "used_memory_rss": _resident_memory(),
+        "used_memory_peak_rss": peak,
+        "maxmemory": datastore.maxmemory,
+        "maxmemory_policy": datastore.maxmemory_policy,
+    }
+
+
+def _resident_memory() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return 0
+
+
+def _persistence_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    return {
+        "loading": int(datastore.loading),
+        "aof_enabled": 0,
+        **persistence.persistence_info(),
+    }
+
+
+def _stats_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    return {
+        "total_connections_received": server_stats.total_connections_received,
+        "total_commands_processed": sum(
+            redis_command.stats.calls for redis_command in COMMANDS
+        ),
+        "total_net_input_bytes": server_stats.total_net_input_bytes,
+        "total_net_output_bytes": server_stats.total_net_output_bytes,
+        "expired_keys": datastore.expired_keys,
+        "evicted_keys": datastore.evicted_keys,
+        "total_error_replies": server_stats.total_error_replies,
+        "event_loop_lag_ms": server_stats.event_loop_lag_ms,
+    }
+
+
+def _replication_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    return persistence.replication_info()
+
+
+def _expiry_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    return datastore.expiry_info()
+
+
+def _commandstats_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    return {
+        f"cmdstat_{name}": (
+            f"calls={stats.calls},usec={stats.usec},"
+            f"usec_per_call={stats.usec_per_call:.2f},"
+            f"rejected_calls={stats.rejected_calls},failed_calls={stats.failed_calls}"
+        )
+        for name, stats in _used_command_stats()
+    }
+
+
+def _errorstats_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    return {
+        f"errorstat_{prefix}": f"count={count}"
+        for prefix, count in sorted(server_stats.error_replies.items())
+    }
+
+
+def _latencystats_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    return {
+        f"latency_percentiles_usec_{name}": ",".join(
+            f"p{percent:g}={stats.percentile(percent)}" for percent in PERCENTILES
+        )
+        for name, stats in _used_command_stats()
+        if stats.calls
+    }
+
+
+def _used_command_stats() -> list[tuple[str, CommandStats]]:
+    return sorted(
+        (redis_command.name, redis_command.stats)
+        for redis_command in COMMANDS
+        if redis_command.stats.calls or redis_command.stats.rejected_calls
+    )
+
+
+def _keyspace_info(datastore: DataStore, persistence: RedisPersistence) -> dict:
+    if not datastore.dbsize():
+        return {}
+    info = datastore.keyspace_info()
+    return {"db0": ",".join(f"{field}={value}" for field, value in info.items())}
+
+
+INFO_SECTIONS = {
+    "server": ("Server", _server_info),
+    "clients": ("Clients", _clients_info),
+    "memory": ("Memory", _memory_info),
+    "persistence": ("Persistence", _persistence_info),
+    "stats": ("Stats", _stats_info),
+    "replication": ("Replication", _replication_info),
+    "expiry": ("Expiry", _expiry_info),
+    "commandstats": ("Commandstats", _commandstats_info),
+    "errorstats": ("Errorstats", _errorstats_info),
+    "latencystats": ("Latencystats", _latencystats_info),
+    "keyspace": ("Keyspace", _keyspace_info),
+}
+DEFAULT_INFO_SECTIONS = (
+    "server",
+    "clients",
+    "memory",
+    "persistence",
+    "stats",
+    "replication",
+    "expiry",
+    "errorstats",
+    "keyspace",
+)
+
+
+def handle_bgrewriteaof(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString | Error:
+    try:
+        persistence.rewrite_in_background(datastore)
+    except RewriteInProgressError:
+        return Error("ERR Background append only file rewriting already in progress")
+    except SaveInProgressError:
+        return SimpleString("Background append only file rewriting scheduled")
+    return SimpleString("Background append only file rewriting started")
+
+
+def handle_save(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString | Error:
+    try:
+        persistence.save(datastore)
+    except SaveInProgressError:
+        return Error("ERR Background save already in progress")
+    return OK
+
+
+def handle_bgsave(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString | Error:
+    try:
+        persistence.save_in_background(datastore)
+    except SaveInProgressError:
+        return Error("ERR Background save already in progress")
+    except RewriteInProgressError:
+        return Error(
+            "ERR Another child process is active (AOF?): can't BGSAVE right now"
+        )
+    return SimpleString("Background saving started")
+
+
+def handle_command_table(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Array | Integer | Error:
+    if not command_args:
+        return Array([redis_command.info() for redis_command in COMMANDS])
+
+    subcommand = bytes(command_args[0]).upper()
+    if subcommand == b"COUNT" and len(command_args) == 1:
+        return Integer(len(COMMANDS))
+    if subcommand == b"INFO":
+        if len(command_args) == 1:
+            return Array([redis_command.info() for redis_command in COMMANDS])
+        replies = []
+        for name in command_args[1:]:
+            redis_command = lookup_command(bytes(name))
+            if redis_command is None:
+                replies.append(Array(None))
+            else:
+                replies.append(redis_command.info())
+        return Array(replies)
+    return Error(
+        f"ERR unknown subcommand or wrong number of arguments for '{command_args[0]}'"
+    )
+
+
+def handle_dump(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> BulkString:
+    try:
+        value = datastore[bytes(command_args[0])]
     except KeyError:
-        return Array([])
+        return NULL_BULK_STRING
+    return BulkString(dump_value(value))
+
+
+def handle_restore(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString | Error:
+    key = bytes(command_args[0])
+    replace = absolute_ttl = False
+    for option in command_args[3:]:
+        match bytes(option).upper():
+            case b"REPLACE":
+                replace = True
+            case b"ABSTTL":
+                absolute_ttl = True
+            case _:
+                return Error("ERR syntax error")
+    try:
+        ttl = int(bytes(command_args[1]))
+    except ValueError:
+        return Error("ERR value is not an integer or out of range")
+    if ttl < 0:
+        return Error("ERR Invalid TTL value, must be >= 0")
+    if not replace and key in datastore:
+        return Error("BUSYKEY Target key name already exists.")
+    try:
+        value = load_value(bytes(command_args[2]))
+    except SnapshotError:
+        return Error("ERR DUMP payload version or checksum are wrong")
+
+    if ttl == 0:
+        datastore[key] = value
+        deadline_ms = NO_TTL
+    else:
+        deadline = ttl if absolute_ttl else now_ms() + ttl
+        datastore.set_with_deadline(key, value, deadline * 10**6)
+        deadline_ms = BulkString(b"%d" % deadline)
+    persistence.log_command(
+        Array([RESTORE, command_args[0], deadline_ms, command_args[2], REPLACE, ABSTTL])
+    )
+    return OK
+
+
+def handle_migrate(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString | Error:
+    """Move keys to another instance, sending them all in one pipeline.
+
+    Like Redis, this blocks the server until the target has replied to
+    every RESTORE-ASKING or the timeout expires.
+    """
+    host = str(command_args[0])
+    try:
+        port = int(bytes(command_args[1]))
+        database = int(bytes(command_args[3]))
+        timeout = int(bytes(command_args[4]))
+    except ValueError:
+        return Error("ERR value is not an integer or out of range")
+    if database != 0:
+        return Error("ERR Target database must be 0")
+
+    copy = replace = False
+    keys = [command_args[2]]
+    options = command_args[5:]
+    for position, option in enumerate(options):
+        match bytes(option).upper():
+            case b"COPY":
+                copy = True
+            case b"REPLACE":
+                replace = True
+            case b"KEYS":
+                if bytes(keys[0]):
+                    return Error(
+                        "ERR When using MIGRATE KEYS option, "
+                        "the key argument must be set to the empty string"
+                    )
+                keys = options[position + 1 :]
+                break
+            case _:
+                return Error("ERR syntax error")
+
+    request = bytearray()
+    migrated = []
+    for key in keys:
+        try:
+            value = datastore[bytes(key)]
+            deadline = datastore.deadline(bytes(key))
+        except KeyError:
+            continue
+        restore = [RESTORE_ASKING, key, NO_TTL, BulkString(dump_value(value))]
+        if deadline is not None:
+            restore[2] = BulkString(b"%d" % (deadline // 10**6))
+            restore.append(ABSTTL)
+        if replace:
+            restore.append(REPLACE)
+        Array(restore).resp_encode_into(request)
+        migrated.append(key)
+    if not migrated:
+        return SimpleString("NOKEY")
+
+    timeout = timeout or MIGRATE_DEFAULT_TIMEOUT
+    replies = _send_to_target(host, port, timeout, request, len(migrated))
+    if isinstance(replies, Error):
+        return replies
+
+    error = None
+    deleted = []
+    for key, reply in zip(migrated, replies):
+        if type(reply) is Error:
+            error = error or reply
+        elif not copy:
+            try:
+                del datastore[bytes(key)]
+            except KeyError:
+                continue
+            deleted.append(key)
+    if deleted:
+        persistence.log_command(Array([DEL, *deleted]))
+    if error is not None:
+        return Error(f"ERR Target instance replied with error: {error}")
+    return OK
+
+
+def _send_to_target(
+    host: str, port: int, timeout_ms: int, request: bytearray, expected: int
+) -> list[RedisType] | Error:
+    try:
+        connection = socket.create_connection((host, port), timeout_ms / 1000)
+    except OSError:
+        return Error("IOERR error or timeout connecting to the client")
+
+    with connection:
+        parser = Parser()
+        replies = []
+        try:
+            connection.sendall(request)
+            while len(replies) < expected:
+                data = connection.recv(65536)
+                if not data:
+                    raise ConnectionError
+                parser.feed(data)
+                replies.extend(parser)
+        except (OSError, ProtocolError):
+            return Error("IOERR error or timeout reading to target instance")
+    return replies
+
+
+def handle_replicaof(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString | Error:
+    host, port = (bytes(arg) for arg in command_args)
+    try:
+        if host.lower() == b"no" and port.lower() == b"one":
+            persistence.promote()
+            return OK
+        if not port.isdigit():
+            return Error("ERR Invalid master port")
+        persistence.replicaof(host.decode(), int(port), datastore)
+    except ReplicationDisabledError:
+        return REPLICATION_DISABLED
+    return OK
+
+
+def handle_sync(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> RedisType:
+    try:
+        return persistence.sync(datastore, None, -1)
+    except ReplicationDisabledError:
+        return REPLICATION_DISABLED
+
+
+def handle_psync(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> RedisType:
+    replication_id, offset = (bytes(arg) for arg in command_args)
+    try:
+        offset = int(offset)
+    except ValueError:
+        return Error("ERR value is not an integer or out of range")
+    try:
+        return persistence.sync(datastore, replication_id, offset)
+    except ReplicationDisabledError:
+        return REPLICATION_DISABLED
+
+
+def handle_replconf(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> SimpleString:
+    return OK
+
+
+def handle_latency(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Array | Integer | Error:
+    subcommand = bytes(command_args[0]).upper()
+    if subcommand == b"HISTOGRAM":
+        return _latency_histogram(command_args[1:])
+    if subcommand == b"LATEST" and len(command_args) == 1:
+        return Array(
+            [
+                Array(
+                    [
+                        BulkString(name.encode()),
+                        Integer(event.latest_timestamp),
+                        Integer(event.latest_ms),
+                        Integer(event.max_ms),
+                    ]
+                )
+                for name, event in latency_monitor.events.items()
+            ]
+        )
+    if subcommand == b"HISTORY" and len(command_args) == 2:
+        event = latency_monitor.events.get(str(command_args[1]))
+        history = event.history if event is not None else ()
+        return Array(
+            [
+                Array([Integer(timestamp), Integer(latency)])
+                for timestamp, latency in history
+            ]
+        )
+    if subcommand == b"RESET":
+        return Integer(latency_monitor.reset(str(name) for name in command_args[1:]))
+    return Error(
+        f"ERR unknown subcommand or wrong number of arguments for "
+        f"'{command_args[0]}'. Try LATENCY HELP."
+    )
+
+
+def _latency_histogram(names: Array) -> Array:
+    if names:
+        commands = [lookup_command(bytes(name)) for name in names]
+        commands = [command for command in commands if command is not None]
+    else:
+        commands = sorted(COMMANDS, key=lambda command: command.name)
+
+    reply = []
+    for redis_command in dict.fromkeys(commands):
+        name, stats = redis_command.name, redis_command.stats
+        if not stats.calls:
+            continue
+        histogram = []
+        for max_usec, calls in stats.histogram():
+            histogram += [Integer(max_usec), Integer(calls)]
+        reply.append(BulkString(name.encode()))
+        reply.append(
+            Array(
+                [
+                    BulkString(b"calls"),
+                    Integer(stats.calls),
+                    BulkString(b"histogram_usec"),
+                    Array(histogram),
+                ]
+            )
+        )
+    return Array(reply)
+
+
+def handle_slowlog(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Array | Integer | SimpleString | Error:
+    subcommand = bytes(command_args[0]).upper()
+    if subcommand == b"GET" and len(command_args) <= 2:
+        count = SLOWLOG_GET_DEFAULT_COUNT
+        if len(command_args) == 2:
+            try:
+                count = int(bytes(command_args[1]))
+            except ValueError:
+                count = -2
+            if count < -1:
+                return Error("ERR count should be greater than or equal to -1")
+        entries = slow_log.get(None if count == -1 else count)
+        return Array(
+            [
+                Array(
+                    [
+                        Integer(entry.id),
+                        Integer(entry.timestamp),
+                        Integer(entry.duration_usec),
+                        Array([BulkString(arg) for arg in entry.args]),
+                        BulkString(entry.client.encode()),
+                        BulkString(entry.client_name.encode()),
+                    ]
+                )
+                for entry in entries
+            ]
+        )
+    if subcommand == b"LEN" and len(command_args) == 1:
+        return Integer(len(slow_log))
+    if subcommand == b"RESET" and len(command_args) == 1:
+        slow_log.reset()
+        return OK
+    return Error(
+        f"ERR unknown subcommand or wrong number of arguments for "
+        f"'{command_args[0]}'. Try SLOWLOG HELP."
+    )
+
+
+def handle_config(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Array | SimpleString | Error:
+    subcommand = bytes(command_args[0]).upper()
+    if subcommand == b"RESETSTAT" and len(command_args) == 1:
+        server_stats.reset()
+        for redis_command in COMMANDS:
+            redis_command.stats.reset()
+        datastore.expired_keys = 0
+        datastore.evicted_keys = 0
+        return OK
+    if subcommand == b"GET" and len(command_args) >= 2:
+        reply = []
+        for name, (owner, attribute, _) in CONFIG_PARAMETERS.items():
+            patterns = (str(pattern).lower() for pattern in command_args[1:])
+            if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+                value = getattr(datastore if owner is DataStore else owner, attribute)
+                reply += [BulkString(name.encode()), BulkString(str(value).encode())]
+        return Array(reply)
+    if subcommand == b"SET" and len(command_args) >= 3 and len(command_args) % 2:
+        return _config_set(command_args[1:], datastore)
+    return Error(
+        f"ERR unknown subcommand or wrong number of arguments for "
+        f"'{command_args[0]}'. Try CONFIG HELP."
+    )
+
+
+def _config_set(pairs: Array, datastore: DataStore) -> SimpleString | Error:
+    changes = []
+    for name, value in _pairs(pairs, "config|set"):
+        name = name.decode(errors="replace").lower()
+        if name not in CONFIG_PARAMETERS:
+            return Error(
+                f"ERR Unknown option or number of arguments for CONFIG SET - '{name}'"
+            )
+        owner, attribute, parse = CONFIG_PARAMETERS[name]
+        if owner is DataStore:
+            owner = datastore
+        try:
+            changes.append((owner, attribute, parse(value.decode(errors="replace"))))
+        except ValueError as e:
+            return Error(
+                f"ERR CONFIG SET failed (possibly related to argument '{name}') - {e}"
+            )
+    for owner, attribute, value in changes:
+        try:
+            setattr(owner, attribute, value)
+        except ValueError as e:
+            return Error(f"ERR CONFIG SET failed - {e}")
+    return OK
+
+
+def _parse_integer(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("argument couldn't be parsed into an integer") from None
+
+
+# Name to (owner, attribute, parse). Parameters owned by DataStore are read
+# from and set on the keyspace the command runs against.
+CONFIG_PARAMETERS = {
+    "slowlog-log-slower-than": (slow_log, "threshold_usec", _parse_integer),
+    "slowlog-max-len": (slow_log, "max_len", _parse_integer),
+    "latency-monitor-threshold": (latency_monitor, "threshold_ms", _parse_integer),
+    "maxmemory": (DataStore, "maxmemory", parse_memory),
+    "maxmemory-policy": (DataStore, "maxmemory_policy", parse_maxmemory_policy),
+    "maxmemory-samples": (DataStore, "maxmemory_samples", _parse_integer),
+    "maxmemory-eviction-tenacity": (
+        DataStore,
+        "maxmemory_eviction_tenacity",
+        _parse_integer,
+    ),
+}
+
+
+def handle_cluster(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Error:
+    return CLUSTER_DISABLED
+
+
+def handle_asking(
+    command_args: Array, datastore: DataStore, persistence: RedisPersistence
+) -> Error:
+    return CLUSTER_DISABLED
 
 
 def handle_unknown(command: BulkString, command_args: Array) -> Error:
@@ -199,3 +1225,69 @@ def handle_unknown(command: BulkString, command_args: Array) -> Error:
 
 def encode_command(command: str) -> Array:
     return Array([BulkString(data.encode()) for data in command.split()])
+
+
+COMMANDS = (
+    RedisCommand("ping", handle_ping, -1, ("fast",)),
+    RedisCommand("echo", handle_echo, 2, ("fast",)),
+    RedisCommand("set", handle_set, -3, ("write", "denyoom"), 1, 1, 1, True),
+    RedisCommand("get", handle_get, 2, ("readonly", "fast"), 1, 1, 1),
+    RedisCommand("mget", handle_mget, -2, ("readonly", "fast"), 1, -1, 1),
+    RedisCommand("mset", handle_mset, -3, ("write", "denyoom"), 1, -1, 2),
+    RedisCommand("msetnx", handle_msetnx, -3, ("write", "denyoom"), 1, -1, 2, True),
+    RedisCommand("exists", handle_exists, -2, ("readonly", "fast"), 1, -1, 1),
+    RedisCommand("del", handle_del, -2, ("write",), 1, -1, 1),
+    RedisCommand("incr", handle_incr, 2, ("write", "denyoom", "fast"), 1, 1, 1),
+    RedisCommand("decr", handle_decr, 2, ("write", "denyoom", "fast"), 1, 1, 1),
+    RedisCommand("lpush", handle_lpush, -3, ("write", "denyoom", "fast"), 1, 1, 1),
+    RedisCommand("rpush", handle_rpush, -3, ("write", "denyoom", "fast"), 1, 1, 1),
+    RedisCommand("lrange", handle_lrange, 4, ("readonly",), 1, 1, 1),
+    RedisCommand("lpop", handle_lpop, -2, ("write", "fast"), 1, 1, 1),
+    RedisCommand("rpop", handle_rpop, -2, ("write", "fast"), 1, 1, 1),
+    RedisCommand("lindex", handle_lindex, 3, ("readonly",), 1, 1, 1),
+    RedisCommand("llen", handle_llen, 2, ("readonly", "fast"), 1, 1, 1),
+    RedisCommand("ltrim", handle_ltrim, 4, ("write",), 1, 1, 1),
+    RedisCommand("expire", handle_expire, 3, ("write", "fast"), 1, 1, 1, True),
+    RedisCommand("pexpire", handle_pexpire, 3, ("write", "fast"), 1, 1, 1, True),
+    RedisCommand("expireat", handle_expireat, 3, ("write", "fast"), 1, 1, 1, True),
+    RedisCommand("pexpireat", handle_pexpireat, 3, ("write", "fast"), 1, 1, 1, True),
+    RedisCommand("ttl", handle_ttl, 2, ("readonly", "fast"), 1, 1, 1),
+    RedisCommand("pttl", handle_pttl, 2, ("readonly", "fast"), 1, 1, 1),
+    RedisCommand("persist", handle_persist, 2, ("write", "fast"), 1, 1, 1, True),
+    RedisCommand("info", handle_info, -1, ("loading", "stale")),
+    RedisCommand("bgrewriteaof", handle_bgrewriteaof, 1, ("admin", "noscript")),
+    RedisCommand("save", handle_save, 1, ("admin", "noscript")),
+    RedisCommand("bgsave", handle_bgsave, 1, ("admin", "noscript")),
+    RedisCommand("command", handle_command_table, -1, ("loading", "stale")),
+    RedisCommand("dump", handle_dump, 2, ("readonly",), 1, 1, 1),
+    RedisCommand("restore", handle_restore, -4, ("write", "denyoom"), 1, 1, 1, True),
+    RedisCommand(
+        "restore-asking",
+        handle_restore,
+        -4,
+        ("write", "denyoom", "asking"),
+        1,
+        1,
+        1,
+        True,
+    ),
+    RedisCommand("migrate", handle_migrate, -6, ("write",), logs_itself=True),
+    RedisCommand("cluster", handle_cluster, -2, ()),
+    RedisCommand("asking", handle_asking, 1, ("fast",)),
+    RedisCommand("replicaof", handle_replicaof, 3, ("admin", "noscript", "stale")),
+    RedisCommand("slaveof", handle_replicaof, 3, ("admin", "noscript", "stale")),
+    RedisCommand("sync", handle_sync, 1, ("admin", "noscript")),
+    RedisCommand("psync", handle_psync, 3, ("admin", "noscript")),
+    RedisCommand("replconf", handle_replconf, -1, ("admin", "noscript", "stale")),
+    RedisCommand("latency", handle_latency, -2, ("admin", "noscript", "loading")),
+    RedisCommand("config", handle_config, -2, ("admin", "noscript", "loading")),
+    RedisCommand("slowlog", handle_slowlog, -2, ("admin", "loading", "stale")),
+)
+
+# Clients mostly send names in one case, so both are looked up directly
+# before falling back to lowercasing the name.
+COMMAND_TABLE = {
+    name: redis_command
+    for redis_command in COMMANDS
+    for name in (redis_command.name.encode(), redis_command.name.upper().encode())
+}
@@ -1,130 +1,640 @@
-import random
-from dataclasses import dataclass
-from itertools import islice
+import re
+import sys
 from threading import Lock
-from time import time_ns
-from typing import Any
+from time import perf_counter_ns, time_ns
+from typing import Any, Iterable, Iterator
 
-COUNT_KEYS = 20
+from pyredis.eviction import (
+    EVICTION_CHECK_KEYS,
+    MAXMEMORY_EVICTION_TENACITY,
+    MAXMEMORY_POLICY,
+    MAXMEMORY_SAMPLES,
+    AccessIndex,
+    EvictionPool,
+    KeyIndex,
+    eviction_time_limit,
+    parse_maxmemory_policy,
+)
+from pyredis.expiry import ExpiryIndex, ExpiryScheduler
+from pyredis.redislist import RedisList, normalize_range
+from pyredis.slots import SlotIndex, key_hash_slot
 
+ACTIVE_EXPIRE_CYCLE_KEYS_PER_LOOP = 20
+ACTIVE_EXPIRE_CYCLE_ACCEPTABLE_STALE = 10
+ACTIVE_EXPIRE_CYCLE_TIME_BUDGET = 25 * 10**6
+ACTIVE_EXPIRE_CYCLE_INTERVAL = 0.1
+KEYSPACE_INFO_TTL_SAMPLE = 20
+MAXMEMORY_SAMPLES_MAX = 64
+# Policies that pick keys without looking at their accesses, so reads do
+# not touch an AccessIndex. allkeys-random samples a KeyIndex instead, the
+# volatile ones the keys ExpiryIndex already samples.
+UNTRACKED_POLICIES = (
+    "noeviction",
+    "allkeys-random",
+    "volatile-random",
+    "volatile-ttl",
+)
 
-@dataclass
-class CacheEntry:
-    value: Any
-    expiry: float = 0
+# Rough CPython costs behind used_memory: a dict slot per key, the header
+# of every bytes object, and a pointer per list element.
+DICT_ENTRY_SIZE = 48
+BYTES_HEADER_SIZE = sys.getsizeof(b"")
+LIST_HEADER_SIZE = sys.getsizeof(RedisList()) + sys.getsizeof([])
+LIST_ELEMENT_OVERHEAD = 8 + BYTES_HEADER_SIZE
 
-    def expired(self):
-        return self.expiry and self.expiry < int(time_ns())
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+CANONICAL_INTEGER = re.compile(rb"0|-?[1-9][0-9]*")
+
+
+def parse_int64(value: bytes | str) -> int:
+    """Parse a string value as Redis's string2ll does.
+
+    Only the canonical form of a signed 64-bit integer is accepted, so no
+    whitespace, sign prefix, leading zeros or underscores that int() would
+    take.
+    """
+    if isinstance(value, str):
+        value = value.encode()
+    if CANONICAL_INTEGER.fullmatch(value) is None:
+        raise ValueError("value is not an integer")
+    number = int(value)
+    if not INT64_MIN <= number <= INT64_MAX:
+        raise ValueError("value is out of range")
+    return number
+
+
+def entry_size(key: bytes, value: Any) -> int:
+    """Estimate the bytes a keyspace entry takes."""
+    if isinstance(value, RedisList):
+        return DICT_ENTRY_SIZE + BYTES_HEADER_SIZE + len(key) + list_size(value)
+    return DICT_ENTRY_SIZE + 2 * BYTES_HEADER_SIZE + len(key) + len(value)
+
+
+def list_size(values: Iterable[bytes]) -> int:
+    return LIST_HEADER_SIZE + sum(LIST_ELEMENT_OVERHEAD + len(v) for v in values)
 
 
 class DataStore:
-    def __init__(self):
+    """Keyspace holding plain values, with deadlines kept apart.
+
+    Like Redis, only volatile keys have an entry in ``_expires`` (key to
+    absolute deadline in nanoseconds), so persistent keys carry no
+    per-key wrapper object at all.
+
+    ``active_expire_effort`` (1-10) mirrors Redis's active-expire-effort:
+    higher values sample more keys per loop and tolerate fewer stale keys.
+    With an ``expiry_scheduler`` the active cycle pops due keys from its
+    heap instead of sampling, so keys are reclaimed close to their
+    deadline.
+
+    ``used_memory`` estimates the size of the keyspace and is updated by
+    every write rather than computed. Once it exceeds ``maxmemory``,
+    ``evict`` removes keys picked by ``maxmemory_policy``. An AccessIndex
+    tracks every key with its LRU clock or LFU counter only while an
+    eviction policy needs it, so reads pay for it only then. Under
+    allkeys-random a KeyIndex, changed only as keys come and go, is all
+    there is to sample from.
+
+    In cluster mode a ``slot_index`` keeps the keys of every slot, updated
+    whenever a key is created or removed.
+    """
+
+    def __init__(
+        self,
+        active_expire_effort: int = 1,
+        expiry_scheduler: ExpiryScheduler | None = None,
+        maxmemory: int = 0,
+        maxmemory_policy: str = MAXMEMORY_POLICY,
+        maxmemory_samples: int = MAXMEMORY_SAMPLES,
+        maxmemory_eviction_tenacity: int = MAXMEMORY_EVICTION_TENACITY,
+        slot_index: SlotIndex | None = None,
+    ):
         self._data = dict()
+        self._expires = ExpiryIndex()
+        self._scheduler = expiry_scheduler
+        self._slots = slot_index
         self._lock = Lock()
+        self.expired_keys = 0
+        self.evicted_keys = 0
+        self.used_memory = 0
+        self.loading = False
+        effort = active_expire_effort - 1
+        self._keys_per_loop = ACTIVE_EXPIRE_CYCLE_KEYS_PER_LOOP * (4 + effort) // 4
+        self._acceptable_stale = ACTIVE_EXPIRE_CYCLE_ACCEPTABLE_STALE - effort
+        self._access = None
+        self._all_keys = None
+        self._pool = EvictionPool()
+        self._maxmemory = maxmemory
+        self._maxmemory_policy = parse_maxmemory_policy(maxmemory_policy)
+        self.maxmemory_samples = maxmemory_samples
+        self.maxmemory_eviction_tenacity = maxmemory_eviction_tenacity
+        self._eviction_timed_out = False
+        self._configure_eviction()
+
+    def __getitem__(self, key: bytes):
+        with self._lock:
+            self._expire_if_needed(key)
+            value = self._data[key]
+            if self._access is not None:
+                self._access.touch(key)
+            return value
+
+    def __setitem__(self, key: bytes, value: Any):
+        with self._lock:
+            # _store, inlined for SET.
+            old_value = self._data.get(key)
+            self._data[key] = value
+            if type(value) is bytes and type(old_value) is bytes:
+                self.used_memory += len(value) - len(old_value)
+            else:
+                self._resized(key, old_value, value)
+            if self._access is not None:
+                self._access.touch(key)
+            self._expires.pop(key, None)
+
+    def __contains__(self, key: Any):
+        with self._lock:
+            return key in self._data and not self._expire_if_needed(key)
+
+    def __delitem__(self, key: bytes):
+        with self._lock:
+            if key not in self._data:
+                raise KeyError(key)
+            self._remove(key)
+
+    def set_with_expiry(self, key: bytes, value: any, expiry: float) -> None:
+        with self._lock:
+            self._store(key, value)
+            self._set_deadline(key, time_ns() + self._to_nanoseconds(expiry))
 
-    def __getitem__(self, key: str):
+    def set_with_deadline(self, key: bytes, value: Any, deadline: int) -> None:
+        """Set key to expire at an absolute time_ns() deadline.
+
+        A deadline already in the past removes the key instead, so replaying
+        an old log never resurrects keys that should be gone.
+        """
+        with self._lock:
+            if deadline <= time_ns():
+                self._remove(key)
+                return
+            self._store(key, value)
+            self._set_deadline(key, deadline)
+
+    def expire_at(self, key: bytes, deadline: int) -> bool:
+        with self._lock:
+            self._expire_if_needed(key)
+            if key not in self._data:
+                return False
+            if deadline <= time_ns():
+                self._remove(key)
+            else:
+                self._set_deadline(key, deadline)
+            return True
+
+    def deadline(self, key: bytes) -> int | None:
+        """Return the key's deadline, None if it is persistent."""
         with self._lock:
-            entry: CacheEntry = self._data[key]
-            self._remove_expired_key(key, entry)
-            return entry.value
+            self._expire_if_needed(key)
+            if key not in self._data:
+                raise KeyError(key)
+            return self._expires.get(key)
 
-    def __setitem__(self, key: str, value: Any):
+    def persist(self, key: bytes) -> bool:
         with self._lock:
-            self._data[key] = CacheEntry(value=value)
+            self._expire_if_needed(key)
+            return key in self._data and self._expires.pop(key) is not None
 
-    def __contains__(self, item: Any):
-        return item in self._data
+    def get_many(self, keys: list[bytes]) -> list[Any]:
+        """Return the value of each key, None where it is missing."""
+        with self._lock:
+            values = []
+            for key in keys:
+                self._expire_if_needed(key)
+                value = self._data.get(key)
+                if value is not None and self._access is not None:
+                    self._access.touch(key)
+                values.append(value)
+            return values
 
-    def __delitem__(self, key: str):
-        del self._data[key]
+    def set_many(self, items: list[tuple[bytes, Any]]) -> None:
+        with self._lock:
+            for key, value in items:
+                self._store(key, value)
+                self._expires.pop(key, None)
 
-    def set_with_expiry(self, key: str, value: any, expiry: float) -> None:
+    def set_many_if_absent(self, items: list[tuple[bytes, Any]]) -> bool:
+        """Set every key only if none of them exists yet."""
         with self._lock:
-            calculated_expiry = time_ns() + self._to_nanoseconds(expiry)
-            self._data[key] = CacheEntry(value=value, expiry=calculated_expiry)
+            for key, _ in items:
+                if key in self._data and not self._expire_if_needed(key):
+                    return False
+            for key, value in items:
+                self._store(key, value)
+            return True
+
+    def remove_expired_keys(
+        self, time_budget: int = ACTIVE_EXPIRE_CYCLE_TIME_BUDGET
+    ) -> int:
+        """Run one active expire cycle and return how many keys it removed.
+
+        Only volatile keys are sampled. The cycle repeats while more than the
+        acceptable share of a sample was stale, and stops once
+        ``time_budget`` nanoseconds have been spent.
+        """
+        if self._scheduler is not None:
+            return self._remove_scheduled_keys()
+
+        started = perf_counter_ns()
+        total_expired = 0
 
-    def remove_expired_keys(self) -> None:
         while True:
-            count = COUNT_KEYS if len(self._data) >= COUNT_KEYS else len(self._data)
+            keys = self._expires.sample(self._keys_per_loop)
 
-            if count == 0:
+            if not keys:
                 break
 
-            keys = random.sample(list(self._data), count)
-            if self._expire(keys) / count <= 0.25:
+            expired = self._expire(keys)
+            total_expired += expired
+            if expired * 100 <= len(keys) * self._acceptable_stale:
                 break
+            if perf_counter_ns() - started > time_budget:
+                break
+
+        return total_expired
+
+    def _remove_scheduled_keys(self) -> int:
+        count_expired = 0
+        with self._lock:
+            for key, deadline in self._scheduler.pop_due(time_ns()):
+                if self._expires.get(key) == deadline:
+                    self._remove(key)
+                    count_expired += 1
+            if len(self._scheduler) > 2 * len(self._expires) + 1024:
+                self._scheduler.rebuild(self._expires.items())
+        self.expired_keys += count_expired
+        return count_expired
+
+    @property
+    def maxmemory(self) -> int:
+        return self._maxmemory
+
+    @maxmemory.setter
+    def maxmemory(self, maxmemory: int) -> None:
+        if maxmemory < 0:
+            raise ValueError("maxmemory must not be negative")
+        with self._lock:
+            self._maxmemory = maxmemory
+            self._configure_eviction()
+
+    @property
+    def maxmemory_policy(self) -> str:
+        return self._maxmemory_policy
+
+    @maxmemory_policy.setter
+    def maxmemory_policy(self, policy: str) -> None:
+        policy = parse_maxmemory_policy(policy)
+        with self._lock:
+            self._maxmemory_policy = policy
+            self._configure_eviction()
+
+    @property
+    def maxmemory_samples(self) -> int:
+        return self._maxmemory_samples
+
+    @maxmemory_samples.setter
+    def maxmemory_samples(self, samples: int) -> None:
+        if not 1 <= samples <= MAXMEMORY_SAMPLES_MAX:
+            raise ValueError(
+                f"maxmemory-samples must be between 1 and {MAXMEMORY_SAMPLES_MAX}"
+            )
+        self._maxmemory_samples = samples
+
+    @property
+    def maxmemory_eviction_tenacity(self) -> int:
+        return self._maxmemory_eviction_tenacity
+
+    @maxmemory_eviction_tenacity.setter
+    def maxmemory_eviction_tenacity(self, tenacity: int) -> None:
+        if not 0 <= tenacity <= 100:
+            raise ValueError("maxmemory-eviction-tenacity must be between 0 and 100")
+        self._maxmemory_eviction_tenacity = tenacity
+
+    @property
+    def eviction_pending(self) -> bool:
+        """Whether the last eviction ran out of time before memory fit."""
+        return self._eviction_timed_out and 0 < self._maxmemory < self.used_memory
+
+    def evict(self) -> list[bytes]:
+        """Remove keys until used_memory fits maxmemory and return them.
+
+        Stops early when the policy finds nothing to evict, as under
+        noeviction or a volatile policy with no volatile keys left, so the
+        caller has to check used_memory against maxmemory afterwards. A pass
+        also stops once it has taken the time maxmemory-eviction-tenacity
+        allows, leaving ``eviction_pending`` set for a later pass to go on.
+        """
+        evicted = []
+        time_limit = eviction_time_limit(self._maxmemory_eviction_tenacity)
+        started = perf_counter_ns()
+        self._eviction_timed_out = False
+        with self._lock:
+            while self._maxmemory and self.used_memory > self._maxmemory:
+                key = self._eviction_candidate()
+                if key is None:
+                    break
+                self._remove(key)
+                evicted.append(key)
+                if len(evicted) % EVICTION_CHECK_KEYS == 0:
+                    if perf_counter_ns() - started > time_limit:
+                        self._eviction_timed_out = True
+                        break
+        self.evicted_keys += len(evicted)
+        return evicted
+
+    def _eviction_candidate(self) -> bytes | None:
+        policy = self._maxmemory_policy
+        if policy == "noeviction":
+            return None
+        volatile = policy.startswith("volatile-")
+        if policy.endswith("-random"):
+            keys = self._expires if volatile else self._all_keys
+            sample = keys.sample(1)
+            return sample[0] if sample else None
+        keys = self._expires if volatile else self._access
+        while True:
+            sample = keys.sample(self._maxmemory_samples)
+            if not sample and not len(self._pool):
+                return None
+            self._pool.populate(self._scores(sample))
+            while (key := self._pool.pop()) is not None:
+                if key in keys:
+                    return key
+
+    def _scores(self, keys: list[bytes]) -> list[tuple[int, bytes]]:
+        if self._maxmemory_policy == "volatile-ttl":
+            # The sooner the deadline, the better the candidate.
+            return [(-self._expires.get(key), key) for key in keys]
+        return self._access.scores(keys)
+
+    def _configure_eviction(self) -> None:
+        """Track accesses only while a policy needs them, LRU or LFU style."""
+        policy = self._maxmemory_policy
+        if not self._maxmemory or policy in UNTRACKED_POLICIES:
+            self._access = None
+        elif self._access is None or self._access.lfu != policy.endswith("-lfu"):
+            self._access = AccessIndex(self._data, policy.endswith("-lfu"))
+        if not self._maxmemory or policy != "allkeys-random":
+            self._all_keys = None
+        elif self._all_keys is None:
+            self._all_keys = KeyIndex(self._data)
+        self._pool.clear()
+
+    @property
+    def expire_cycle_interval(self) -> float:
+        if self._scheduler is not None:
+            return self._scheduler.granularity
+        return ACTIVE_EXPIRE_CYCLE_INTERVAL
+
+    def expiry_info(self) -> dict:
+        if self._scheduler is None:
+            return {
+                "active_expire_mode": "sample",
+                "expire_cycle_interval_ms": ACTIVE_EXPIRE_CYCLE_INTERVAL * 1000,
+                "expire_keys_per_loop": self._keys_per_loop,
+                "expire_time_budget_ms": ACTIVE_EXPIRE_CYCLE_TIME_BUDGET // 10**6,
+                "expires": len(self._expires),
+                "expired_keys": self.expired_keys,
+            }
+        return {
+            "active_expire_mode": "scheduler",
+            "expire_granularity_ms": self._scheduler.granularity * 1000,
+            "expire_tick_budget": self._scheduler.tick_budget,
+            "expire_backlog": len(self._scheduler),
+            "expire_lag_ms": self._scheduler.lag(time_ns()) / 10**6,
+            "expires": len(self._expires),
+            "expired_keys": self.expired_keys,
+        }
+
+    def keyspace_info(self) -> dict:
+        """Key counts, with the average TTL in ms estimated from a sample."""
+        now = time_ns()
+        deadlines = [
+            self._expires.get(key)
+            for key in self._expires.sample(KEYSPACE_INFO_TTL_SAMPLE)
+        ]
+        ttls = [deadline - now for deadline in deadlines if deadline > now]
+        return {
+            "keys": len(self._data),
+            "expires": len(self._expires),
+            "avg_ttl": sum(ttls) // len(ttls) // 10**6 if ttls else 0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._expires = ExpiryIndex()
+            if self._scheduler is not None:
+                self._scheduler.rebuild(())
+            self.used_memory = 0
+            if self._access is not None:
+                self._access = AccessIndex((), self._access.lfu)
+            if self._all_keys is not None:
+                self._all_keys = KeyIndex()
+            self._pool.clear()
+            if self._slots is not None:
+                self._slots.clear()
 
     def dbsize(self) -> int:
         return len(self._data)
 
-    def _expire(self, keys: list[str]) -> int:
+    def count_keys_in_slot(self, slot: int) -> int:
+        if self._slots is not None:
+            return self._slots.count(slot)
+        return sum(1 for key in self._data if key_hash_slot(key) == slot)
+
+    def keys_in_slot(self, slot: int, count: int) -> list[bytes]:
+        """Return up to count keys of a cluster slot."""
+        if self._slots is not None:
+            return self._slots.keys(slot, count)
+        keys = []
+        for key in self._data:
+            if len(keys) == count:
+                break
+            if key_hash_slot(key) == slot:
+                keys.append(key)
+        return keys
+
+    def dump(self) -> Iterator[tuple[bytes, Any, int | None]]:
+        """Yield (key, value, deadline) for every live key.
+
+        Meant for serializing a quiescent copy of the keyspace, such as the
+        one a forked child sees, so it does not take the lock.
+        """
+        now = time_ns()
+        for key, value in self._data.items():
+            deadline = self._expires.get(key)
+            if deadline is None or deadline >= now:
+                yield key, value, deadline
+
+    def _expire(self, keys: list[bytes]) -> int:
         count_expired = 0
-        for key in keys:
-            with self._lock:
-                if key not in self._data:
-                    pass
-                if self._data[key].expired():
-                    del self._data[key]
+        with self._lock:
+            for key in keys:
+                if self._expire_if_needed(key):
                     count_expired += 1
         return count_expired
 
-    def _remove_expired_key(self, key: str, entry: CacheEntry) -> None:
-        if entry.expired():
-            del self._data[key]
-            raise KeyError
+    def _expire_if_needed(self, key: bytes) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is None or deadline >= time_ns():
+            return False
+        self._remove(key)
+        self.expired_keys += 1
+        return True
+
+    def _store(self, key: bytes, value: Any) -> None:
+        old_value = self._data.get(key)
+        self._data[key] = value
+        if type(value) is bytes and type(old_value) is bytes:
+            # Overwriting a string, the common case, only changes its length.
+            self.used_memory += len(value) - len(old_value)
+        else:
+            self._resized(key, old_value, value)
+        if self._access is not None:
+            self._access.touch(key)
+
+    def _resized(self, key: bytes, old_value: Any, value: Any) -> None:
+        self.used_memory += entry_size(key, value)
+        if old_value is not None:
+            self.used_memory -= entry_size(key, old_value)
+            return
+        if self._slots is not None:
+            self._slots.add(key)
+        if self._all_keys is not None:
+            self._all_keys.add(key)
+
+    def _remove(self, key: bytes) -> None:
+        value = self._data.pop(key, None)
+        if value is None:
+            return
+        self.used_memory -= entry_size(key, value)
+        self._expires.pop(key)
+        if self._access is not None:
+            self._access.pop(key)
+        if self._all_keys is not None:
+            self._all_keys.pop(key)
+        if self._slots is not None:
+            self._slots.discard(key)
+
+    def _set_deadline(self, key: bytes, deadline: int) -> None:
+        self._expires.set(key, deadline)
+        if self._scheduler is not None:
+            self._scheduler.schedule(key, deadline)
 
     @staticmethod
     def _to_nanoseconds(seconds: float) -> int:
-        return seconds * 10**9
+        return int(seconds * 10**9)
+
+    def increment(self, key: bytes) -> int:
+        return self._increment_by(key, 1)
+
+    def decrement(self, key: bytes) -> int:
+        return self._increment_by(key, -1)
 
-    def increment(self, key: str) -> int:
+    def _increment_by(self, key: bytes, amount: int) -> int:
         with self._lock:
-            if key not in self._data:
-                self._data[key] = CacheEntry(0)
-            value = int(self._data[key].value)
-            value += 1
-            self._data[key] = CacheEntry(value)
+            self._expire_if_needed(key)
+            value = self._data.get(key, b"0")
+            if isinstance(value, RedisList):
+                raise TypeError
+            value = parse_int64(value) + amount
+            if not INT64_MIN <= value <= INT64_MAX:
+                raise OverflowError("increment or decrement would overflow")
+            self._store(key, b"%d" % value)
             return value
 
-    def decrement(self, key: str) -> int:
+    def prepend(self, key: bytes, value: Any) -> int:
         with self._lock:
-            if key not in self._data:
-                self._data[key] = CacheEntry(0)
-            value = int(self._data[key].value)
-            value -= 1
-            self._data[key] = CacheEntry(value)
-            return value
+            length = self._get_or_create_list(key).appendleft(value)
+            self.used_memory += LIST_ELEMENT_OVERHEAD + len(value)
+            return length
 
-    def prepend(self, key: str, value: Any) -> int:
+    def append(self, key: bytes, value: Any) -> int:
         with self._lock:
-            item = self._data.get(key, CacheEntry([]))
-            if not isinstance(item.value, list):
-                raise TypeError
-            item.value.insert(0, value)
-            self._data[key] = item
-            return len(item.value)
+            length = self._get_or_create_list(key).append(value)
+            self.used_memory += LIST_ELEMENT_OVERHEAD + len(value)
+            return length
 
-    def append(self, key: str, value: Any) -> int:
+    def range(self, key: bytes, start: int, stop: int) -> list:
         with self._lock:
-            item = self._data.get(key, CacheEntry([]))
-            if not isinstance(item.value, list):
-                raise TypeError
-            item.value.append(value)
-            self._data[key] = item
-            return len(item.value)
+            values = self._get_list(key)
+            if values is None:
+                return []
+            start, stop = normalize_range(start, stop, len(values))
+            return values.range(start, stop)
 
-    def range(self, key: str, start: int, stop: int) -> list:
+    def pop_left(self, key: bytes, count: int = 1) -> list:
         with self._lock:
-            item = self._data.get(key, CacheEntry([]))
-            if not isinstance(item.value, list):
-                raise TypeError
+            values = self._get_list(key)
+            if values is None:
+                return []
+            popped = [values.popleft() for _ in range(min(count, len(values)))]
+            self.used_memory -= list_size(popped) - LIST_HEADER_SIZE
+            self._remove_if_empty(key, values)
+            return popped
 
-            length = len(item.value)
-            if start > length:
+    def pop_right(self, key: bytes, count: int = 1) -> list:
+        with self._lock:
+            values = self._get_list(key)
+            if values is None:
                 return []
-            if stop > length:
-                stop = length
-            if start < 0:
-                start = max(length + start, 0)
+            popped = [values.pop() for _ in range(min(count, len(values)))]
+            self.used_memory -= list_size(popped) - LIST_HEADER_SIZE
+            self._remove_if_empty(key, values)
+            return popped
+
+    def index(self, key: bytes, index: int) -> Any:
+        with self._lock:
+            values = self._get_list(key)
+            if values is None:
+                raise IndexError
+            return values[index]
+
+    def length(self, key: bytes) -> int:
+        with self._lock:
+            values = self._get_list(key)
+            return 0 if values is None else len(values)
+
+    def trim(self, key: bytes, start: int, stop: int) -> None:
+        with self._lock:
+            values = self._get_list(key)
+            if values is None:
+                return
+            start, stop = normalize_range(start, stop, len(values))
+            removed = values.range(0, start) + values.range(stop, len(values))
+            values.trim(start, stop)
+            self.used_memory -= list_size(removed) - LIST_HEADER_SIZE
+            self._remove_if_empty(key, values)
+
+    def _get_list(self, key: bytes) -> RedisList | None:
+        self._expire_if_needed(key)
+        values = self._data.get(key)
+        if values is None:
+            return None
+        if not isinstance(values, RedisList):
+            raise TypeError
+        if self._access is not None:
+            self._access.touch(key)
+        return values
+
+    def _get_or_create_list(self, key: bytes) -> RedisList:
+        values = self._get_list(key)
+        if values is None:
+            values = RedisList()
+            self._store(key, values)
+        return values
 
-            return list(islice(item.value, start, stop))
+    def _remove_if_empty(self, key: bytes, values: RedisList) -> None:
+        if len(values) == 0:
+            self._remove(key)
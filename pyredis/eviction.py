@@ -0,0 +1,293 @@
+import math
+import random
+import re
+from array import array
+from bisect import insort
+from time import time
+from typing import Iterable, Iterator
+
+MAXMEMORY_POLICIES = (
+    "noeviction",
+    "allkeys-lru",
+    "volatile-lru",
+    "allkeys-lfu",
+    "volatile-lfu",
+    "allkeys-random",
+    "volatile-random",
+    "volatile-ttl",
+)
+MAXMEMORY_POLICY = "noeviction"
+MAXMEMORY_SAMPLES = 5
+MAXMEMORY_EVICTION_TENACITY = 10
+# An eviction pass checks its time limit once per this many evicted keys.
+EVICTION_CHECK_KEYS = 16
+EVICTION_POOL_SIZE = 16
+LRU_CLOCK_MAX = (1 << 24) - 1
+LFU_TIME_MAX = (1 << 16) - 1
+LFU_COUNTER_MAX = 255
+LFU_INIT_VAL = 5
+LFU_LOG_FACTOR = 10
+LFU_DECAY_TIME = 1
+MEMORY_UNITS = {
+    "": 1,
+    "b": 1,
+    "k": 1000,
+    "kb": 1024,
+    "m": 1000**2,
+    "mb": 1024**2,
+    "g": 1000**3,
+    "gb": 1024**3,
+}
+MEMORY_VALUE = re.compile(r"(\d+)([a-z]*)")
+
+
+def parse_memory(value: str) -> int:
+    """Parse a byte count with an optional unit, such as 100mb or 1gb."""
+    match = MEMORY_VALUE.fullmatch(value.strip().lower())
+    if match is None or match.group(2) not in MEMORY_UNITS:
+        raise ValueError("argument must be a memory value")
+    return int(match.group(1)) * MEMORY_UNITS[match.group(2)]
+
+
+def parse_maxmemory_policy(value: str) -> str:
+    policy = value.lower()
+    if policy not in MAXMEMORY_POLICIES:
+        raise ValueError(
+            "argument(s) must be one of the following: " + ", ".join(MAXMEMORY_POLICIES)
+        )
+    return policy
+
+
+def eviction_time_limit(tenacity: int) -> float:
+    """Nanoseconds one eviction pass may take, like Redis's evictionTimeLimitUs.
+
+    The limit grows linearly up to 500 microseconds at the default tenacity
+    of 10, then by 15% per step, and 100 removes it.
+    """
+    if tenacity <= 10:
+        return 50_000 * tenacity
+    if tenacity < 100:
+        return 500_000 * 1.15 ** (tenacity - 10)
+    return math.inf
+
+
+def lru_clock() -> int:
+    """Seconds, wrapping around in 24 bits like Redis's LRU clock."""
+    return int(time()) & LRU_CLOCK_MAX
+
+
+def lfu_time() -> int:
+    """Minutes, wrapping around in the 16 bits LFU words keep them in."""
+    return int(time()) // 60 & LFU_TIME_MAX
+
+
+def lfu_decrement(word: int, now: int) -> int:
+    """The counter of an LFU word, less one per LFU_DECAY_TIME minutes idle."""
+    elapsed = (now - (word >> 8)) & LFU_TIME_MAX
+    periods = elapsed // LFU_DECAY_TIME if LFU_DECAY_TIME else 0
+    return max(0, (word & LFU_COUNTER_MAX) - periods)
+
+
+def lfu_increment(counter: int) -> int:
+    """Count an access logarithmically, so 8 bits cover millions of hits.
+
+    The more accesses a counter already holds, the less likely another
+    one increments it, starting from LFU_INIT_VAL which new keys get so
+    they are not evicted before they had a chance to be read.
+    """
+    if counter == LFU_COUNTER_MAX:
+        return counter
+    base = max(0, counter - LFU_INIT_VAL)
+    if random.random() < 1.0 / (base * LFU_LOG_FACTOR + 1):
+        counter += 1
+    return counter
+
+
+class AccessIndex:
+    """Every key with a 32-bit access word, indexable for random sampling.
+
+    Keys live in a list with ``_positions`` mapping a key to its slot,
+    like ExpiryIndex, and their words in an unsigned int array alongside,
+    so the metadata costs four bytes per key, about the 24 bits Redis
+    keeps in every object. Under LRU a word is the clock of the last
+    access. Under LFU it holds the minute the counter last decayed in
+    its upper 16 bits and a logarithmic access counter in its low 8 bits.
+    """
+
+    __slots__ = ("lfu", "_positions", "_keys", "_words")
+
+    def __init__(self, keys: Iterable = (), lfu: bool = False):
+        self.lfu = lfu
+        self._positions = dict()
+        self._keys = []
+        self._words = array("I")
+        word = self._new_word()
+        for key in keys:
+            self._positions[key] = len(self._keys)
+            self._keys.append(key)
+            self._words.append(word)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._positions
+
+    def __iter__(self) -> Iterator:
+        return iter(self._keys)
+
+    def touch(self, key) -> None:
+        """Record an access to key, adding it with a fresh word if new."""
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(self._keys)
+            self._keys.append(key)
+            self._words.append(self._new_word())
+        elif self.lfu:
+            now = lfu_time()
+            counter = lfu_increment(lfu_decrement(self._words[position], now))
+            self._words[position] = now << 8 | counter
+        else:
+            self._words[position] = lru_clock()
+
+    def pop(self, key) -> None:
+        position = self._positions.pop(key, None)
+        if position is None:
+            return
+        last_key = self._keys.pop()
+        last_word = self._words.pop()
+        if position < len(self._keys):
+            self._keys[position] = last_key
+            self._words[position] = last_word
+            self._positions[last_key] = position
+
+    def word(self, key) -> int:
+        return self._words[self._positions[key]]
+
+    def set_word(self, key, word: int) -> None:
+        self._words[self._positions[key]] = word
+
+    def scores(self, keys: Iterable) -> list[tuple[int, bytes]]:
+        """Pair keys with how good eviction candidates they are.
+
+        The higher the score the better: under LRU it is the seconds
+        since the last access, under LFU how far the decayed counter is
+        from the maximum.
+        """
+        words = self._words
+        positions = self._positions
+        if self.lfu:
+            now = lfu_time()
+            return [
+                (LFU_COUNTER_MAX - lfu_decrement(words[positions[key]], now), key)
+                for key in keys
+            ]
+        clock = lru_clock()
+        return [((clock - words[positions[key]]) & LRU_CLOCK_MAX, key) for key in keys]
+
+    def sample(self, count: int) -> list:
+        """Pick count random keys, which may repeat as that is cheaper.
+
+        A keyspace no larger than count is returned whole.
+        """
+        if len(self._keys) <= count:
+            return list(self._keys)
+        return random.choices(self._keys, k=count)
+
+    def _new_word(self) -> int:
+        if self.lfu:
+            return lfu_time() << 8 | LFU_INIT_VAL
+        return lru_clock()
+
+
+class KeyIndex:
+    """Every key, indexable for random sampling, without access words.
+
+    allkeys-random only needs to pick any key, so unlike AccessIndex this
+    is updated when a key is created or removed, never when it is read.
+    """
+
+    __slots__ = ("_positions", "_keys")
+
+    def __init__(self, keys: Iterable = ()):
+        self._positions = dict()
+        self._keys = []
+        for key in keys:
+            self.add(key)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._positions
+
+    def __iter__(self) -> Iterator:
+        return iter(self._keys)
+
+    def add(self, key) -> None:
+        if key not in self._positions:
+            self._positions[key] = len(self._keys)
+            self._keys.append(key)
+
+    def pop(self, key) -> None:
+        position = self._positions.pop(key, None)
+        if position is None:
+            return
+        last_key = self._keys.pop()
+        if position < len(self._keys):
+            self._keys[position] = last_key
+            self._positions[last_key] = position
+
+    def sample(self, count: int) -> list:
+        """Pick count random keys, which may repeat as that is cheaper.
+
+        A keyspace no larger than count is returned whole.
+        """
+        if len(self._keys) <= count:
+            return list(self._keys)
+        return random.choices(self._keys, k=count)
+
+
+class EvictionPool:
+    """The best eviction candidates seen so far, by ascending idle score.
+
+    Like Redis's eviction pool, every eviction merges a small sample of
+    keys into the pool, which keeps only the ``size`` best ones. Good
+    candidates survive from one eviction to the next, so a few samples
+    per eviction approximate true LRU/LFU closely. Entries may name keys
+    that were deleted since, callers check a popped key still exists.
+    """
+
+    __slots__ = ("size", "_entries", "_keys")
+
+    def __init__(self, size: int = EVICTION_POOL_SIZE):
+        self.size = size
+        self._entries = []
+        self._keys = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def populate(self, candidates: Iterable[tuple[int, bytes]]) -> None:
+        entries = self._entries
+        for idle, key in candidates:
+            if len(entries) == self.size and idle <= entries[0][0]:
+                continue
+            if key in self._keys:
+                del entries[[pooled for _, pooled in entries].index(key)]
+            insort(entries, (idle, key))
+            self._keys.add(key)
+            if len(entries) > self.size:
+                self._keys.discard(entries.pop(0)[1])
+
+    def pop(self) -> bytes | None:
+        """Remove and return the best candidate, None if the pool is empty."""
+        if not self._entries:
+            return None
+        key = self._entries.pop()[1]
+        self._keys.discard(key)
+        return key
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys.clear()
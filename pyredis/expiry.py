@@ -0,0 +1,103 @@
+import heapq
+import random
+from typing import Any, Iterable, Iterator
+
+
+class ExpiryIndex:
+    """Deadlines of volatile keys, indexable for O(1) random sampling.
+
+    Keys and deadlines live in two parallel lists and ``_positions`` maps a
+    key to its slot. Removal swaps the last slot into the hole, so every
+    operation is O(1) and a random sample never copies the keyspace.
+    """
+
+    __slots__ = ("_positions", "_keys", "_deadlines")
+
+    def __init__(self):
+        self._positions = dict()
+        self._keys = []
+        self._deadlines = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._positions
+
+    def __iter__(self) -> Iterator:
+        return iter(self._keys)
+
+    def get(self, key: Any, default: int | None = None) -> int | None:
+        position = self._positions.get(key)
+        if position is None:
+            return default
+        return self._deadlines[position]
+
+    def items(self) -> Iterator[tuple[Any, int]]:
+        return zip(self._keys, self._deadlines)
+
+    def set(self, key: Any, deadline: int) -> None:
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(self._keys)
+            self._keys.append(key)
+            self._deadlines.append(deadline)
+        else:
+            self._deadlines[position] = deadline
+
+    def pop(self, key: Any, default: int | None = None) -> int | None:
+        position = self._positions.pop(key, None)
+        if position is None:
+            return default
+        deadline = self._deadlines[position]
+        last_key = self._keys.pop()
+        last_deadline = self._deadlines.pop()
+        if position < len(self._keys):
+            self._keys[position] = last_key
+            self._deadlines[position] = last_deadline
+            self._positions[last_key] = position
+        return deadline
+
+    def sample(self, count: int) -> list:
+        return random.sample(self._keys, min(count, len(self._keys)))
+
+
+class ExpiryScheduler:
+    """Min-heap of (deadline, key) pairs for reclaiming keys on time.
+
+    Entries are never removed when a key is deleted or given a new TTL;
+    the caller checks each popped entry against the current deadline and
+    drops stale ones. ``granularity`` is the tick period in seconds and
+    ``tick_budget`` caps how many entries a single tick may pop.
+    """
+
+    __slots__ = ("granularity", "tick_budget", "_heap")
+
+    def __init__(self, granularity: float = 0.01, tick_budget: int = 10000):
+        self.granularity = granularity
+        self.tick_budget = tick_budget
+        self._heap = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, key: Any, deadline: int) -> None:
+        heapq.heappush(self._heap, (deadline, key))
+
+    def pop_due(self, now: int) -> Iterator[tuple[Any, int]]:
+        heap = self._heap
+        for _ in range(self.tick_budget):
+            if not heap or heap[0][0] > now:
+                return
+            deadline, key = heapq.heappop(heap)
+            yield key, deadline
+
+    def lag(self, now: int) -> int:
+        """Nanoseconds the oldest pending deadline is overdue by."""
+        if not self._heap:
+            return 0
+        return max(now - self._heap[0][0], 0)
+
+    def rebuild(self, items: Iterable[tuple[Any, int]]) -> None:
+        self._heap = [(deadline, key) for key, deadline in items]
+        heapq.heapify(self._heap)
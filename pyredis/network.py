@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import socket
+from dataclasses import dataclass
+
+LOOP_AUTO = "auto"
+LOOP_ASYNCIO = "asyncio"
+LOOP_UVLOOP = "uvloop"
+EVENT_LOOPS = (LOOP_AUTO, LOOP_ASYNCIO, LOOP_UVLOOP)
+
+TCP_BACKLOG = 511
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SocketOptions:
+    """How the listening socket is set up.
+
+    ``backlog`` is Redis's ``tcp-backlog``. ``reuse_port`` lets several
+    processes bind the same port and have the kernel spread connections
+    between them. Buffer sizes of 0 keep the kernel defaults; accepted
+    sockets inherit them from the listening socket.
+    """
+
+    backlog: int = TCP_BACKLOG
+    reuse_port: bool = False
+    receive_buffer_size: int = 0
+    send_buffer_size: int = 0
+
+
+def install_event_loop(name: str = LOOP_AUTO) -> str:
+    """Make asyncio use the named event loop and return the one in use.
+
+    ``auto`` picks uvloop when it is installed and falls back to the
+    default asyncio loop otherwise.
+    """
+    if name not in EVENT_LOOPS:
+        raise ValueError(f"event loop must be one of {', '.join(EVENT_LOOPS)}")
+    if name == LOOP_ASYNCIO:
+        return LOOP_ASYNCIO
+
+    try:
+        import uvloop
+    except ImportError:
+        if name == LOOP_UVLOOP:
+            logger.warning("uvloop is not installed, using the asyncio event loop")
+        return LOOP_ASYNCIO
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return LOOP_UVLOOP
+
+
+def create_listening_socket(
+    host: str, port: int, options: SocketOptions = SocketOptions()
+) -> socket.socket:
+    """Bind a non-blocking TCP socket ready to be handed to create_server."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if options.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if options.receive_buffer_size:
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, options.receive_buffer_size
+            )
+        if options.send_buffer_size:
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_SNDBUF, options.send_buffer_size
+            )
+        sock.bind((host, port))
+        sock.listen(options.backlog)
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def set_nodelay(transport: asyncio.BaseTransport) -> None:
+    """Stop Nagle's algorithm from holding back small replies."""
+    sock = transport.get_extra_info("socket")
+    if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
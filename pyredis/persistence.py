@@ -1,23 +1,296 @@
+import asyncio
+import logging
+import mmap
+import os
+import random
+import threading
+from dataclasses import dataclass
+from time import perf_counter, perf_counter_ns
+from typing import Iterator
+
 from pyredis import protocol
 from pyredis.datastore import DataStore
-from pyredis.resp_datatypes import Array
+from pyredis.redislist import RedisList
+from pyredis.resp_datatypes import Array, BulkString
+from pyredis.stats import latency_monitor
+
+LOADING_PROGRESS_COMMANDS = 1024
+LOADING_PROGRESS_INTERVAL = 1
+WRITE_SIZE = 64 * 1024
+
+APPENDFSYNC_ALWAYS = "always"
+APPENDFSYNC_EVERYSEC = "everysec"
+APPENDFSYNC_NO = "no"
+APPENDFSYNC_POLICIES = (APPENDFSYNC_ALWAYS, APPENDFSYNC_EVERYSEC, APPENDFSYNC_NO)
+
+AUTO_AOF_REWRITE_PERCENTAGE = 100
+AUTO_AOF_REWRITE_MIN_SIZE = 64 * 1024 * 1024
+AOF_REWRITE_ITEMS_PER_CMD = 64
+AOF_CHECKPOINT = b"CHECKPOINT"
+
+logger = logging.getLogger(__name__)
+
+
+class RewriteInProgressError(Exception):
+    pass
+
+
+class SaveInProgressError(Exception):
+    pass
+
+
+class ReplicationDisabledError(Exception):
+    pass
 
 
 class RedisPersistence:
+    read_only = False
+    rewrite_in_progress = False
+    save_in_progress = False
+
     def log_command(self, command: Array) -> None:
         pass
 
+    def before_reply(self) -> None:
+        pass
+
+    def rewrite_in_background(self, datastore: DataStore) -> None:
+        pass
+
+    def save(self, datastore: DataStore) -> None:
+        pass
+
+    def save_in_background(self, datastore: DataStore) -> None:
+        pass
+
+    def aof_position(self) -> tuple[int, int] | None:
+        """Return (checkpoint, offset) of a checkpoint ending the AOF."""
+        return None
+
+    def sync(self, datastore: DataStore, replication_id: bytes | None, offset: int):
+        raise ReplicationDisabledError
+
+    def replicaof(self, host: str, port: int, datastore: DataStore) -> None:
+        raise ReplicationDisabledError
+
+    def promote(self) -> None:
+        raise ReplicationDisabledError
+
+    def replication_info(self) -> dict:
+        return {"role": "master", "connected_slaves": 0}
+
+    def persistence_info(self) -> dict:
+        return {}
+
+    def cron(self, datastore: DataStore) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
 
 class AppendOnlyFilePersistence(RedisPersistence):
-    def __init__(self, filename: str):
+    """Append-only file with Redis-style appendfsync policies.
+
+    Logged commands are encoded into an in-memory buffer which is written
+    with a single call once per event loop iteration (or straight away
+    when no loop is running). ``always`` writes and fsyncs before replies
+    are sent, ``everysec`` fsyncs from a background thread once a second
+    and ``no`` leaves flushing to the operating system.
+
+    The file is compacted by a forked child which writes the minimal
+    commands for the current keyspace. Commands logged meanwhile are kept
+    in a rewrite buffer and appended before the new file replaces the old
+    one. ``cron`` reaps the child and starts a rewrite automatically once
+    the file has grown ``auto_rewrite_percentage`` percent past its size
+    after the last rewrite and is at least ``auto_rewrite_min_size`` bytes.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        appendfsync: str = APPENDFSYNC_EVERYSEC,
+        auto_rewrite_percentage: int = AUTO_AOF_REWRITE_PERCENTAGE,
+        auto_rewrite_min_size: int = AUTO_AOF_REWRITE_MIN_SIZE,
+    ):
+        if appendfsync not in APPENDFSYNC_POLICIES:
+            raise ValueError(f"invalid appendfsync policy: {appendfsync}")
         self._filename = filename
+        self._appendfsync = appendfsync
+        self._auto_rewrite_percentage = auto_rewrite_percentage
+        self._auto_rewrite_min_size = auto_rewrite_min_size
+        self._buffer = bytearray()
+        self._flush_scheduled = False
+        self._fsync_pending = False
+        self._file_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._rewrite_pid = None
+        self._rewrite_buffer = None
         self.file = open(filename, mode="ab", buffering=0)
+        self._rewrite_base_size = self.size()
+
+        if appendfsync == APPENDFSYNC_EVERYSEC:
+            self._fsync_thread = threading.Thread(
+                target=self._fsync_every_second, name="aof-fsync", daemon=True
+            )
+            self._fsync_thread.start()
+
+    @property
+    def rewrite_in_progress(self) -> bool:
+        return self._rewrite_pid is not None
+
+    def size(self) -> int:
+        return os.fstat(self.file.fileno()).st_size + len(self._buffer)
+
+    def persistence_info(self) -> dict:
+        return {
+            "aof_enabled": 1,
+            "aof_rewrite_in_progress": int(self.rewrite_in_progress),
+            "aof_current_size": self.size(),
+            "aof_base_size": self._rewrite_base_size,
+            "aof_buffer_length": len(self._buffer),
+            "appendfsync": self._appendfsync,
+        }
 
     def log_command(self, command: Array) -> None:
-        self.file.write(f"*{len(command)}\r\n".encode())
+        command.resp_encode_into(self._buffer)
+
+        if self._flush_scheduled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        self._flush_scheduled = True
+        loop.call_soon(self.flush)
+
+    def before_reply(self) -> None:
+        if self._appendfsync == APPENDFSYNC_ALWAYS:
+            self.flush()
+
+    def flush(self) -> None:
+        self._flush_scheduled = False
+        if not self._buffer or self.file.closed:
+            return
+        started = perf_counter_ns()
+        write_all(self.file, self._buffer)
+        latency_monitor.add_sample("aof-write", (perf_counter_ns() - started) // 10**6)
+        if self._rewrite_buffer is not None:
+            self._rewrite_buffer += self._buffer
+        self._buffer.clear()
+
+        if self._appendfsync == APPENDFSYNC_ALWAYS:
+            started = perf_counter_ns()
+            os.fsync(self.file.fileno())
+            latency = (perf_counter_ns() - started) // 10**6
+            latency_monitor.add_sample("aof-fsync-always", latency)
+        else:
+            self._fsync_pending = True
+
+    def aof_position(self) -> tuple[int, int]:
+        """Append a checkpoint with a random id a snapshot can refer to.
+
+        The checkpoint is flushed and its id returned with the offset right
+        after it, so a snapshot can tell that an AOF is the very file it
+        was taken against: a rewrite or a truncated file no longer holds
+        the checkpoint at that offset.
+        """
+        checkpoint = random.getrandbits(63) + 1
+        checkpoint_command(checkpoint).resp_encode_into(self._buffer)
+        self.flush()
+        return checkpoint, self.size()
+
+    def rewrite_in_background(self, datastore: DataStore) -> None:
+        if self.rewrite_in_progress:
+            raise RewriteInProgressError
+        self.flush()
+        self._rewrite_buffer = bytearray()
+
+        if not hasattr(os, "fork"):
+            write_aof(self._temp_filename(os.getpid()), datastore)
+            self._finish_rewrite(os.getpid())
+            return
+
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                write_aof(self._temp_filename(os.getpid()), datastore)
+            except BaseException:
+                exit_code = 1
+            os._exit(exit_code)
+
+        self._rewrite_pid = pid
+        logger.info(f"Background append only file rewriting started by pid {pid}")
+
+    def cron(self, datastore: DataStore) -> None:
+        if self.rewrite_in_progress:
+            pid, status = os.waitpid(self._rewrite_pid, os.WNOHANG)
+            if pid == 0:
+                return
+            self._rewrite_pid = None
+            if os.waitstatus_to_exitcode(status) == 0:
+                self._finish_rewrite(pid)
+            else:
+                self._abort_rewrite(pid)
+            return
+
+        if self._should_rewrite():
+            self.rewrite_in_background(datastore)
+
+    def close(self) -> None:
+        self.flush()
+        self._closed.set()
+        if self._appendfsync == APPENDFSYNC_EVERYSEC:
+            self._fsync_thread.join()
+        if self._appendfsync != APPENDFSYNC_NO:
+            os.fsync(self.file.fileno())
+        self.file.close()
 
-        for item in command:
-            self.file.write(item.resp_encode())
+    def _should_rewrite(self) -> bool:
+        if not self._auto_rewrite_percentage:
+            return False
+        size = self.size()
+        if size < self._auto_rewrite_min_size:
+            return False
+        base_size = max(self._rewrite_base_size, 1)
+        growth = (size - base_size) * 100 // base_size
+        return growth >= self._auto_rewrite_percentage
+
+    def _finish_rewrite(self, pid: int) -> None:
+        self.flush()
+        temp_filename = self._temp_filename(pid)
+        with open(temp_filename, mode="ab", buffering=0) as file:
+            write_all(file, self._rewrite_buffer)
+            os.fsync(file.fileno())
+        self._rewrite_buffer = None
+
+        with self._file_lock:
+            os.replace(temp_filename, self._filename)
+            self.file.close()
+            self.file = open(self._filename, mode="ab", buffering=0)
+        self._rewrite_base_size = self.size()
+        logger.info("Background append only file rewriting terminated with success")
+
+    def _abort_rewrite(self, pid: int) -> None:
+        self._rewrite_buffer = None
+        try:
+            os.remove(self._temp_filename(pid))
+        except FileNotFoundError:
+            pass
+        logger.warning("Background append only file rewriting failed")
+
+    def _temp_filename(self, pid: int) -> str:
+        directory = os.path.dirname(self._filename)
+        return os.path.join(directory, f"temp-rewriteaof-bg-{pid}.aof")
+
+    def _fsync_every_second(self) -> None:
+        while not self._closed.wait(1):
+            if self._fsync_pending:
+                self._fsync_pending = False
+                with self._file_lock:
+                    os.fsync(self.file.fileno())
 
 
 class NoPersistence(RedisPersistence):
@@ -25,20 +298,230 @@ class NoPersistence(RedisPersistence):
         pass
 
 
-def restore_from_file(filename: str, datastore: DataStore) -> None:
+NO_PERSISTENCE = NoPersistence()
+
+
+def checkpoint_command(checkpoint: int) -> Array:
+    return Array([BulkString(AOF_CHECKPOINT), BulkString(b"%d" % checkpoint)])
+
+
+def rewrite_commands(datastore: DataStore) -> Iterator[Array]:
+    """Yield the minimal commands which rebuild the live keyspace.
+
+    Deadlines are written as absolute PXAT/PEXPIREAT times, so replaying
+    the file later never extends a key's life.
+    """
+    for key, value, deadline in datastore.dump():
+        if isinstance(value, RedisList):
+            for start in range(0, len(value), AOF_REWRITE_ITEMS_PER_CMD):
+                stop = min(start + AOF_REWRITE_ITEMS_PER_CMD, len(value))
+                items = value.range(start, stop)
+                yield Array(
+                    [BulkString(b"RPUSH"), BulkString(key)]
+                    + [BulkString(item) for item in items]
+                )
+            if deadline is not None:
+                deadline_ms = BulkString(b"%d" % (deadline // 10**6))
+                yield Array([BulkString(b"PEXPIREAT"), BulkString(key), deadline_ms])
+            continue
+
+        command = [BulkString(b"SET"), BulkString(key), BulkString(value)]
+        if deadline is not None:
+            deadline_ms = BulkString(b"%d" % (deadline // 10**6))
+            command += [BulkString(b"PXAT"), deadline_ms]
+        yield Array(command)
+
+
+def write_all(file, data) -> None:
+    """Write all of data to an unbuffered file.
+
+    A raw file may write less than asked, for instance when the disk
+    fills up or a signal interrupts the write, so it is written again
+    from where it stopped.
+    """
+    written = 0
+    with memoryview(data) as view:
+        while written < len(view):
+            written += file.write(view[written:])
+
+
+def write_aof(filename: str, datastore: DataStore) -> None:
     buffer = bytearray()
+    with open(filename, mode="wb", buffering=0) as file:
+        for command in rewrite_commands(datastore):
+            command.resp_encode_into(buffer)
+            if len(buffer) >= WRITE_SIZE:
+                write_all(file, buffer)
+                buffer.clear()
+        write_all(file, buffer)
+        os.fsync(file.fileno())
+
+
+@dataclass
+class AofLoadStats:
+    commands: int = 0
+    size: int = 0
+    start: int = 0
+    loaded: int = 0
+    elapsed: float = 0
+
+    @property
+    def truncated(self) -> int:
+        return self.size - self.loaded
+
+    @property
+    def rate(self) -> float:
+        """Load rate in bytes per second."""
+        return (self.loaded - self.start) / self.elapsed if self.elapsed else 0
+
+
+def restore_from_file(
+    filename: str, datastore: DataStore, offset: int = 0
+) -> AofLoadStats:
+    """Replay an AOF into datastore, walking an mmap of the whole file.
+
+    Replay starts at ``offset``, the end of the AOF covered by a snapshot
+    which was already loaded. A truncated trailing command, as left by a
+    crash mid-write, is ignored with a warning. Progress is logged at most
+    once per LOADING_PROGRESS_INTERVAL seconds.
+    """
+    stats = AofLoadStats(start=offset, loaded=offset)
+    started = last_report = perf_counter()
+
     with open(filename, mode="rb") as file:
-        for line in file:
-            if line.startswith(b"*") and len(buffer) > 0:
-                update_datastore(buffer, datastore)
-                buffer = bytearray()
-            buffer.extend(line)
-    if len(buffer) > 0:
-        update_datastore(buffer, datastore)
+        stats.size = os.fstat(file.fileno()).st_size
+        if stats.size <= offset:
+            return stats
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            frames = protocol.iter_frames(buffer, offset)
+            datastore.loading = True
+            try:
+                for command, position in frames:
+                    update_datastore(command, datastore)
+                    stats.loaded = position
+                    stats.commands += 1
+                    if stats.commands % LOADING_PROGRESS_COMMANDS == 0:
+                        now = perf_counter()
+                        if now - last_report >= LOADING_PROGRESS_INTERVAL:
+                            last_report = now
+                            _log_loading_progress(stats, now - started)
+            finally:
+                datastore.loading = False
+                frames.close()
+
+    stats.elapsed = perf_counter() - started
+    if stats.truncated:
+        logger.warning(
+            f"AOF {filename} ends with a truncated command, "
+            f"ignored the last {stats.truncated} bytes"
+        )
+    logger.info(
+        f"DB loaded from append only file: {stats.elapsed:.3f} seconds, "
+        f"{stats.commands} commands, {stats.rate / 2**20:.2f} MB/s"
+    )
+    return stats
+
+
+def _log_loading_progress(stats: AofLoadStats, elapsed: float) -> None:
+    logger.info(
+        f"Loading AOF: {stats.loaded / 2**20:.1f} of {stats.size / 2**20:.1f} MB "
+        f"({stats.loaded * 100 // stats.size}%), "
+        f"{(stats.loaded - stats.start) / elapsed / 2**20:.2f} MB/s"
+    )
+
+
+def update_datastore(command: Array, datastore: DataStore) -> None:
+    """Apply one logged command, bypassing dispatch for the common ones.
+
+    A command the fast path cannot apply, such as INCR of a key which
+    does not hold an integer, is run by its handler, which replies an
+    error just like it did when the command was first run. The handler is
+    called directly so the replay is not counted in the command stats,
+    SLOWLOG and LATENCY like commands from clients.
+    """
+    name, *args = command
+    replay = REPLAY_COMMANDS.get(bytes(name).upper())
+    try:
+        replayed = replay is not None and replay(datastore, args)
+    except (ValueError, TypeError, IndexError, OverflowError):
+        replayed = False
+    if not replayed:
+        from pyredis.commands import lookup_command
+
+        redis_command = lookup_command(bytes(name))
+        if redis_command is not None and redis_command.accepts(len(command)):
+            redis_command.handler(args, datastore, NO_PERSISTENCE)
+
+
+def _replay_set(datastore: DataStore, args: list) -> bool:
+    if len(args) == 2:
+        datastore[bytes(args[0])] = bytes(args[1])
+        return True
+    if len(args) == 4 and bytes(args[2]).upper() == b"PXAT":
+        deadline = int(bytes(args[3])) * 10**6
+        datastore.set_with_deadline(bytes(args[0]), bytes(args[1]), deadline)
+        return True
+    return False
+
+
+def _replay_mset(datastore: DataStore, args: list) -> bool:
+    datastore.set_many(
+        [(bytes(args[i]), bytes(args[i + 1])) for i in range(0, len(args), 2)]
+    )
+    return True
+
+
+def _replay_pexpireat(datastore: DataStore, args: list) -> bool:
+    datastore.expire_at(bytes(args[0]), int(bytes(args[1])) * 10**6)
+    return True
+
+
+def _replay_del(datastore: DataStore, args: list) -> bool:
+    for arg in args:
+        try:
+            del datastore[bytes(arg)]
+        except KeyError:
+            pass
+    return True
+
+
+def _replay_incr(datastore: DataStore, args: list) -> bool:
+    datastore.increment(bytes(args[0]))
+    return True
+
+
+def _replay_decr(datastore: DataStore, args: list) -> bool:
+    datastore.decrement(bytes(args[0]))
+    return True
+
+
+def _replay_lpush(datastore: DataStore, args: list) -> bool:
+    key = bytes(args[0])
+    for value in args[1:]:
+        datastore.prepend(key, bytes(value))
+    return True
+
+
+def _replay_rpush(datastore: DataStore, args: list) -> bool:
+    key = bytes(args[0])
+    for value in args[1:]:
+        datastore.append(key, bytes(value))
+    return True
+
 
+def _replay_checkpoint(datastore: DataStore, args: list) -> bool:
+    return True
 
-def update_datastore(buffer: bytes, datastore: DataStore) -> None:
-    from pyredis.commands import handle_command
 
-    command, size = protocol.parse(buffer)
-    handle_command(command, datastore, NoPersistence())
+REPLAY_COMMANDS = {
+    b"SET": _replay_set,
+    b"MSET": _replay_mset,
+    b"DEL": _replay_del,
+    b"INCR": _replay_incr,
+    b"DECR": _replay_decr,
+    b"LPUSH": _replay_lpush,
+    b"RPUSH": _replay_rpush,
+    b"PEXPIREAT": _replay_pexpireat,
+    AOF_CHECKPOINT: _replay_checkpoint,
+}
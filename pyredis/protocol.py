@@ -1,4 +1,7 @@
+from typing import Iterator
+
 from pyredis.resp_datatypes import (
+    RedisType,
     SimpleString,
     Error,
     Integer,
@@ -9,75 +12,181 @@ from pyredis.resp_datatypes import (
 PROTOCOL_TERMINATOR = b"\r\n"
 PROTOCOL_TERMINATOR_LEN = len(PROTOCOL_TERMINATOR)
 
+SIMPLE_STRING_BYTE = ord("+")
+ERROR_BYTE = ord("-")
+INTEGER_BYTE = ord(":")
+BULK_STRING_BYTE = ord("$")
+ARRAY_BYTE = ord("*")
+
+INCOMPLETE = -1
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Parser:
+    """Incremental RESP parser walking a single buffer by offset.
+
+    Data is fed as it arrives and complete frames are taken out with
+    get_frame. The parser keeps the elements of a partially received
+    array between reads, so a frame split across reads is never parsed
+    twice and nothing is re-sliced per element.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+        self._pending_arrays = []
+
+    def feed(self, data: bytes) -> None:
+        if self._position:
+            del self._buffer[: self._position]
+            self._position = 0
+        self._buffer.extend(data)
+
+    def get_frame(self):
+        buffer = self._buffer
+        pending_arrays = self._pending_arrays
+
+        with memoryview(buffer) as view:
+            while self._position < len(buffer):
+                position = self._position
+
+                if buffer[position] == ARRAY_BYTE:
+                    terminator_index = buffer.find(PROTOCOL_TERMINATOR, position)
+                    if terminator_index == -1:
+                        return None
+                    array_length = _parse_length(
+                        view[position + 1 : terminator_index], "multibulk"
+                    )
+                    self._position = terminator_index + PROTOCOL_TERMINATOR_LEN
+                    if array_length > 0:
+                        pending_arrays.append((array_length, []))
+                        continue
+                    frame = Array([] if array_length == 0 else None)
+                else:
+                    frame, next_position = _parse_scalar(buffer, view, position)
+                    if next_position == INCOMPLETE:
+                        return None
+                    self._position = next_position
+                    if frame is None:
+                        frame = BulkString(None)
+
+                while pending_arrays:
+                    array_length, elements = pending_arrays[-1]
+                    elements.append(frame)
+                    if len(elements) < array_length:
+                        break
+                    pending_arrays.pop()
+                    frame = Array(elements)
+                else:
+                    return frame
+
+        return None
+
+    def __iter__(self):
+        while (frame := self.get_frame()) is not None:
+            yield frame
+
+
+def iter_frames(buffer, position: int = 0) -> Iterator[tuple[RedisType, int]]:
+    """Yield (frame, next_position) for every complete frame in buffer.
+
+    Works on any object supporting find and the buffer protocol, such as
+    an mmap, and stops quietly at a truncated trailing frame.
+    """
+    with memoryview(buffer) as view:
+        while position < len(buffer):
+            frame, position = _parse(buffer, view, position)
+            if position == INCOMPLETE:
+                return
+            yield frame, position
+
 
 def parse(buffer: bytes):
-    protocol_terminator_index = buffer.find(PROTOCOL_TERMINATOR)
+    try:
+        with memoryview(buffer) as view:
+            frame, next_position = _parse(buffer, view, 0)
+    except ProtocolError:
+        return None, 0
 
-    if protocol_terminator_index == -1:
+    if next_position == INCOMPLETE:
         return None, 0
+    return frame, next_position
+
+
+def _parse(buffer, view, position):
+    if position >= len(buffer) or buffer[position] != ARRAY_BYTE:
+        return _parse_scalar(buffer, view, position)
+
+    terminator_index = buffer.find(PROTOCOL_TERMINATOR, position)
+    if terminator_index == -1:
+        return None, INCOMPLETE
+
+    array_length = _parse_length(view[position + 1 : terminator_index], "multibulk")
+    next_position = terminator_index + PROTOCOL_TERMINATOR_LEN
+
+    if array_length == -1:
+        return Array(None), next_position
+
+    resp_elements = []
+    for _ in range(array_length):
+        element, next_position = _parse(buffer, view, next_position)
+        if next_position == INCOMPLETE:
+            return None, INCOMPLETE
+        resp_elements.append(element)
+
+    return Array(resp_elements), next_position
+
+
+def _parse_scalar(buffer, view, position):
+    terminator_index = buffer.find(PROTOCOL_TERMINATOR, position)
+
+    if terminator_index == -1:
+        return None, INCOMPLETE
+
+    first_byte = buffer[position]
+    data = view[position + 1 : terminator_index]
+    data_length = terminator_index + PROTOCOL_TERMINATOR_LEN
+
+    if first_byte == BULK_STRING_BYTE:
+        string_length = _parse_length(data, "bulk")
+
+        if string_length == -1:
+            return None, data_length
+
+        end = data_length + string_length
+        if len(buffer) < end + PROTOCOL_TERMINATOR_LEN:
+            return None, INCOMPLETE
+        if buffer[end : end + PROTOCOL_TERMINATOR_LEN] != PROTOCOL_TERMINATOR:
+            raise ProtocolError(f"expected CRLF after bulk string at position {end}")
+
+        bulk_string = BulkString(bytes(view[data_length:end]))
+        return bulk_string, end + PROTOCOL_TERMINATOR_LEN
+    if first_byte == SIMPLE_STRING_BYTE:
+        return SimpleString(str(data, "utf-8")), data_length
+    if first_byte == ERROR_BYTE:
+        return Error(str(data, "utf-8")), data_length
+    if first_byte == INTEGER_BYTE:
+        return Integer(_parse_integer(data)), data_length
+
+    raise ProtocolError(f"unexpected byte {chr(first_byte)!r} at position {position}")
+
+
+def _parse_integer(data) -> int:
+    try:
+        return int(data)
+    except ValueError:
+        raise ProtocolError(f"invalid integer {bytes(data)!r}") from None
+
 
-    first_byte = buffer[0]
-    data = buffer[1:protocol_terminator_index].decode()
-    data_length = protocol_terminator_index + PROTOCOL_TERMINATOR_LEN
-
-    match chr(first_byte):
-        case "+":
-            return SimpleString(data), data_length
-        case "-":
-            return Error(data), data_length
-        case ":":
-            return Integer(int(data)), data_length
-        case "$":
-            string_length = int(data)
-
-            if string_length == -1:
-                return None, data_length
-
-            if not is_bulk_string_properly_terminated(
-                buffer, protocol_terminator_index, string_length
-            ):
-                return None, 0
-
-            data = buffer[data_length : data_length + string_length]
-
-            return (
-                BulkString(data),
-                protocol_terminator_index
-                + PROTOCOL_TERMINATOR_LEN
-                + string_length
-                + PROTOCOL_TERMINATOR_LEN,
-            )
-        case "*":
-            array_length = int(data)
-            resp_elements = []
-
-            if array_length == 0:
-                return Array([]), data_length
-
-            if array_length == -1:
-                return Array(None), data_length
-
-            for i in range(0, array_length):
-                additional_resp_elements = buffer[data_length:]
-                element, size = parse(additional_resp_elements)
-                resp_elements.append(element)
-                data_length = data_length + size
-
-            return Array(resp_elements), data_length
-
-    return None, 0
-
-
-def is_bulk_string_properly_terminated(
-    buffer, protocol_terminator_index, string_length
-):
-    return (
-        len(buffer)
-        >= protocol_terminator_index
-        + PROTOCOL_TERMINATOR_LEN
-        + string_length
-        + PROTOCOL_TERMINATOR_LEN
-    )
+def _parse_length(data, kind: str) -> int:
+    """Parse a bulk string or array length, where -1 stands for null."""
+    length = _parse_integer(data)
+    if length < -1:
+        raise ProtocolError(f"invalid {kind} length {length}")
+    return length
 
 
 def encode_message(data_type):
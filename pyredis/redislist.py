@@ -0,0 +1,129 @@
+from typing import Any, Iterable
+
+MIN_CAPACITY = 8
+
+
+class RedisList:
+    """Double-ended list backed by a circular buffer.
+
+    Pushes and pops at both ends are amortised O(1) and every element is
+    reachable by index in O(1), so a range is at most two slices of the
+    backing list regardless of where it starts.
+    """
+
+    __slots__ = ("_items", "_head", "_length")
+
+    def __init__(self, values: Iterable[Any] = ()):
+        self._items = [None] * MIN_CAPACITY
+        self._head = 0
+        self._length = 0
+        for value in values:
+            self.append(value)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self):
+        return iter(self.range(0, self._length))
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("list index out of range")
+        return self._items[(self._head + index) & (len(self._items) - 1)]
+
+    def __eq__(self, other):
+        if isinstance(other, RedisList):
+            return list(self) == list(other)
+        return list(self) == other
+
+    def __repr__(self):
+        return f"RedisList({list(self)!r})"
+
+    def appendleft(self, value: Any) -> int:
+        if self._length == len(self._items):
+            self._resize(len(self._items) * 2)
+        self._head = (self._head - 1) & (len(self._items) - 1)
+        self._items[self._head] = value
+        self._length += 1
+        return self._length
+
+    def append(self, value: Any) -> int:
+        if self._length == len(self._items):
+            self._resize(len(self._items) * 2)
+        tail = (self._head + self._length) & (len(self._items) - 1)
+        self._items[tail] = value
+        self._length += 1
+        return self._length
+
+    def popleft(self) -> Any:
+        if self._length == 0:
+            raise IndexError("pop from an empty list")
+        value = self._items[self._head]
+        self._items[self._head] = None
+        self._head = (self._head + 1) & (len(self._items) - 1)
+        self._length -= 1
+        self._shrink()
+        return value
+
+    def pop(self) -> Any:
+        if self._length == 0:
+            raise IndexError("pop from an empty list")
+        tail = (self._head + self._length - 1) & (len(self._items) - 1)
+        value = self._items[tail]
+        self._items[tail] = None
+        self._length -= 1
+        self._shrink()
+        return value
+
+    def range(self, start: int, stop: int) -> list:
+        """Return the elements in [start, stop), with 0 <= start <= stop <= len."""
+        capacity = len(self._items)
+        begin = (self._head + start) & (capacity - 1)
+        end = begin + stop - start
+        if end <= capacity:
+            return self._items[begin:end]
+        return self._items[begin:] + self._items[: end - capacity]
+
+    def trim(self, start: int, stop: int) -> None:
+        """Keep only the elements in [start, stop), with 0 <= start <= stop <= len."""
+        kept = stop - start
+        if kept < self._length - kept:
+            self._rebuild(self.range(start, stop))
+            return
+        for _ in range(start):
+            self.popleft()
+        for _ in range(self._length - kept):
+            self.pop()
+
+    def _shrink(self) -> None:
+        capacity = len(self._items)
+        if capacity > MIN_CAPACITY and self._length < capacity // 4:
+            self._resize(capacity // 2)
+
+    def _resize(self, capacity: int) -> None:
+        items = self.range(0, self._length)
+        items.extend([None] * (capacity - self._length))
+        self._items = items
+        self._head = 0
+
+    def _rebuild(self, values: list) -> None:
+        capacity = MIN_CAPACITY
+        while capacity < len(values):
+            capacity *= 2
+        self._items = values + [None] * (capacity - len(values))
+        self._head = 0
+        self._length = len(values)
+
+
+def normalize_range(start: int, stop: int, length: int) -> tuple[int, int]:
+    """Turn inclusive, possibly negative LRANGE/LTRIM indexes into [start, stop)."""
+    if start < 0:
+        start = max(length + start, 0)
+    if stop < 0:
+        stop += length
+    stop = min(stop + 1, length)
+    if start >= stop:
+        return 0, 0
+    return start, stop
@@ -0,0 +1,587 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+
+from pyredis.commands import handle_command
+from pyredis.datastore import DataStore
+from pyredis.persistence import (
+    NoPersistence,
+    RedisPersistence,
+    RewriteInProgressError,
+    SaveInProgressError,
+)
+from pyredis.protocol import iter_frames
+from pyredis.resp_datatypes import Array, BulkString, RedisType
+from pyredis.snapshot import load_snapshot_buffer, snapshot_chunks
+from pyredis.stats import server_stats
+
+REPL_BACKLOG_SIZE = 1024 * 1024
+REPL_RECONNECT_INTERVAL = 1
+READ_SIZE = 64 * 1024
+PSYNC = BulkString(b"PSYNC")
+
+logger = logging.getLogger(__name__)
+
+
+def new_replication_id() -> bytes:
+    return os.urandom(20).hex().encode()
+
+
+class ReplicationBacklog:
+    """Ring buffer holding the most recent bytes of the replication stream.
+
+    ``offset`` is the stream offset just past the last byte written, like
+    Redis's master_repl_offset, so a replica that has processed up to some
+    offset can be sent exactly what it missed while it is still here.
+    """
+
+    def __init__(self, size: int = REPL_BACKLOG_SIZE, offset: int = 0):
+        self._buffer = bytearray(size)
+        self._size = size
+        self.offset = offset
+        self.length = 0
+
+    @property
+    def first_offset(self) -> int:
+        return self.offset - self.length
+
+    def append(self, data: bytes) -> None:
+        total = len(data)
+        with memoryview(data) as view, view[-self._size :] as tail:
+            position = (self.offset + total - len(tail)) % self._size
+            first = min(len(tail), self._size - position)
+            self._buffer[position : position + first] = tail[:first]
+            self._buffer[: len(tail) - first] = tail[first:]
+        self.offset += total
+        self.length = min(self.length + total, self._size)
+
+    def read_from(self, offset: int) -> bytes | None:
+        """Return the stream from offset on, None if it is not held anymore."""
+        if not self.first_offset <= offset <= self.offset:
+            return None
+        length = self.offset - offset
+        end = self.offset % self._size
+        start = (end - length) % self._size
+        if start + length <= self._size:
+            return bytes(self._buffer[start : start + length])
+        return bytes(self._buffer[start:] + self._buffer[:end])
+
+
+@dataclass
+class ReplicaHandoff(RedisType):
+    """Reply to SYNC/PSYNC, after which the connection streams writes.
+
+    The connection writes ``data`` (the resync header and either a snapshot
+    or the missed part of the backlog) and then registers itself with
+    ``replication`` to receive the stream. With a ``transfer``, the
+    snapshot follows from a forked child instead of being in ``data``.
+    """
+
+    replication: "ReplicationPersistence"
+    data: bytes
+    transfer: "SnapshotTransfer | None" = None
+
+    def resp_encode(self) -> bytes:
+        return self.data
+
+
+class SnapshotTransfer(asyncio.Protocol):
+    """Streams a snapshot written by a forked child to one replica.
+
+    Like Redis's diskless sync, the child writes the snapshot to a pipe
+    and it is sent on as it is read, so the event loop never serializes
+    the keyspace. Its length is not known upfront, so it follows a
+    ``$EOF:<mark>`` header and ends with the mark. Writes fed to the
+    replica meanwhile are held back until the mark was sent, and the pipe
+    is not read while the replica's connection has paused writing.
+
+    Like Redis, only one child runs at a time, so a transfer asked for
+    while a background save, an AOF rewrite or another transfer runs is
+    forked later by ``cron``. The resync header, with the offset the
+    snapshot is taken at, is only sent then. The child is reaped without
+    blocking, once the pipe is closed or later by ``cron``.
+    """
+
+    def __init__(
+        self, replication: "ReplicationPersistence", datastore: DataStore, psync: bool
+    ):
+        self.mark = new_replication_id()
+        self.pending = bytearray()
+        self._replication = replication
+        self._datastore = datastore
+        self._psync = psync
+        self._pid = None
+        self._status = None
+        self._replica = None
+        self._transport = None
+        self._eof = False
+        self._aborted = False
+
+    @staticmethod
+    def supported() -> bool:
+        """Whether a child can be forked and its pipe read by an event loop."""
+        if not hasattr(os, "fork"):
+            return False
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    @property
+    def forked(self) -> bool:
+        return self._pid is not None
+
+    @property
+    def child_running(self) -> bool:
+        return self._pid is not None and self._status is None
+
+    def start(self, replica) -> None:
+        self._replica = replica
+
+    def fork(self) -> None:
+        """Fork the child writing the snapshot and start sending it."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            exit_code = 0
+            try:
+                with open(write_fd, mode="wb") as pipe:
+                    for chunk in snapshot_chunks(self._datastore):
+                        pipe.write(chunk)
+            except BaseException:
+                exit_code = 1
+            os._exit(exit_code)
+
+        os.close(write_fd)
+        self._pid = pid
+        logger.info(f"Starting snapshot transfer to a replica by pid {pid}")
+        replication = self._replication
+        header = b"$EOF:%s\r\n" % self.mark
+        if self._psync:
+            header = (
+                b"+FULLRESYNC %s %d\r\n"
+                % (replication.replication_id, replication.offset)
+                + header
+            )
+        self._replica.feed_replica(header)
+        pipe = open(read_fd, mode="rb", buffering=0)
+        loop = asyncio.get_running_loop()
+        loop.create_task(loop.connect_read_pipe(lambda: self, pipe))
+
+    def abort(self) -> None:
+        self._aborted = True
+        if self._transport is not None:
+            self._transport.close()
+
+    def reap(self) -> None:
+        """Collect the child's exit status if it has exited, without blocking."""
+        if not self.child_running:
+            return
+        pid, status = os.waitpid(self._pid, os.WNOHANG)
+        if pid == 0:
+            return
+        self._status = status
+        if self._eof:
+            self._finish()
+
+    def connection_made(self, transport):
+        self._transport = transport
+        if self._aborted:
+            transport.close()
+
+    def data_received(self, data: bytes):
+        if self._aborted:
+            return
+        self._replica.feed_replica(data)
+        if self._replica.writing_paused:
+            self._transport.pause_reading()
+            self._replica.call_when_drained(self._transport.resume_reading)
+
+    def connection_lost(self, exc):
+        # The pipe is closed once the child is done, or once we closed it.
+        self._eof = True
+        if self.child_running:
+            self.reap()
+        else:
+            self._finish()
+
+    def _finish(self) -> None:
+        if self._aborted:
+            return
+        if os.waitstatus_to_exitcode(self._status) != 0:
+            logger.warning("Snapshot transfer to a replica failed")
+            self._replica.close_replica()
+            return
+        self._replica.feed_replica(self.mark)
+        if self.pending:
+            self._replica.feed_replica(self.pending)
+        self.pending = bytearray()
+        self._replication.transferred(self._replica)
+
+
+class ReplicationPersistence(RedisPersistence):
+    """Primary/replica replication on top of another persistence.
+
+    As a primary, every logged command is also appended to a replication
+    backlog, created when the first replica connects, and written to each
+    connected replica. As a replica, a ``PrimaryLink`` task applies the
+    primary's stream and the node rejects writes from its own clients.
+
+    A replica that reconnects with the replication id and offset it had
+    reached gets only what it missed when the backlog still holds it
+    (``+CONTINUE``), and a full snapshot otherwise (``+FULLRESYNC``).
+    """
+
+    def __init__(
+        self,
+        persistence: RedisPersistence | None = None,
+        backlog_size: int = REPL_BACKLOG_SIZE,
+    ):
+        self._persistence = persistence or NoPersistence()
+        self._backlog_size = backlog_size
+        self._backlog = None
+        self._previous_id = None
+        self._previous_offset = -1
+        self._replicas = []
+        self._transfers = {}
+        self._transfer_children = []
+        self._rewrite_after_sync = False
+        self._primary = None
+        self.replication_id = new_replication_id()
+        self.read_only = False
+        self.full_syncs = 0
+        self.partial_syncs_ok = 0
+        self.partial_syncs_err = 0
+
+    @property
+    def offset(self) -> int:
+        return 0 if self._backlog is None else self._backlog.offset
+
+    @property
+    def synced(self) -> bool:
+        """Whether this node holds a dataset it can ask to continue from."""
+        return self._backlog is not None
+
+    @property
+    def primary(self) -> "PrimaryLink | None":
+        return self._primary
+
+    @property
+    def replicas(self) -> int:
+        return len(self._replicas)
+
+    def log_command(self, command: Array) -> None:
+        self._persistence.log_command(command)
+        if self._backlog is not None:
+            self.feed(command.resp_encode())
+
+    def feed(self, data: bytes) -> None:
+        self._backlog.append(data)
+        for replica in self._replicas:
+            transfer = self._transfers.get(replica)
+            if transfer is None:
+                replica.feed_replica(data)
+            elif transfer.forked:
+                transfer.pending += data
+
+    def before_reply(self) -> None:
+        self._persistence.before_reply()
+
+    @property
+    def save_in_progress(self) -> bool:
+        return self._persistence.save_in_progress
+
+    @property
+    def rewrite_in_progress(self) -> bool:
+        return self._persistence.rewrite_in_progress
+
+    def rewrite_in_background(self, datastore: DataStore) -> None:
+        self._persistence.rewrite_in_background(datastore)
+
+    def save(self, datastore: DataStore) -> None:
+        self._persistence.save(datastore)
+
+    def save_in_background(self, datastore: DataStore) -> None:
+        self._persistence.save_in_background(datastore)
+
+    def aof_position(self) -> tuple[int, int] | None:
+        return self._persistence.aof_position()
+
+    def persistence_info(self) -> dict:
+        return self._persistence.persistence_info()
+
+    def cron(self, datastore: DataStore) -> None:
+        self._persistence.cron(datastore)
+        if self._rewrite_after_sync:
+            self._rewrite_synced(datastore)
+        for transfer in self._transfer_children:
+            transfer.reap()
+        self._transfer_children = [
+            transfer for transfer in self._transfer_children if transfer.child_running
+        ]
+        self._fork_transfers()
+
+    def close(self) -> None:
+        if self._primary is not None:
+            self._primary.stop()
+        self._persistence.close()
+
+    def sync(
+        self, datastore: DataStore, replication_id: bytes | None, offset: int
+    ) -> ReplicaHandoff:
+        """Answer SYNC (replication_id None) or PSYNC from a replica."""
+        if self._backlog is None:
+            self._backlog = ReplicationBacklog(self._backlog_size)
+
+        if replication_id is not None and self._can_continue(replication_id, offset):
+            self.partial_syncs_ok += 1
+            missed = self._backlog.read_from(offset)
+            header = b"+CONTINUE %s\r\n" % self.replication_id
+            return ReplicaHandoff(self, header + missed)
+
+        if replication_id not in (None, b"?"):
+            self.partial_syncs_err += 1
+        self.full_syncs += 1
+        if SnapshotTransfer.supported():
+            transfer = SnapshotTransfer(self, datastore, replication_id is not None)
+            return ReplicaHandoff(self, b"", transfer)
+        data = bytearray()
+        if replication_id is not None:
+            data += b"+FULLRESYNC %s %d\r\n" % (self.replication_id, self.offset)
+        # Without fork or an event loop, the snapshot is sent inline.
+        snapshot = bytearray()
+        for chunk in snapshot_chunks(datastore):
+            snapshot += chunk
+        data += b"$%d\r\n" % len(snapshot)
+        data += snapshot
+        return ReplicaHandoff(self, data)
+
+    def attach(self, replica, transfer: SnapshotTransfer | None = None) -> None:
+        self._replicas.append(replica)
+        if transfer is not None:
+            self._transfers[replica] = transfer
+            transfer.start(replica)
+            self._fork_transfers()
+        logger.info(f"Replica {replica.peer} attached at offset {self.offset}")
+
+    def _fork_transfers(self) -> None:
+        """Fork a waiting snapshot transfer unless a child is running."""
+        persistence = self._persistence
+        if (
+            self._transfer_children
+            or persistence.save_in_progress
+            or persistence.rewrite_in_progress
+        ):
+            return
+        for transfer in self._transfers.values():
+            if not transfer.forked:
+                transfer.fork()
+                self._transfer_children.append(transfer)
+                return
+
+    def transferred(self, replica) -> None:
+        """Stream writes straight to a replica whose snapshot was sent."""
+        self._transfers.pop(replica, None)
+
+    def detach(self, replica) -> None:
+        transfer = self._transfers.pop(replica, None)
+        if transfer is not None:
+            transfer.abort()
+        if replica in self._replicas:
+            self._replicas.remove(replica)
+            logger.info(f"Replica {replica.peer} detached")
+
+    def replicaof(self, host: str, port: int, datastore: DataStore) -> None:
+        if self._primary is not None:
+            self._primary.stop()
+        self.read_only = True
+        self._primary = PrimaryLink(self, host, port, datastore)
+        self._primary.start()
+
+    def promote(self) -> None:
+        """Stop replicating and accept writes, like REPLICAOF NO ONE.
+
+        A new replication id is started, but replicas of this node that
+        still follow the old one can continue up to the current offset.
+        """
+        if self._primary is None:
+            return
+        self._primary.stop()
+        self._primary = None
+        self.read_only = False
+        self._previous_id = self.replication_id
+        self._previous_offset = self.offset
+        self.replication_id = new_replication_id()
+
+    def full_sync(
+        self, replication_id: bytes, offset: int, snapshot, datastore: DataStore
+    ) -> None:
+        datastore.clear()
+        load_snapshot_buffer(snapshot, datastore)
+        self.replication_id = replication_id
+        self._previous_id = None
+        self._backlog = ReplicationBacklog(self._backlog_size, offset)
+        # The dataset changed under them, so this node's replicas resync.
+        for replica in list(self._replicas):
+            replica.close_replica()
+        self._rewrite_after_sync = True
+        self._rewrite_synced(datastore)
+
+    def _rewrite_synced(self, datastore: DataStore) -> None:
+        """Rewrite the AOF from a synced dataset once no rewrite is running.
+
+        A rewrite already running writes the dataset from before the sync,
+        so a new one is started by ``cron`` after it.
+        """
+        try:
+            self._persistence.rewrite_in_background(datastore)
+        except RewriteInProgressError:
+            return
+        except SaveInProgressError:
+            # Scheduled to start once the background save is done.
+            pass
+        self._rewrite_after_sync = False
+
+    def apply_stream(self, buffer: bytearray, datastore: DataStore) -> int:
+        """Apply every complete command in buffer and return bytes consumed."""
+        position = 0
+        for command, end in iter_frames(buffer):
+            handle_command(command, datastore, self._persistence)
+            self.feed(bytes(buffer[position:end]))
+            position = end
+        return position
+
+    def replication_info(self) -> dict:
+        info = {}
+        if self._primary is None:
+            info["role"] = "master"
+        else:
+            info["role"] = "slave"
+            info["master_host"] = self._primary.host
+            info["master_port"] = self._primary.port
+            info["master_link_status"] = "up" if self._primary.connected else "down"
+        info["connected_slaves"] = len(self._replicas)
+        info["master_replid"] = self.replication_id.decode()
+        info["master_replid2"] = (self._previous_id or b"0" * 40).decode()
+        info["master_repl_offset"] = self.offset
+        info["second_repl_offset"] = self._previous_offset
+        info["repl_backlog_active"] = int(self._backlog is not None)
+        info["repl_backlog_size"] = self._backlog_size
+        if self._backlog is not None:
+            info["repl_backlog_first_byte_offset"] = self._backlog.first_offset
+            info["repl_backlog_histlen"] = self._backlog.length
+        info["sync_full"] = self.full_syncs
+        info["sync_partial_ok"] = self.partial_syncs_ok
+        info["sync_partial_err"] = self.partial_syncs_err
+        return info
+
+    def _can_continue(self, replication_id: bytes, offset: int) -> bool:
+        """Whether a replica at offset of replication_id can be caught up.
+
+        After a promotion, replicas of the old primary keep following the
+        previous id, which is only valid up to where this node diverged.
+        """
+        if replication_id != self.replication_id and (
+            replication_id != self._previous_id or offset > self._previous_offset
+        ):
+            return False
+        return self._backlog.read_from(offset) is not None
+
+
+class PrimaryLink:
+    """The replica side: sync with a primary, then apply its stream.
+
+    The link reconnects after any error, asking for a partial resync from
+    the replication id and offset it had reached.
+    """
+
+    def __init__(
+        self,
+        replication: ReplicationPersistence,
+        host: str,
+        port: int,
+        datastore: DataStore,
+    ):
+        self._replication = replication
+        self._datastore = datastore
+        self._task = None
+        self.host = host
+        self.port = port
+        self.connected = False
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._sync_and_stream()
+            except Exception as e:
+                logger.warning(f"Replication from {self.host}:{self.port} failed: {e}")
+            self.connected = False
+            await asyncio.sleep(REPL_RECONNECT_INTERVAL)
+
+    async def _sync_and_stream(self) -> None:
+        replication = self._replication
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            if replication.synced:
+                replication_id = replication.replication_id
+                offset = b"%d" % replication.offset
+            else:
+                replication_id, offset = b"?", b"-1"
+            psync = Array([PSYNC, BulkString(replication_id), BulkString(offset)])
+            writer.write(psync.resp_encode())
+            reply = (await reader.readuntil(b"\r\n")).split()
+
+            buffer = bytearray()
+            if reply[0] == b"+FULLRESYNC":
+                replication_id, offset = reply[1], int(reply[2])
+                header = await reader.readuntil(b"\r\n")
+                if header.startswith(b"$EOF:"):
+                    snapshot = await _read_until_mark(reader, header[5:-2], buffer)
+                else:
+                    snapshot = await reader.readexactly(int(header[1:]))
+                replication.full_sync(replication_id, offset, snapshot, self._datastore)
+                logger.info(f"Full resync from primary at offset {offset}")
+            elif reply[0] == b"+CONTINUE":
+                replication.replication_id = reply[1]
+                logger.info(f"Partial resync from primary at {replication.offset}")
+            else:
+                raise ValueError(b" ".join(reply).decode(errors="replace"))
+
+            self.connected = True
+            del buffer[: replication.apply_stream(buffer, self._datastore)]
+            address = f"{self.host}:{self.port}"
+            while data := await reader.read(READ_SIZE):
+                buffer += data
+                server_stats.current_client = address
+                del buffer[: replication.apply_stream(buffer, self._datastore)]
+            raise EOFError("primary closed the connection")
+        finally:
+            writer.close()
+
+
+async def _read_until_mark(
+    reader: asyncio.StreamReader, mark: bytes, rest: bytearray
+) -> bytearray:
+    """Read a snapshot ending with mark, leaving what follows it in rest."""
+    snapshot = bytearray()
+    start = 0
+    while (end := snapshot.find(mark, start)) == -1:
+        start = max(0, len(snapshot) - len(mark) + 1)
+        data = await reader.read(READ_SIZE)
+        if not data:
+            raise EOFError("primary closed the connection during the transfer")
+        snapshot += data
+    rest += snapshot[end + len(mark) :]
+    del snapshot[end:]
+    return snapshot
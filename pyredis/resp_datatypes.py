@@ -1,6 +1,17 @@
 import abc
 from dataclasses import dataclass
 
+SHARED_INTEGERS = 10000
+
+OK_REPLY = b"+OK\r\n"
+PONG_REPLY = b"+PONG\r\n"
+NULL_BULK_STRING_REPLY = b"$-1\r\n"
+NULL_ARRAY_REPLY = b"*-1\r\n"
+EMPTY_ARRAY_REPLY = b"*0\r\n"
+
+SIMPLE_STRING_REPLIES = {"OK": OK_REPLY, "PONG": PONG_REPLY}
+INTEGER_REPLIES = tuple(b":%d\r\n" % i for i in range(SHARED_INTEGERS))
+
 
 class RedisType(metaclass=abc.ABCMeta):
 
@@ -13,13 +24,19 @@ class RedisType(metaclass=abc.ABCMeta):
     def resp_encode(self) -> bytes:
         raise NotImplementedError
 
+    def resp_encode_into(self, buffer: bytearray) -> None:
+        buffer += self.resp_encode()
+
 
 @dataclass
 class SimpleString(RedisType):
     _data: str
 
     def resp_encode(self) -> bytes:
-        return f"+{self._data}\r\n".encode()
+        encoded = SIMPLE_STRING_REPLIES.get(self._data)
+        if encoded is None:
+            encoded = b"+%s\r\n" % self._data.encode()
+        return encoded
 
     def resp_decode(self):
         return self._data
@@ -28,12 +45,16 @@ class SimpleString(RedisType):
         return self._data
 
 
+OK = SimpleString("OK")
+PONG = SimpleString("PONG")
+
+
 @dataclass
 class Error(RedisType):
     _data: str
 
     def resp_encode(self) -> bytes:
-        return f"-{self._data}\r\n".encode()
+        return b"-%s\r\n" % self._data.encode()
 
     def __str__(self):
         return self._data
@@ -44,7 +65,9 @@ class Integer(RedisType):
     _data: int
 
     def resp_encode(self) -> bytes:
-        return f":{self._data}\r\n".encode()
+        if 0 <= self._data < SHARED_INTEGERS:
+            return INTEGER_REPLIES[self._data]
+        return b":%d\r\n" % self._data
 
     def __str__(self):
         return str(self._data)
@@ -56,11 +79,22 @@ class BulkString(RedisType):
 
     def resp_encode(self) -> bytes:
         if self._data is None:
-            return b"$-1\r\n"
-        return f"${len(self._data)}\r\n{self._data.decode()}\r\n".encode()
+            return NULL_BULK_STRING_REPLY
+        return b"$%d\r\n%s\r\n" % (len(self._data), self._data)
+
+    def resp_encode_into(self, buffer: bytearray) -> None:
+        if self._data is None:
+            buffer += NULL_BULK_STRING_REPLY
+            return
+        buffer += b"$%d\r\n" % len(self._data)
+        buffer += self._data
+        buffer += b"\r\n"
+
+    def __bytes__(self):
+        return self._data
 
     def __str__(self):
-        return self._data.decode()
+        return self._data.decode(errors="replace")
 
 
 @dataclass
@@ -69,14 +103,23 @@ class Array(RedisType):
 
     def resp_encode(self) -> bytes:
         if self._data is None:
-            return b"*-1\r\n"
+            return NULL_ARRAY_REPLY
 
         if len(self._data) == 0:
-            return b"*0\r\n"
+            return EMPTY_ARRAY_REPLY
 
-        encoded_elements = (element.resp_encode() for element in self._data)
-        encoded_data = b"".join(encoded_elements)
-        return b"*%d\r\n%s" % (len(self._data), encoded_data)
+        buffer = bytearray()
+        self.resp_encode_into(buffer)
+        return buffer
+
+    def resp_encode_into(self, buffer: bytearray) -> None:
+        if self._data is None:
+            buffer += NULL_ARRAY_REPLY
+            return
+
+        buffer += b"*%d\r\n" % len(self._data)
+        for element in self._data:
+            element.resp_encode_into(buffer)
 
     def resp_decode(self):
         return [str(data_type) for data_type in self._data]
@@ -92,3 +135,8 @@ class Array(RedisType):
 
     def __str__(self):
         return " ".join([str(data_type) for data_type in self._data])
+
+
+NULL_BULK_STRING = BulkString(None)
+EMPTY_ARRAY = Array([])
+NULL_ARRAY = Array(None)
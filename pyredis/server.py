@@ -3,10 +3,11 @@ import selectors
 import socket
 import types
 
-from pyredis.commands import handle_command
+from pyredis.commands import handle_command, is_command
 from pyredis.datastore import DataStore
 from pyredis.persistence import AppendOnlyFilePersistence
-from pyredis.protocol import parse
+from pyredis.protocol import Parser, ProtocolError
+from pyredis.resp_datatypes import Error
 
 DEFAULT_PORT = 6379
 DEFAULT_SERVER = "127.0.0.1"
@@ -44,7 +45,7 @@ class Server:
         connection, address = sock.accept()
         self._logger.info(f"Accepted connection from {address}")
         connection.setblocking(False)
-        data = types.SimpleNamespace(addr=address, inb=b"", outb="")
+        data = types.SimpleNamespace(addr=address, parser=Parser(), outb=b"")
         events = selectors.EVENT_READ | selectors.EVENT_WRITE
         sel.register(connection, events, data=data)
 
@@ -54,11 +55,24 @@ class Server:
         if mask & selectors.EVENT_READ:
             recv_data = sock.recv(RECV_SIZE)
             if recv_data:
-                command, size = parse(recv_data)
-                self._logger.info(f"Command received: {command}")
-                result = handle_command(command, self._datastore, self._persistence)
-                self._logger.info(f"Command result: {result.resp_encode()}")
-                data.outb = result.resp_encode()
+                data.parser.feed(recv_data)
+                try:
+                    for command in data.parser:
+                        self._logger.info(f"Command received: {command}")
+                        if not is_command(command):
+                            continue
+                        result = handle_command(
+                            command, self._datastore, self._persistence
+                        )
+                        self._logger.info(f"Command result: {result.resp_encode()}")
+                        data.outb += result.resp_encode()
+                except ProtocolError as e:
+                    sock.sendall(
+                        data.outb + Error(f"ERR Protocol error: {e}").resp_encode()
+                    )
+                    sel.unregister(sock)
+                    sock.close()
+                    return
             else:
                 self._logger.info(f"Closing connection to {data.addr}")
                 sel.unregister(sock)
@@ -0,0 +1,78 @@
+from itertools import islice
+
+SLOT_COUNT = 16384
+
+
+def _crc16_table() -> tuple[int, ...]:
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = (crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+
+CRC16_TABLE = _crc16_table()
+
+
+def crc16(data: bytes) -> int:
+    """CRC16-CCITT (XMODEM), the checksum Redis Cluster hashes keys with."""
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ CRC16_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+def key_hash_slot(key: bytes) -> int:
+    """Map a key to one of the 16384 slots.
+
+    When the key contains a non-empty ``{hashtag}``, only the tag is
+    hashed, so related keys such as ``{user1}:name`` and ``{user1}:age``
+    land in the same slot.
+    """
+    start = key.find(b"{")
+    if start != -1:
+        end = key.find(b"}", start + 1)
+        if end > start + 1:
+            key = key[start + 1 : end]
+    return crc16(key) & (SLOT_COUNT - 1)
+
+
+class SlotIndex:
+    """The keys of every slot, updated as keys are created and removed.
+
+    Like the per-slot dictionaries of Redis Cluster, it lets CLUSTER
+    COUNTKEYSINSLOT and GETKEYSINSLOT look at one slot instead of hashing
+    the whole keyspace, for one hash per key created or removed.
+    """
+
+    __slots__ = ("_keys",)
+
+    def __init__(self):
+        self._keys = {}
+
+    def add(self, key: bytes) -> None:
+        slot = key_hash_slot(key)
+        keys = self._keys.get(slot)
+        if keys is None:
+            keys = self._keys[slot] = set()
+        keys.add(key)
+
+    def discard(self, key: bytes) -> None:
+        slot = key_hash_slot(key)
+        keys = self._keys.get(slot)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[slot]
+
+    def count(self, slot: int) -> int:
+        return len(self._keys.get(slot, ()))
+
+    def keys(self, slot: int, count: int) -> list[bytes]:
+        """Return up to count keys of slot."""
+        return list(islice(self._keys.get(slot, ()), count))
+
+    def clear(self) -> None:
+        self._keys.clear()
@@ -0,0 +1,481 @@
+import logging
+import mmap
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from time import time, time_ns
+from typing import Iterator
+
+from pyredis.datastore import DataStore
+from pyredis.persistence import (
+    NoPersistence,
+    RedisPersistence,
+    RewriteInProgressError,
+    SaveInProgressError,
+    checkpoint_command,
+    restore_from_file,
+    write_all,
+)
+from pyredis.redislist import RedisList
+from pyredis.resp_datatypes import Array
+
+SNAPSHOT_MAGIC = b"PYREDIS"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_HEADER = struct.Struct("<7sBQQQ")
+CHECKSUM = struct.Struct("<I")
+DUMP_VERSION = struct.Struct("<H")
+
+OPCODE_EXPIRETIME_MS = 0xFC
+OPCODE_EOF = 0xFF
+TYPE_STRING = 0
+TYPE_LIST = 1
+
+LENGTH_6BIT = 0
+LENGTH_14BIT = 1
+LENGTH_32BIT = 0x80
+LENGTH_64BIT = 0x81
+ENCODING_INT8 = 0xC0
+ENCODING_INT16 = 0xC1
+ENCODING_INT32 = 0xC2
+INTEGER_ENCODINGS = (
+    (ENCODING_INT8, struct.Struct("<b")),
+    (ENCODING_INT16, struct.Struct("<h")),
+    (ENCODING_INT32, struct.Struct("<i")),
+)
+MAX_INTEGER_LENGTH = 11
+
+LIST_BLOCK_SIZE = 128
+WRITE_SIZE = 64 * 1024
+DEFAULT_SAVE_RULES = ((3600, 1), (300, 100), (60, 10000))
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+@dataclass
+class SnapshotInfo:
+    created: int
+    aof_checkpoint: int
+    aof_offset: int
+
+    def covers(self, aof_filename: str) -> bool:
+        """Whether the AOF holds this snapshot's checkpoint at its offset."""
+        if not self.aof_checkpoint:
+            return False
+        checkpoint = checkpoint_command(self.aof_checkpoint).resp_encode()
+        if self.aof_offset < len(checkpoint):
+            return False
+        try:
+            with open(aof_filename, mode="rb") as file:
+                file.seek(self.aof_offset - len(checkpoint))
+                return file.read(len(checkpoint)) == checkpoint
+        except FileNotFoundError:
+            return False
+
+
+def parse_save_rules(value: str) -> tuple[tuple[int, int], ...]:
+    """Parse Redis's ``save`` format, "3600 1 300 100", empty for no rules."""
+    numbers = value.split()
+    if len(numbers) % 2 or not all(number.isdigit() for number in numbers):
+        raise ValueError("argument must be pairs of seconds and changes")
+    numbers = [int(number) for number in numbers]
+    return tuple(zip(numbers[::2], numbers[1::2]))
+
+
+class SnapshotPersistence(RedisPersistence):
+    """Point-in-time binary snapshots on top of another persistence.
+
+    Logged commands are passed through and counted as changes. ``cron``
+    takes a background snapshot once any ``(seconds, changes)`` save rule
+    is met, like Redis's ``save`` directive, and reaps the forked child.
+    The snapshot records a checkpoint appended to the AOF when it was
+    taken, so only the AOF tail after it has to be replayed at startup.
+    Like Redis, only one child runs at a time: an AOF rewrite asked for
+    during a background save is scheduled for when the save is done, and
+    a background save is refused while the AOF is being rewritten.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        persistence: RedisPersistence | None = None,
+        save_rules: tuple[tuple[int, int], ...] = DEFAULT_SAVE_RULES,
+    ):
+        self._filename = filename
+        self._persistence = persistence or NoPersistence()
+        self._save_rules = save_rules
+        self._save_pid = None
+        self._rewrite_scheduled = False
+        self._dirty_at_save = 0
+        self.dirty = 0
+        self.last_save = int(time())
+        self.last_save_ok = True
+
+    @property
+    def save_in_progress(self) -> bool:
+        return self._save_pid is not None
+
+    @property
+    def rewrite_in_progress(self) -> bool:
+        return self._persistence.rewrite_in_progress
+
+    def log_command(self, command: Array) -> None:
+        self.dirty += 1
+        self._persistence.log_command(command)
+
+    def before_reply(self) -> None:
+        self._persistence.before_reply()
+
+    def rewrite_in_background(self, datastore: DataStore) -> None:
+        if self.save_in_progress:
+            self._rewrite_scheduled = True
+            raise SaveInProgressError
+        self._persistence.rewrite_in_background(datastore)
+
+    def aof_position(self) -> tuple[int, int] | None:
+        return self._persistence.aof_position()
+
+    def persistence_info(self) -> dict:
+        return {
+            "rdb_changes_since_last_save": self.dirty,
+            "rdb_bgsave_in_progress": int(self.save_in_progress),
+            "rdb_last_save_time": self.last_save,
+            "rdb_last_bgsave_status": "ok" if self.last_save_ok else "err",
+            "aof_rewrite_scheduled": int(self._rewrite_scheduled),
+            **self._persistence.persistence_info(),
+        }
+
+    def save(self, datastore: DataStore) -> None:
+        if self.save_in_progress:
+            raise SaveInProgressError
+        write_snapshot(self._filename, datastore, self.aof_position())
+        self._saved(self.dirty, success=True)
+
+    def save_in_background(self, datastore: DataStore) -> None:
+        if self.save_in_progress:
+            raise SaveInProgressError
+        if self.rewrite_in_progress:
+            raise RewriteInProgressError
+        if not hasattr(os, "fork"):
+            self.save(datastore)
+            return
+
+        aof_position = self.aof_position()
+        self._dirty_at_save = self.dirty
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                write_snapshot(self._filename, datastore, aof_position)
+            except BaseException:
+                exit_code = 1
+            os._exit(exit_code)
+
+        self._save_pid = pid
+        logger.info(f"Background saving started by pid {pid}")
+
+    def cron(self, datastore: DataStore) -> None:
+        if self.save_in_progress:
+            pid, status = os.waitpid(self._save_pid, os.WNOHANG)
+            if pid == 0:
+                return
+            self._save_pid = None
+            success = os.waitstatus_to_exitcode(status) == 0
+            self._saved(self._dirty_at_save, success)
+
+        if self._rewrite_scheduled and not self.rewrite_in_progress:
+            self._rewrite_scheduled = False
+            self._persistence.rewrite_in_background(datastore)
+        self._persistence.cron(datastore)
+        if self.rewrite_in_progress:
+            return
+
+        elapsed = time() - self.last_save
+        for seconds, changes in self._save_rules:
+            if self.dirty >= changes and elapsed >= seconds:
+                logger.info(f"{changes} changes in {seconds} seconds. Saving...")
+                self.save_in_background(datastore)
+                return
+
+    def close(self) -> None:
+        self._persistence.close()
+
+    def _saved(self, dirty_at_save: int, success: bool) -> None:
+        self.last_save_ok = success
+        if not success:
+            logger.warning("Background saving failed")
+            return
+        self.dirty -= dirty_at_save
+        self.last_save = int(time())
+        logger.info("DB saved on disk")
+
+
+def write_snapshot(
+    filename: str,
+    datastore: DataStore,
+    aof_position: tuple[int, int] | None = None,
+) -> None:
+    """Write datastore to filename through a temp file swapped in atomically."""
+    temp_filename = os.path.join(
+        os.path.dirname(filename), f"temp-{os.getpid()}.snapshot"
+    )
+    with open(temp_filename, mode="wb", buffering=0) as file:
+        for chunk in snapshot_chunks(datastore, aof_position):
+            write_all(file, chunk)
+        os.fsync(file.fileno())
+
+    os.replace(temp_filename, filename)
+
+
+def snapshot_chunks(
+    datastore: DataStore, aof_position: tuple[int, int] | None = None
+) -> Iterator[bytearray]:
+    """Yield a snapshot of datastore in chunks of about WRITE_SIZE bytes.
+
+    Each chunk is only valid until the next one is requested.
+    """
+    aof_checkpoint, aof_offset = aof_position or (0, 0)
+    buffer = bytearray()
+    buffer += SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        time_ns() // 10**6,
+        aof_checkpoint,
+        aof_offset,
+    )
+    checksum = 0
+
+    for key, value, deadline in datastore.dump():
+        if deadline is not None:
+            buffer.append(OPCODE_EXPIRETIME_MS)
+            buffer += struct.pack("<Q", deadline // 10**6)
+        if isinstance(value, RedisList):
+            _write_list(buffer, key, value)
+        else:
+            buffer.append(TYPE_STRING)
+            _write_string(buffer, key)
+            _write_string(buffer, value)
+        if len(buffer) >= WRITE_SIZE:
+            checksum = zlib.crc32(buffer, checksum)
+            yield buffer
+            buffer.clear()
+
+    buffer.append(OPCODE_EOF)
+    checksum = zlib.crc32(buffer, checksum)
+    buffer += CHECKSUM.pack(checksum)
+    yield buffer
+
+
+def read_snapshot_info(filename: str) -> SnapshotInfo:
+    with open(filename, mode="rb") as file:
+        header = file.read(SNAPSHOT_HEADER.size)
+    return _parse_header(header)
+
+
+def load_snapshot(filename: str, datastore: DataStore) -> SnapshotInfo:
+    """Load every key of a snapshot, dropping those already expired."""
+    with open(filename, mode="rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            try:
+                return load_snapshot_buffer(buffer, datastore)
+            except SnapshotError as e:
+                raise SnapshotError(f"{filename}: {e}") from e
+
+
+def load_snapshot_buffer(buffer, datastore: DataStore) -> SnapshotInfo:
+    """Load a snapshot held in memory, such as one sent to a replica."""
+    info = _parse_header(buffer[: SNAPSHOT_HEADER.size])
+    end = len(buffer) - CHECKSUM.size
+    (checksum,) = CHECKSUM.unpack_from(buffer, end)
+    with memoryview(buffer) as view, view[:end] as content:
+        if zlib.crc32(content) != checksum:
+            raise SnapshotError("checksum mismatch")
+    _load_entries(buffer, SNAPSHOT_HEADER.size, datastore)
+    return info
+
+
+def restore(datastore: DataStore, aof_filename: str, snapshot_filename: str) -> None:
+    """Load the snapshot and the AOF tail it does not cover.
+
+    If the AOF was rewritten after the snapshot was taken, the AOF alone
+    is complete and is replayed in full instead.
+    """
+    aof_exists = os.path.exists(aof_filename)
+    if os.path.exists(snapshot_filename):
+        info = read_snapshot_info(snapshot_filename)
+        if not aof_exists or info.covers(aof_filename):
+            load_snapshot(snapshot_filename, datastore)
+            logger.info("DB loaded from snapshot")
+            if aof_exists:
+                restore_from_file(aof_filename, datastore, info.aof_offset)
+            return
+    if aof_exists:
+        restore_from_file(aof_filename, datastore)
+
+
+def dump_value(value) -> bytes:
+    """Serialize one value the way DUMP does: payload, version, checksum."""
+    buffer = bytearray()
+    if isinstance(value, RedisList):
+        buffer.append(TYPE_LIST)
+        _write_list_items(buffer, value)
+    else:
+        buffer.append(TYPE_STRING)
+        _write_string(buffer, value)
+    buffer += DUMP_VERSION.pack(SNAPSHOT_VERSION)
+    buffer += CHECKSUM.pack(zlib.crc32(buffer))
+    return bytes(buffer)
+
+
+def load_value(payload: bytes):
+    """Deserialize a DUMP payload, checking its version and checksum."""
+    footer_size = DUMP_VERSION.size + CHECKSUM.size
+    if len(payload) < 1 + footer_size:
+        raise SnapshotError("DUMP payload is too short")
+    end = len(payload) - CHECKSUM.size
+    (checksum,) = CHECKSUM.unpack_from(payload, end)
+    (version,) = DUMP_VERSION.unpack_from(payload, end - DUMP_VERSION.size)
+    if version != SNAPSHOT_VERSION or zlib.crc32(payload[:end]) != checksum:
+        raise SnapshotError("DUMP payload version or checksum are wrong")
+
+    try:
+        if payload[0] == TYPE_STRING:
+            value, position = _read_string(payload, 1)
+        elif payload[0] == TYPE_LIST:
+            value, position = _read_list(payload, 1)
+        else:
+            raise SnapshotError(f"unknown value type {payload[0]}")
+    except (IndexError, struct.error) as e:
+        raise SnapshotError("DUMP payload is corrupted") from e
+    if position != end - DUMP_VERSION.size:
+        raise SnapshotError("DUMP payload is corrupted")
+    return value
+
+
+def _parse_header(header: bytes) -> SnapshotInfo:
+    if len(header) < SNAPSHOT_HEADER.size:
+        raise SnapshotError("snapshot is too short")
+    magic, version, *fields = SNAPSHOT_HEADER.unpack(header)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise SnapshotError("not a snapshot file or unsupported version")
+    return SnapshotInfo(*fields)
+
+
+def _load_entries(buffer, position: int, datastore: DataStore) -> None:
+    now = time_ns()
+    deadline = None
+
+    while True:
+        opcode = buffer[position]
+        position += 1
+
+        if opcode == OPCODE_EOF:
+            return
+        if opcode == OPCODE_EXPIRETIME_MS:
+            (deadline_ms,) = struct.unpack_from("<Q", buffer, position)
+            deadline = deadline_ms * 10**6
+            position += 8
+            continue
+
+        key, position = _read_string(buffer, position)
+        if opcode == TYPE_STRING:
+            value, position = _read_string(buffer, position)
+        elif opcode == TYPE_LIST:
+            value, position = _read_list(buffer, position)
+        else:
+            raise SnapshotError(f"unknown value type {opcode}")
+
+        if deadline is None:
+            datastore[key] = value
+        elif deadline > now:
+            datastore.set_with_deadline(key, value, deadline)
+        deadline = None
+
+
+def _write_length(buffer: bytearray, length: int) -> None:
+    if length < 1 << 6:
+        buffer.append(length)
+    elif length < 1 << 14:
+        buffer += struct.pack(">H", LENGTH_14BIT << 14 | length)
+    elif length < 1 << 32:
+        buffer.append(LENGTH_32BIT)
+        buffer += struct.pack(">I", length)
+    else:
+        buffer.append(LENGTH_64BIT)
+        buffer += struct.pack(">Q", length)
+
+
+def _read_length(buffer, position: int) -> tuple[int, int]:
+    first_byte = buffer[position]
+    kind = first_byte >> 6
+    if kind == LENGTH_6BIT:
+        return first_byte & 0x3F, position + 1
+    if kind == LENGTH_14BIT:
+        return (first_byte & 0x3F) << 8 | buffer[position + 1], position + 2
+    if first_byte == LENGTH_32BIT:
+        return struct.unpack_from(">I", buffer, position + 1)[0], position + 5
+    if first_byte == LENGTH_64BIT:
+        return struct.unpack_from(">Q", buffer, position + 1)[0], position + 9
+    raise SnapshotError(f"invalid length encoding {first_byte}")
+
+
+def _write_string(buffer: bytearray, value: bytes) -> None:
+    if 0 < len(value) <= MAX_INTEGER_LENGTH:
+        try:
+            number = int(value)
+        except ValueError:
+            number = None
+        if number is not None and b"%d" % number == value:
+            for encoding, packer in INTEGER_ENCODINGS:
+                try:
+                    packed = packer.pack(number)
+                except struct.error:
+                    continue
+                buffer.append(encoding)
+                buffer += packed
+                return
+
+    _write_length(buffer, len(value))
+    buffer += value
+
+
+def _read_string(buffer, position: int) -> tuple[bytes, int]:
+    first_byte = buffer[position]
+    for encoding, packer in INTEGER_ENCODINGS:
+        if first_byte == encoding:
+            (number,) = packer.unpack_from(buffer, position + 1)
+            return b"%d" % number, position + 1 + packer.size
+
+    length, position = _read_length(buffer, position)
+    return bytes(buffer[position : position + length]), position + length
+
+
+def _write_list(buffer: bytearray, key: bytes, values: RedisList) -> None:
+    buffer.append(TYPE_LIST)
+    _write_string(buffer, key)
+    _write_list_items(buffer, values)
+
+
+def _write_list_items(buffer: bytearray, values: RedisList) -> None:
+    blocks = range(0, len(values), LIST_BLOCK_SIZE)
+    _write_length(buffer, len(blocks))
+    for start in blocks:
+        items = values.range(start, min(start + LIST_BLOCK_SIZE, len(values)))
+        _write_length(buffer, len(items))
+        for item in items:
+            _write_string(buffer, item)
+
+
+def _read_list(buffer, position: int) -> tuple[RedisList, int]:
+    values = RedisList()
+    block_count, position = _read_length(buffer, position)
+    for _ in range(block_count):
+        item_count, position = _read_length(buffer, position)
+        for _ in range(item_count):
+            item, position = _read_string(buffer, position)
+            values.append(item)
+    return values, position
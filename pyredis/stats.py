@@ -0,0 +1,246 @@
+import sys
+from collections import deque
+from dataclasses import dataclass
+from time import time
+from typing import Iterable
+
+LATENCY_BUCKETS = 64
+PERCENTILES = (50, 99, 99.9)
+
+SLOWLOG_LOG_SLOWER_THAN = 10000
+SLOWLOG_MAX_LEN = 128
+SLOWLOG_ENTRY_MAX_ARGC = 32
+SLOWLOG_ENTRY_MAX_STRING = 128
+LATENCY_MONITOR_THRESHOLD = 100
+LATENCY_HISTORY_LEN = 160
+
+
+class CommandStats:
+    """Calls, time and errors of one command, like Redis's cmdstat lines.
+
+    Every call is counted in a latency histogram whose bucket ``i`` holds
+    calls that took less than ``2**i`` microseconds, so recording a call
+    costs a bit_length and two additions, and the call count is derived
+    from the buckets rather than kept separately.
+    """
+
+    __slots__ = ("duration_ns", "rejected_calls", "failed_calls", "buckets")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.duration_ns = 0
+        self.rejected_calls = 0
+        self.failed_calls = 0
+        self.buckets = [0] * LATENCY_BUCKETS
+
+    def record(self, duration_ns: int) -> None:
+        self.duration_ns += duration_ns
+        self.buckets[(duration_ns // 1000).bit_length()] += 1
+
+    @property
+    def calls(self) -> int:
+        return sum(self.buckets)
+
+    @property
+    def usec(self) -> int:
+        return self.duration_ns // 1000
+
+    @property
+    def usec_per_call(self) -> float:
+        return self.duration_ns / self.calls / 1000 if self.calls else 0.0
+
+    def histogram(self) -> list[tuple[int, int]]:
+        """Cumulative (max_usec, calls) pairs for the buckets holding calls."""
+        histogram = []
+        cumulative = 0
+        for index, count in enumerate(self.buckets):
+            if count:
+                cumulative += count
+                histogram.append((1 << index, cumulative))
+        return histogram
+
+    def percentile(self, percent: float) -> int:
+        """Upper bound in microseconds of the bucket holding the percentile."""
+        rank = self.calls * percent / 100
+        cumulative = 0
+        for index, count in enumerate(self.buckets):
+            cumulative += count
+            if count and cumulative >= rank:
+                return 1 << index
+        return 0
+
+
+class ServerStats:
+    """Server-wide counters behind INFO, reset by CONFIG RESETSTAT.
+
+    Per-command stats live on each command table entry instead, so the
+    command path reaches them without a lookup.
+    """
+
+    def __init__(self):
+        self.started = time()
+        self.tcp_port = 0
+        self.connected_clients = 0
+        self.current_client = ""
+        self.event_loop_lag_ms = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self.total_connections_received = 0
+        self.total_net_input_bytes = 0
+        self.total_net_output_bytes = 0
+        self.error_replies = {}
+
+    def error_reply(self, message: str) -> None:
+        prefix = message.split(" ", 1)[0]
+        self.error_replies[prefix] = self.error_replies.get(prefix, 0) + 1
+
+    @property
+    def total_error_replies(self) -> int:
+        return sum(self.error_replies.values())
+
+    @property
+    def uptime(self) -> int:
+        return int(time() - self.started)
+
+
+@dataclass(frozen=True)
+class SlowLogEntry:
+    id: int
+    timestamp: int
+    duration_usec: int
+    args: tuple[bytes, ...]
+    client: str
+    client_name: str = ""
+
+
+class SlowLog:
+    """The most recent commands that ran for at least ``threshold_usec``.
+
+    Like Redis's slowlog-log-slower-than, a negative threshold turns the
+    log off and 0 logs every command. Long commands keep only their first
+    arguments and long arguments their first bytes, so a huge MSET cannot
+    pin its values in memory.
+    """
+
+    def __init__(
+        self,
+        threshold_usec: int = SLOWLOG_LOG_SLOWER_THAN,
+        max_len: int = SLOWLOG_MAX_LEN,
+    ):
+        self.threshold_usec = threshold_usec
+        self._entries = deque(maxlen=max_len)
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def threshold_usec(self) -> int:
+        return self._threshold_usec
+
+    @threshold_usec.setter
+    def threshold_usec(self, threshold_usec: int) -> None:
+        self._threshold_usec = threshold_usec
+        # Compared against every command's duration, so kept ready in ns.
+        self.threshold_ns = sys.maxsize if threshold_usec < 0 else threshold_usec * 1000
+
+    @property
+    def max_len(self) -> int:
+        return self._entries.maxlen
+
+    @max_len.setter
+    def max_len(self, max_len: int) -> None:
+        if max_len < 0:
+            raise ValueError("slowlog-max-len must not be negative")
+        # Newest entries are on the left, keep those.
+        newest = list(self._entries)[:max_len]
+        self._entries = deque(newest, maxlen=max_len)
+
+    def add(self, args: Iterable, duration_ns: int, client: str) -> None:
+        args = [bytes(arg) for arg in args]
+        if len(args) > SLOWLOG_ENTRY_MAX_ARGC:
+            more = len(args) - SLOWLOG_ENTRY_MAX_ARGC + 1
+            args[SLOWLOG_ENTRY_MAX_ARGC - 1 :] = [b"... (%d more arguments)" % more]
+        for index, arg in enumerate(args):
+            if len(arg) > SLOWLOG_ENTRY_MAX_STRING:
+                more = len(arg) - SLOWLOG_ENTRY_MAX_STRING
+                args[index] = arg[:SLOWLOG_ENTRY_MAX_STRING] + (
+                    b"... (%d more bytes)" % more
+                )
+        self._entries.appendleft(
+            SlowLogEntry(
+                self._next_id, int(time()), duration_ns // 1000, tuple(args), client
+            )
+        )
+        self._next_id += 1
+
+    def get(self, count: int | None = None) -> list[SlowLogEntry]:
+        """The newest count entries, newest first, or all of them."""
+        entries = list(self._entries)
+        return entries if count is None else entries[:count]
+
+    def reset(self) -> None:
+        self._entries.clear()
+
+
+@dataclass
+class LatencyEvent:
+    latest_timestamp: int
+    latest_ms: int
+    max_ms: int
+    history: deque
+
+
+class LatencyMonitor:
+    """Latency spikes of named events, like Redis's LATENCY LATEST/HISTORY.
+
+    Samples below ``threshold_ms`` are dropped, and a threshold of 0
+    turns the monitor off. Each event keeps its latest and worst latency
+    and a history of one sample per second, the worst of that second.
+    """
+
+    def __init__(self, threshold_ms: int = LATENCY_MONITOR_THRESHOLD):
+        self.threshold_ms = threshold_ms
+        self.events = {}
+
+    @property
+    def threshold_ms(self) -> int:
+        return self._threshold_ms
+
+    @threshold_ms.setter
+    def threshold_ms(self, threshold_ms: int) -> None:
+        if threshold_ms < 0:
+            raise ValueError("latency-monitor-threshold must not be negative")
+        self._threshold_ms = threshold_ms
+        self.threshold_ns = threshold_ms * 10**6 if threshold_ms else sys.maxsize
+
+    def add_sample(self, name: str, latency_ms: int) -> None:
+        if not self._threshold_ms or latency_ms < self._threshold_ms:
+            return
+        now = int(time())
+        event = self.events.get(name)
+        if event is None:
+            event = self.events[name] = LatencyEvent(
+                now, latency_ms, latency_ms, deque(maxlen=LATENCY_HISTORY_LEN)
+            )
+        event.latest_timestamp = now
+        event.latest_ms = latency_ms
+        event.max_ms = max(event.max_ms, latency_ms)
+        if event.history and event.history[-1][0] == now:
+            if event.history[-1][1] < latency_ms:
+                event.history[-1] = (now, latency_ms)
+        else:
+            event.history.append((now, latency_ms))
+
+    def reset(self, names: Iterable[str] = ()) -> int:
+        """Forget the named events, or all of them, and return how many."""
+        names = list(names) or list(self.events)
+        return sum(self.events.pop(name, None) is not None for name in names)
+
+
+server_stats = ServerStats()
+slow_log = SlowLog()
+latency_monitor = LatencyMonitor()
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import os
+import signal
+import tempfile
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+
+from pyredis.commands import command_keys, handle_command, lookup_command
+from pyredis.datastore import DataStore
+from pyredis.persistence import RedisPersistence
+from pyredis.protocol import Parser
+from pyredis.resp_datatypes import Array, Error, RedisType
+from pyredis.slots import SLOT_COUNT, key_hash_slot
+
+CROSSSLOT_ERROR = Error("CROSSSLOT Keys in request don't hash to the same slot")
+
+logger = logging.getLogger(__name__)
+
+
+class CrossSlotError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Shard:
+    """One worker process and the contiguous slot range it owns.
+
+    ``socket_path`` is the Unix socket other workers forward commands to,
+    and ``port`` the worker's own TCP port used in MOVED redirects.
+    """
+
+    index: int
+    first_slot: int
+    last_slot: int
+    host: str
+    port: int
+    socket_path: str
+    aof_filename: str
+    snapshot_filename: str
+
+
+def plan_shards(
+    workers: int,
+    host: str,
+    port: int,
+    aof_filename: str,
+    snapshot_filename: str,
+) -> list[Shard]:
+    """Split the slots evenly between workers.
+
+    Worker ``i`` gets its own port ``port + 1 + i`` for redirects, and its
+    own AOF and snapshot, suffixed with its index.
+    """
+    if not 1 <= workers <= SLOT_COUNT:
+        raise ValueError(f"workers must be between 1 and {SLOT_COUNT}")
+    socket_directory = tempfile.gettempdir()
+    shards = []
+    for index in range(workers):
+        shards.append(
+            Shard(
+                index=index,
+                first_slot=index * SLOT_COUNT // workers,
+                last_slot=(index + 1) * SLOT_COUNT // workers - 1,
+                host=host,
+                port=port + 1 + index,
+                socket_path=os.path.join(
+                    socket_directory, f"pyredis-{port}-{index}.sock"
+                ),
+                aof_filename=_shard_filename(aof_filename, index),
+                snapshot_filename=_shard_filename(snapshot_filename, index),
+            )
+        )
+    return shards
+
+
+class ShardRouter:
+    """Run a command here or on the worker owning its keys.
+
+    Commands without keys always run locally. Commands whose keys belong
+    to another worker are either forwarded to it over its Unix socket, or
+    answered with a MOVED redirect to its own port when ``redirect`` is
+    set. Keys spread over several workers are rejected with CROSSSLOT.
+    """
+
+    def __init__(self, shards: list[Shard], index: int, redirect: bool = False):
+        self._shards = shards
+        self._index = index
+        self._redirect = redirect
+        self._slot_owners = array("H", bytes(2 * SLOT_COUNT))
+        for shard in shards:
+            for slot in range(shard.first_slot, shard.last_slot + 1):
+                self._slot_owners[slot] = shard.index
+        self._peers = {}
+
+    def handle(
+        self, command: Array, datastore: DataStore, persistence: RedisPersistence
+    ) -> RedisType | asyncio.Future:
+        try:
+            slot = self.slot(command)
+        except CrossSlotError:
+            return CROSSSLOT_ERROR
+        if slot is None or self._slot_owners[slot] == self._index:
+            return handle_command(command, datastore, persistence)
+
+        shard = self._shards[self._slot_owners[slot]]
+        if self._redirect:
+            return Error(f"MOVED {slot} {shard.host}:{shard.port}")
+        return self._forward(shard, command)
+
+    def slot(self, command: Array) -> int | None:
+        """Return the slot of the command's keys, None if it has none."""
+        redis_command = lookup_command(bytes(command[0]))
+        if redis_command is None or not redis_command.accepts(len(command)):
+            return None
+        slot = None
+        owner = None
+        for key in command_keys(redis_command, command):
+            key_slot = key_hash_slot(bytes(key))
+            if owner is None:
+                slot, owner = key_slot, self._slot_owners[key_slot]
+            elif self._slot_owners[key_slot] != owner:
+                raise CrossSlotError
+        return slot
+
+    def close(self) -> None:
+        for peer in self._peers.values():
+            peer.close()
+        self._peers.clear()
+
+    def _forward(self, shard: Shard, command: Array) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        peer = self._peers.get(shard.index)
+        if peer is None or peer.closed:
+            peer = self._peers[shard.index] = PeerConnection(shard.index)
+            loop.create_task(peer.connect(shard.socket_path))
+        future = loop.create_future()
+        peer.send(command, future)
+        return future
+
+
+class PeerConnection(asyncio.Protocol):
+    """A pipelined connection to another worker.
+
+    Replies arrive in the order commands were sent, so each one resolves
+    the oldest waiting future. Commands are buffered and written together
+    once per event loop iteration, or once the connection is up.
+    """
+
+    def __init__(self, index: int):
+        self._index = index
+        self._transport = None
+        self._parser = Parser()
+        self._pending = bytearray()
+        self._flush_scheduled = False
+        self._waiters = deque()
+        self.closed = False
+
+    async def connect(self, path: str) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.create_unix_connection(lambda: self, path)
+        except OSError as e:
+            self.connection_lost(e)
+
+    def send(self, command: Array, future: asyncio.Future) -> None:
+        self._waiters.append(future)
+        command.resp_encode_into(self._pending)
+        if self._transport is not None and not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self._flush()
+
+    def _flush(self) -> None:
+        self._flush_scheduled = False
+        if self._pending and not self.closed:
+            self._transport.write(self._pending)
+            self._pending = bytearray()
+
+    def data_received(self, data: bytes):
+        self._parser.feed(data)
+        for reply in self._parser:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(reply)
+
+    def connection_lost(self, exc):
+        self.closed = True
+        error = Error(f"ERR worker {self._index} is unavailable")
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(error)
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+
+
+def run_workers(shards: list[Shard], serve: Callable[[Shard], None]) -> None:
+    """Fork one process per shard and wait for all of them to exit.
+
+    SIGINT and SIGTERM are passed on to the workers, which raise
+    KeyboardInterrupt on SIGTERM so their persistence is closed cleanly.
+    """
+    pids = {}
+    for shard in shards:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            exit_code = 0
+            try:
+                serve(shard)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                logger.exception(f"Worker {shard.index} failed")
+                exit_code = 1
+            os._exit(exit_code)
+        pids[pid] = shard
+        logger.info(
+            f"Worker {shard.index} started by pid {pid} "
+            f"for slots {shard.first_slot}-{shard.last_slot}"
+        )
+
+    def stop(signum, frame):
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        while pids:
+            pid, status = os.wait()
+            shard = pids.pop(pid)
+            exit_code = os.waitstatus_to_exitcode(status)
+            logger.info(f"Worker {shard.index} exited with code {exit_code}")
+    finally:
+        for shard in shards:
+            if os.path.exists(shard.socket_path):
+                os.remove(shard.socket_path)
+
+
+def _shard_filename(filename: str, index: int) -> str:
+    root, extension = os.path.splitext(filename)
+    return f"{root}-{index}{extension}"
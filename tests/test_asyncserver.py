@@ -0,0 +1,232 @@
+import asyncio
+
+import pytest
+
+from pyredis.asyncserver import (
+    DEFAULT_CLIENT_OUTPUT_BUFFER_LIMIT,
+    REPLY_CHUNK_SIZE,
+    ClientOutputBufferLimit,
+    RedisServerProtocol,
+    parse_client_output_buffer_limit,
+)
+from pyredis.commands import handle_command
+from pyredis.datastore import DataStore
+from pyredis.persistence import NoPersistence
+from pyredis.resp_datatypes import BulkString
+
+
+class FakeTransport:
+    def __init__(self):
+        self.writes = []
+        self.closed = False
+        self.aborted = False
+        self.reading = True
+        self.buffered = 0
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+        self.buffered += len(data)
+
+    def close(self):
+        self.closed = True
+
+    def abort(self):
+        self.aborted = True
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+    def get_extra_info(self, name, default=None):
+        if name == "peername":
+            return ("127.0.0.1", 50000)
+        return default
+
+
+def make_protocol(output_limit=DEFAULT_CLIENT_OUTPUT_BUFFER_LIMIT):
+    protocol = RedisServerProtocol(DataStore(), NoPersistence(), output_limit)
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+    return protocol, transport
+
+
+def test_pipelined_commands_reply_in_one_write():
+    protocol, transport = make_protocol()
+    protocol.data_received(
+        b"*3\r\n$3\r\nset\r\n$3\r\nkey\r\n$5\r\nvalue\r\n"
+        b"*2\r\n$3\r\nget\r\n$3\r\nkey\r\n"
+        b"*1\r\n$4\r\nping\r\n"
+    )
+    assert transport.writes == [b"+OK\r\n$5\r\nvalue\r\n+PONG\r\n"]
+
+
+def test_empty_arrays_are_ignored():
+    protocol, transport = make_protocol()
+    protocol.data_received(b"*0\r\n*1\r\n$4\r\nping\r\n")
+    assert transport.writes == [b"+PONG\r\n"]
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [b"*-1\r\n", b"+PING\r\n", b"*2\r\n$4\r\necho\r\n:1\r\n", b"*x\r\n"],
+    ids=["null array", "not an array", "not a bulk string", "bad length"],
+)
+def test_invalid_requests_are_protocol_errors(frame):
+    protocol, transport = make_protocol()
+    protocol.data_received(b"*1\r\n$4\r\nping\r\n" + frame)
+    [reply] = transport.writes
+    assert reply.startswith(b"+PONG\r\n-ERR Protocol error: ")
+    assert transport.closed
+
+
+def test_partial_command_waits_for_more_data():
+    protocol, transport = make_protocol()
+    protocol.data_received(b"*1\r\n$4\r\nping\r\n*1\r\n$4\r\np")
+    assert transport.writes == [b"+PONG\r\n"]
+    protocol.data_received(b"ing\r\n")
+    assert transport.writes == [b"+PONG\r\n", b"+PONG\r\n"]
+
+
+def test_replies_are_held_while_writing_is_paused():
+    protocol, transport = make_protocol()
+    protocol.pause_writing()
+    assert not transport.reading
+
+    protocol.data_received(b"*1\r\n$4\r\nping\r\n")
+    protocol.data_received(b"*2\r\n$4\r\necho\r\n$2\r\nhi\r\n")
+    assert transport.writes == []
+    assert protocol.output_buffer_size() == 15
+
+    protocol.resume_writing()
+    assert transport.writes == [b"+PONG\r\n$2\r\nhi\r\n"]
+    assert transport.reading
+
+
+def test_client_over_hard_limit_is_disconnected():
+    protocol, transport = make_protocol(ClientOutputBufferLimit(hard_limit=10))
+    protocol.pause_writing()
+    protocol.data_received(b"*1\r\n$4\r\nping\r\n")
+    assert not transport.aborted
+    protocol.data_received(b"*1\r\n$4\r\nping\r\n")
+    assert transport.aborted
+    assert protocol.output_buffer_size() == 0
+
+    protocol.data_received(b"*1\r\n$4\r\nping\r\n")
+    protocol.resume_writing()
+    assert transport.writes == []
+
+
+def test_pipeline_stops_at_hard_limit():
+    protocol, transport = make_protocol(ClientOutputBufferLimit(hard_limit=100))
+    protocol.data_received(b"*1\r\n$4\r\nping\r\n" * 50)
+    assert transport.writes == [b"+PONG\r\n" * 15]
+    assert transport.aborted
+
+
+def test_pipeline_stops_parsing_while_writing_is_paused():
+    protocol, transport = make_protocol()
+    write = transport.write
+
+    def write_over_high_water_mark(data):
+        write(data)
+        protocol.pause_writing()
+
+    transport.write = write_over_high_water_mark
+    value = b"x" * 1000
+    echo = b"*2\r\n$4\r\necho\r\n$1000\r\n%s\r\n" % value
+    reply = b"$1000\r\n%s\r\n" % value
+    count = 2 * REPLY_CHUNK_SIZE // len(reply)
+    protocol.data_received(echo * count)
+    [written] = transport.writes
+    assert REPLY_CHUNK_SIZE <= len(written) < REPLY_CHUNK_SIZE + len(reply)
+    assert not transport.reading
+
+    transport.buffered = 0
+    protocol.resume_writing()
+    assert b"".join(transport.writes) == reply * count
+    assert not transport.reading
+    transport.buffered = 0
+    protocol.resume_writing()
+    assert transport.reading
+
+
+def test_client_over_soft_limit_is_disconnected_after_soft_seconds():
+    async def run(drain):
+        limit = ClientOutputBufferLimit(hard_limit=0, soft_limit=5, soft_seconds=0.01)
+        protocol, transport = make_protocol(limit)
+        transport.buffered = 100
+        protocol.data_received(b"*1\r\n$4\r\nping\r\n")
+        if drain:
+            transport.buffered = 0
+            protocol.resume_writing()
+        await asyncio.sleep(0.05)
+        return transport.aborted
+
+    assert asyncio.run(run(drain=False))
+    assert not asyncio.run(run(drain=True))
+
+
+def test_pipeline_over_soft_limit_replies_in_one_write():
+    async def run():
+        limit = ClientOutputBufferLimit(hard_limit=0, soft_limit=5, soft_seconds=60)
+        protocol, transport = make_protocol(limit)
+        protocol.data_received(b"*1\r\n$4\r\nping\r\n" * 10)
+        protocol.connection_lost(None)
+        return transport.writes
+
+    assert asyncio.run(run()) == [b"+PONG\r\n" * 10]
+
+
+class ForwardingRouter:
+    """Forwards GETs and answers everything else here."""
+
+    def __init__(self):
+        self.forwarded = []
+
+    def handle(self, command, datastore, persistence):
+        if bytes(command[0]) != b"get":
+            return handle_command(command, datastore, persistence)
+        future = asyncio.get_running_loop().create_future()
+        self.forwarded.append((bytes(command[1]), future))
+        return future
+
+
+def test_forwarded_pipeline_replies_in_order():
+    async def run():
+        router = ForwardingRouter()
+        protocol = RedisServerProtocol(DataStore(), NoPersistence(), router=router)
+        transport = FakeTransport()
+        protocol.connection_made(transport)
+        protocol.data_received(
+            b"*2\r\n$3\r\nget\r\n$1\r\na\r\n"
+            b"*1\r\n$4\r\nping\r\n"
+            b"*2\r\n$3\r\nget\r\n$1\r\nb\r\n"
+            b"*2\r\n$4\r\necho\r\n$2\r\nhi\r\n"
+        )
+        assert [key for key, _ in router.forwarded] == [b"a", b"b"]
+        assert not transport.reading
+        (_, first), (_, second) = router.forwarded
+
+        second.set_result(BulkString(b"2"))
+        await asyncio.sleep(0)
+        assert transport.writes == []
+        first.set_result(BulkString(b"1"))
+        await asyncio.sleep(0)
+        assert transport.reading
+        return transport.writes
+
+    assert asyncio.run(run()) == [b"$1\r\n1\r\n+PONG\r\n$1\r\n2\r\n$2\r\nhi\r\n"]
+
+
+def test_parse_client_output_buffer_limit():
+    assert parse_client_output_buffer_limit("1mb 0 30") == ClientOutputBufferLimit(
+        1024**2, 0, 30
+    )
+    for value in ["1mb 0", "1mb 0 x", "1tb 0 30"]:
+        with pytest.raises(ValueError):
+            parse_client_output_buffer_limit(value)
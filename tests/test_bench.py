@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from pyredis.bench import (
+    BenchmarkResult,
+    command_factory,
+    run_tests,
+    start_server,
+    stop_server,
+)
+from pyredis.resp_datatypes import Array, BulkString
+
+
+def test_percentiles():
+    result = BenchmarkResult("get", elapsed_ns=10**9)
+    result.latencies = [i * 10**6 for i in range(1, 1001)]
+    assert result.requests == 1000
+    assert result.throughput == 1000
+    assert result.percentile(50) == 500
+    assert result.percentile(99) == 990
+    assert result.percentile(99.9) == 999
+    assert result.percentile(100) == 1000
+
+
+@pytest.mark.parametrize(
+    "test, expected",
+    [
+        ("set", [b"SET", b"key:__rand_int__", b"xxx"]),
+        ("GET", [b"GET", b"key:__rand_int__"]),
+        ("incr", [b"INCR", b"counter:__rand_int__"]),
+        ("lpush", [b"LPUSH", b"mylist", b"xxx"]),
+        ("lrange_100", [b"LRANGE", b"mylist", b"0", b"99"]),
+    ],
+    ids=["set", "uppercase", "incr", "lpush", "lrange"],
+)
+def test_command_factory(test, expected):
+    assert command_factory(test)() == Array([BulkString(arg) for arg in expected])
+
+
+def test_command_factory_randomizes_keys():
+    next_command = command_factory("get", keyspace=1000, seed=1)
+    keys = {bytes(next_command()[1]) for _ in range(100)}
+    assert len(keys) > 1
+    assert all(key.startswith(b"key:000000000") for key in keys)
+
+
+def test_command_factory_rejects_unknown_tests():
+    with pytest.raises(ValueError):
+        command_factory("flushall")
+
+
+def test_benchmark_in_process_server(tmp_path):
+    async def benchmark():
+        port, server = await start_server(str(tmp_path))
+        try:
+            return await run_tests(
+                "127.0.0.1",
+                port,
+                ["set", "get", "lrange_10"],
+                requests=200,
+                clients=4,
+                pipeline=8,
+                keyspace=50,
+            )
+        finally:
+            await stop_server(server)
+
+    results = asyncio.run(benchmark())
+    assert [result.test for result in results] == ["set", "get", "lrange_10"]
+    for result in results:
+        assert result.requests == 200
+        assert result.errors == 0
+        assert result.throughput > 0
+        assert result.percentile(50) <= result.percentile(99.9)
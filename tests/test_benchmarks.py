@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from benchmarks.runner import (
+    BENCHMARKS,
+    Comparison,
+    compare,
+    load_results,
+    measure,
+    regressions,
+    run_benchmarks,
+    save_results,
+)
+
+
+def results(**best_ns: float) -> dict:
+    return {
+        "benchmarks": {
+            name: {"best_ns": value, "median_ns": value, "loops": 1}
+            for name, value in best_ns.items()
+        }
+    }
+
+
+def test_measure_calibrates_loops():
+    result = measure(lambda: None, min_time=0.001, repeat=2)
+    assert result["loops"] > 1
+    assert 0 < result["best_ns"] <= result["median_ns"]
+
+
+def test_every_benchmark_is_registered_once():
+    names = [bench.name for bench in BENCHMARKS]
+    assert len(names) == len(set(names))
+    assert {name.split(".")[0] for name in names} == {
+        "commands",
+        "datastore",
+        "protocol",
+        "resp",
+    }
+
+
+def test_run_selected_benchmarks(tmp_path):
+    run = run_benchmarks(["*/1k", "commands.*"], min_time=0.0001, repeat=1)
+    assert "datastore.remove_expired_keys/1k" in run["benchmarks"]
+    assert "datastore.get/1m" not in run["benchmarks"]
+
+    filename = tmp_path / "results.json"
+    save_results(run, str(filename))
+    assert load_results(str(filename)) == json.loads(json.dumps(run))
+
+
+@pytest.mark.parametrize(
+    "current, expected",
+    [
+        (105.0, []),
+        (95.0, []),
+        (150.0, ["parse"]),
+    ],
+    ids=["within threshold", "faster", "slower"],
+)
+def test_regressions_against_baseline(current, expected):
+    comparisons = compare(
+        results(parse=100.0, removed=10.0), results(parse=current, added=1.0)
+    )
+    assert [comparison.name for comparison in comparisons] == ["parse"]
+    assert [c.name for c in regressions(comparisons, threshold=0.1)] == expected
+
+
+def test_comparison_change():
+    assert Comparison("parse", 200.0, 150.0).change == pytest.approx(-0.25)
@@ -0,0 +1,252 @@
+import asyncio
+import threading
+
+import pytest
+
+from pyredis.asyncserver import RedisServerProtocol
+from pyredis.cluster import ClusterNode, ClusterState, parse_addresses
+from pyredis.commands import handle_command
+from pyredis.datastore import DataStore
+from pyredis.persistence import NoPersistence
+from pyredis.resp_datatypes import Array, BulkString, Error, Integer, SimpleString
+from pyredis.slots import SlotIndex
+
+# b"bar" hashes to slot 5061, owned by the first node; b"foo" to 12182.
+ADDRESSES = [("127.0.0.1", 7000), ("127.0.0.1", 7001)]
+
+
+def command(*args):
+    return Array([BulkString(arg) for arg in args])
+
+
+def make_node(port=7000, addresses=ADDRESSES):
+    state = ClusterState.from_addresses(addresses, "127.0.0.1", port)
+    datastore = DataStore(slot_index=SlotIndex())
+
+    def run(*args, connection=state.connection()):
+        return connection.handle(command(*args), datastore, NoPersistence())
+
+    return state, datastore, run
+
+
+def test_parse_addresses():
+    assert parse_addresses("127.0.0.1:7000, localhost:7001") == [
+        ("127.0.0.1", 7000),
+        ("localhost", 7001),
+    ]
+
+
+def test_node_must_be_part_of_the_cluster():
+    with pytest.raises(ValueError):
+        ClusterState.from_addresses(ADDRESSES, "127.0.0.1", 7005)
+
+
+def test_cluster_keyslot_and_myid():
+    state, _, run = make_node()
+    assert run(b"cluster", b"keyslot", b"{user1000}.following") == Integer(3443)
+    assert run(b"cluster", b"myid") == BulkString(state.myself.id.encode())
+    assert run(b"cluster", b"nosuchsubcommand") == Error(
+        "ERR unknown subcommand or wrong number of arguments for "
+        "'nosuchsubcommand'. Try CLUSTER HELP."
+    )
+
+
+def test_cluster_slots_and_shards():
+    _, _, run = make_node()
+    first, second = (ClusterNode.from_address(*address) for address in ADDRESSES)
+    assert run(b"cluster", b"slots") == Array(
+        [
+            Array(
+                [
+                    Integer(0),
+                    Integer(8191),
+                    Array(
+                        [
+                            BulkString(b"127.0.0.1"),
+                            Integer(7000),
+                            BulkString(first.id.encode()),
+                        ]
+                    ),
+                ]
+            ),
+            Array(
+                [
+                    Integer(8192),
+                    Integer(16383),
+                    Array(
+                        [
+                            BulkString(b"127.0.0.1"),
+                            Integer(7001),
+                            BulkString(second.id.encode()),
+                        ]
+                    ),
+                ]
+            ),
+        ]
+    )
+    shards = run(b"cluster", b"shards")
+    assert [shard[1] for shard in shards] == [
+        Array([Integer(0), Integer(8191)]),
+        Array([Integer(8192), Integer(16383)]),
+    ]
+
+
+def test_keys_owned_elsewhere_are_moved():
+    _, datastore, run = make_node()
+    assert run(b"set", b"bar", b"1") == SimpleString("OK")
+    assert run(b"get", b"foo") == Error("MOVED 12182 127.0.0.1:7001")
+    assert run(b"mget", b"bar", b"foo") == Error(
+        "CROSSSLOT Keys in request don't hash to the same slot"
+    )
+    assert run(b"ping") == SimpleString("PONG")
+    assert b"foo" not in datastore
+
+
+def test_unassigned_slots_are_not_served():
+    _, _, run = make_node()
+    assert run(b"cluster", b"delslots", b"5061") == SimpleString("OK")
+    assert run(b"get", b"bar") == Error("CLUSTERDOWN Hash slot not served")
+    assert run(b"cluster", b"delslots", b"5061") == Error(
+        "ERR Slot 5061 is already unassigned"
+    )
+    assert run(b"cluster", b"addslotsrange", b"5061", b"5061") == SimpleString("OK")
+    assert run(b"get", b"bar") == BulkString(None)
+
+
+@pytest.mark.parametrize(
+    "slot_index", [SlotIndex(), None], ids=["slot index", "keyspace scan"]
+)
+def test_keys_in_slot(slot_index):
+    state = ClusterState.from_addresses(ADDRESSES, "127.0.0.1", 7000)
+    datastore = DataStore(slot_index=slot_index)
+    connection = state.connection()
+
+    def run(*args):
+        return connection.handle(command(*args), datastore, NoPersistence())
+
+    for key in (b"bar", b"{bar}.1", b"{bar}.2", b"{user1000}.following"):
+        run(b"set", key, b"value")
+    run(b"rpush", b"{bar}.list", b"a")
+    run(b"del", b"{bar}.1")
+    run(b"lpop", b"{bar}.list")
+    assert run(b"cluster", b"countkeysinslot", b"5061") == Integer(2)
+    assert run(b"cluster", b"countkeysinslot", b"3443") == Integer(1)
+    keys = run(b"cluster", b"getkeysinslot", b"5061", b"10")
+    assert sorted(bytes(key) for key in keys) == [b"bar", b"{bar}.2"]
+    assert len(run(b"cluster", b"getkeysinslot", b"5061", b"1")) == 1
+
+    datastore.clear()
+    assert run(b"cluster", b"countkeysinslot", b"5061") == Integer(0)
+
+
+def test_ask_redirect_while_a_slot_migrates():
+    _, _, source = make_node(7000)
+    target_state, _, target = make_node(7001)
+    source_id = ClusterNode.from_address("127.0.0.1", 7000).id.encode()
+    target_id = target_state.myself.id.encode()
+
+    source(b"set", b"bar", b"1")
+    assert target(b"cluster", b"setslot", b"5061", b"importing", source_id) == (
+        SimpleString("OK")
+    )
+    assert source(b"cluster", b"setslot", b"5061", b"migrating", target_id) == (
+        SimpleString("OK")
+    )
+    assert source(b"get", b"bar") == BulkString(b"1")
+    assert source(b"get", b"{bar}.missing") == Error("ASK 5061 127.0.0.1:7001")
+    assert source(b"mget", b"bar", b"{bar}.missing") == Error(
+        "TRYAGAIN Multiple keys request during rehashing of slot"
+    )
+
+    connection = target_state.connection()
+    assert target(b"get", b"bar", connection=connection) == Error(
+        "MOVED 5061 127.0.0.1:7000"
+    )
+    assert target(b"asking", connection=connection) == SimpleString("OK")
+    assert target(b"get", b"bar", connection=connection) == BulkString(None)
+    assert target(b"get", b"bar", connection=connection) == Error(
+        "MOVED 5061 127.0.0.1:7000"
+    )
+
+
+def serve_in_thread(datastore):
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    server = None
+
+    async def start():
+        nonlocal server
+        server = await loop.create_server(
+            lambda: RedisServerProtocol(datastore, NoPersistence()), "127.0.0.1", 0
+        )
+        started.set()
+
+    thread = threading.Thread(
+        target=lambda: (loop.run_until_complete(start()), loop.run_forever())
+    )
+    thread.start()
+    started.wait()
+    port = server.sockets[0].getsockname()[1]
+
+    def stop():
+        loop.call_soon_threadsafe(server.close)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    return port, stop
+
+
+def test_migrate_keys_in_bulk():
+    source = DataStore()
+    target = DataStore()
+    persistence = NoPersistence()
+    port, stop = serve_in_thread(target)
+    try:
+        handle_command(command(b"set", b"key1", b"value1"), source, persistence)
+        handle_command(command(b"rpush", b"key2", b"a", b"b"), source, persistence)
+        handle_command(command(b"expire", b"key2", b"100"), source, persistence)
+        handle_command(command(b"set", b"key3", b"value3"), target, persistence)
+
+        migrate = command(
+            b"migrate", b"127.0.0.1", b"%d" % port, b"", b"0", b"1000", b"keys"
+        )
+        result = handle_command(
+            Array([*migrate, BulkString(b"key1"), BulkString(b"key2")]),
+            source,
+            persistence,
+        )
+        assert result == SimpleString("OK")
+        assert source.dbsize() == 0
+        assert target[b"key1"] == b"value1"
+        assert target.deadline(b"key2") is not None
+        assert handle_command(
+            command(b"lrange", b"key2", b"0", b"-1"), target, persistence
+        ) == Array([BulkString(b"a"), BulkString(b"b")])
+
+        handle_command(command(b"set", b"key3", b"other"), source, persistence)
+        result = handle_command(
+            Array([*migrate, BulkString(b"key3")]), source, persistence
+        )
+        assert str(result).startswith("ERR Target instance replied with error: BUSY")
+        assert source[b"key3"] == b"other"
+        result = handle_command(
+            command(b"migrate", b"127.0.0.1", b"%d" % port, b"nokey", b"0", b"1000"),
+            source,
+            persistence,
+        )
+        assert result == SimpleString("NOKEY")
+    finally:
+        stop()
+
+
+def test_migrate_to_unreachable_target():
+    datastore = DataStore()
+    datastore[b"key"] = b"value"
+    result = handle_command(
+        command(b"migrate", b"127.0.0.1", b"1", b"key", b"0", b"100"),
+        datastore,
+        NoPersistence(),
+    )
+    assert result == Error("IOERR error or timeout connecting to the client")
+    assert datastore[b"key"] == b"value"
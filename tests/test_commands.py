@@ -2,9 +2,10 @@ import time
 
 import pytest
 
-from pyredis.commands import handle_command, encode_command
+from pyredis.commands import COMMANDS, OOM_ERROR, handle_command, encode_command
 from pyredis.datastore import DataStore
 from pyredis.persistence import NoPersistence
+from pyredis.stats import latency_monitor
 from pyredis.resp_datatypes import (
     SimpleString,
     Error,
@@ -269,6 +270,17 @@ def test_incr_invalid_key():
     assert result == Error("ERR value is not an integer or out of range")
 
 
+def test_incr_overflow():
+    datastore = DataStore()
+    command = Array(
+        [BulkString(b"set"), BulkString(b"key"), BulkString(b"9223372036854775807")]
+    )
+    handle_command(command, datastore, no_persistence)
+    command = Array([BulkString(b"incr"), BulkString(b"key")])
+    result = handle_command(command, datastore, no_persistence)
+    assert result == Error("ERR increment or decrement would overflow")
+
+
 def test_incr_command():
     datastore = DataStore()
     for i in range(1, 5):
@@ -277,6 +289,20 @@ def test_incr_command():
         assert result == Integer(i)
 
 
+@pytest.mark.parametrize(
+    "name", [b"get", b"incr", b"decr"], ids=["GET", "INCR", "DECR"]
+)
+def test_string_commands_on_list_key(name):
+    datastore = DataStore()
+    command = Array([BulkString(b"rpush"), BulkString(b"key"), BulkString(b"value")])
+    handle_command(command, datastore, no_persistence)
+    command = Array([BulkString(name), BulkString(b"key")])
+    result = handle_command(command, datastore, no_persistence)
+    assert result == Error(
+        "WRONGTYPE Operation against a key holding the wrong kind of value"
+    )
+
+
 def test_decr_invalid_command():
     datastore = DataStore()
     command = Array([BulkString(b"decr")])
@@ -564,3 +590,634 @@ def test_rpush_lrange_command(command, expected):
     handle_command(lpush, datastore, no_persistence)
     result = handle_command(command, datastore, no_persistence)
     assert result == expected
+
+
+def test_set_get_binary_value():
+    datastore = DataStore()
+    value = b"\xff\xfe\x00binary"
+    command = Array([BulkString(b"set"), BulkString(b"\xc3\x28"), BulkString(value)])
+    result = handle_command(command, datastore, no_persistence)
+    assert result == SimpleString("OK")
+    command = Array([BulkString(b"get"), BulkString(b"\xc3\x28")])
+    result = handle_command(command, datastore, no_persistence)
+    assert result == BulkString(value)
+
+
+def test_get_after_incr():
+    datastore = DataStore()
+    command = Array([BulkString(b"incr"), BulkString(b"key")])
+    handle_command(command, datastore, no_persistence)
+    command = Array([BulkString(b"get"), BulkString(b"key")])
+    result = handle_command(command, datastore, no_persistence)
+    assert result == BulkString(b"1")
+
+
+def make_list(datastore, *values):
+    command = Array(
+        [BulkString(b"rpush"), BulkString(b"myList")]
+        + [BulkString(value) for value in values]
+    )
+    handle_command(command, datastore, no_persistence)
+
+
+@pytest.mark.parametrize(
+    "command, expected, remaining",
+    [
+        (
+            Array([BulkString(b"lpop"), BulkString(b"myList")]),
+            BulkString(b"one"),
+            [b"two", b"three"],
+        ),
+        (
+            Array([BulkString(b"rpop"), BulkString(b"myList")]),
+            BulkString(b"three"),
+            [b"one", b"two"],
+        ),
+        (
+            Array([BulkString(b"lpop"), BulkString(b"myList"), BulkString(b"2")]),
+            Array([BulkString(b"one"), BulkString(b"two")]),
+            [b"three"],
+        ),
+        (
+            Array([BulkString(b"rpop"), BulkString(b"myList"), BulkString(b"5")]),
+            Array([BulkString(b"three"), BulkString(b"two"), BulkString(b"one")]),
+            [],
+        ),
+        (
+            Array([BulkString(b"lpop"), BulkString(b"nosuchkey")]),
+            BulkString(None),
+            [b"one", b"two", b"three"],
+        ),
+        (
+            Array(
+                [
+                    BulkString(b"ltrim"),
+                    BulkString(b"myList"),
+                    BulkString(b"1"),
+                    BulkString(b"-1"),
+                ]
+            ),
+            SimpleString("OK"),
+            [b"two", b"three"],
+        ),
+    ],
+    ids=[
+        "LPOP myList",
+        "RPOP myList",
+        "LPOP myList 2",
+        "RPOP myList 5",
+        "LPOP nosuchkey",
+        "LTRIM myList 1 -1",
+    ],
+)
+def test_list_pop_and_trim_commands(command, expected, remaining):
+    datastore = DataStore()
+    make_list(datastore, b"one", b"two", b"three")
+    result = handle_command(command, datastore, no_persistence)
+    assert result == expected
+    lrange = Array(
+        [
+            BulkString(b"lrange"),
+            BulkString(b"myList"),
+            BulkString(b"0"),
+            BulkString(b"-1"),
+        ]
+    )
+    result = handle_command(lrange, datastore, no_persistence)
+    assert result == Array([BulkString(value) for value in remaining])
+
+
+@pytest.mark.parametrize(
+    "command, expected",
+    [
+        (Array([BulkString(b"llen"), BulkString(b"myList")]), Integer(3)),
+        (Array([BulkString(b"llen"), BulkString(b"nosuchkey")]), Integer(0)),
+        (
+            Array([BulkString(b"lindex"), BulkString(b"myList"), BulkString(b"-1")]),
+            BulkString(b"three"),
+        ),
+        (
+            Array([BulkString(b"lindex"), BulkString(b"myList"), BulkString(b"3")]),
+            BulkString(None),
+        ),
+    ],
+    ids=["LLEN myList", "LLEN nosuchkey", "LINDEX myList -1", "LINDEX myList 3"],
+)
+def test_llen_lindex_commands(command, expected):
+    datastore = DataStore()
+    make_list(datastore, b"one", b"two", b"three")
+    result = handle_command(command, datastore, no_persistence)
+    assert result == expected
+
+
+def test_info_expiry_section():
+    datastore = DataStore()
+    command = Array([BulkString(b"info"), BulkString(b"expiry")])
+    result = handle_command(command, datastore, no_persistence)
+    assert str(result).startswith("# Expiry\r\nactive_expire_mode:sample\r\n")
+
+
+def info_fields(result: BulkString) -> dict:
+    return dict(
+        line.split(":", 1)
+        for line in str(result).split("\r\n")
+        if line and not line.startswith("#")
+    )
+
+
+def test_info_default_sections():
+    datastore = DataStore()
+    datastore[b"key"] = b"value"
+    datastore.set_with_expiry(b"volatile", b"value", 100)
+    result = handle_command(encode_command("info"), datastore, no_persistence)
+    titles = [line for line in str(result).split("\r\n") if line.startswith("#")]
+    assert titles == [
+        "# Server",
+        "# Clients",
+        "# Memory",
+        "# Persistence",
+        "# Stats",
+        "# Replication",
+        "# Expiry",
+        "# Errorstats",
+        "# Keyspace",
+    ]
+    fields = info_fields(result)
+    assert fields["role"] == "master"
+    assert fields["aof_enabled"] == "0"
+    assert fields["db0"].startswith("keys=2,expires=1,avg_ttl=")
+    assert 90000 < int(fields["db0"].rsplit("=", 1)[1]) <= 100000
+
+
+def test_commandstats_and_resetstat():
+    datastore = DataStore()
+
+    def run(command):
+        return handle_command(encode_command(command), datastore, no_persistence)
+
+    assert run("config resetstat") == SimpleString("OK")
+    run("set key value")
+    run("incr key")
+    run("get")
+    run("nosuchcommand")
+
+    fields = info_fields(run("info commandstats errorstats stats"))
+    assert fields["cmdstat_set"].startswith("calls=1,usec=")
+    assert fields["cmdstat_incr"].endswith("rejected_calls=0,failed_calls=1")
+    assert fields["cmdstat_get"].startswith("calls=0,")
+    assert fields["cmdstat_get"].endswith("rejected_calls=1,failed_calls=0")
+    assert fields["errorstat_ERR"] == "count=3"
+    assert fields["total_commands_processed"] == "3"
+    assert fields["total_error_replies"] == "3"
+
+    latency = info_fields(run("info latencystats"))
+    assert latency["latency_percentiles_usec_set"].startswith("p50=")
+    assert "latency_percentiles_usec_get" not in latency
+
+    run("config resetstat")
+    fields = info_fields(run("info all"))
+    assert "cmdstat_set" not in fields
+    assert fields["total_error_replies"] == "0"
+
+
+def test_latency_histogram():
+    datastore = DataStore()
+    handle_command(encode_command("config resetstat"), datastore, no_persistence)
+    for _ in range(3):
+        handle_command(encode_command("set key value"), datastore, no_persistence)
+
+    result = handle_command(
+        encode_command("latency histogram SET get"), datastore, no_persistence
+    )
+    name, details = result
+    assert name == BulkString(b"set")
+    assert details[:3] == [
+        BulkString(b"calls"),
+        Integer(3),
+        BulkString(b"histogram_usec"),
+    ]
+    assert details[3][-1] == Integer(3)
+    assert handle_command(
+        encode_command("latency nosuch"), datastore, no_persistence
+    ) == Error(
+        "ERR unknown subcommand or wrong number of arguments for 'nosuch'. "
+        "Try LATENCY HELP."
+    )
+
+
+def test_slowlog():
+    datastore = DataStore()
+
+    def run(command):
+        return handle_command(encode_command(command), datastore, no_persistence)
+
+    assert run("config set slowlog-log-slower-than 0") == SimpleString("OK")
+    try:
+        run("slowlog reset")
+        run("set key value")
+        run("get key")
+        entries = run("slowlog get")
+        assert [entry[3] for entry in entries] == [
+            Array([BulkString(arg) for arg in args])
+            for args in (
+                [b"get", b"key"],
+                [b"set", b"key", b"value"],
+                [b"slowlog", b"reset"],
+            )
+        ]
+        [latest] = run("slowlog get 1")
+        assert latest[3] == Array([BulkString(b"slowlog"), BulkString(b"get")])
+        assert run("slowlog len") == Integer(5)
+        assert run("slowlog get -2") == Error(
+            "ERR count should be greater than or equal to -1"
+        )
+    finally:
+        run("config set slowlog-log-slower-than 10000")
+    assert run("slowlog reset") == SimpleString("OK")
+    run("get key")
+    assert run("slowlog len") == Integer(0)
+
+
+@pytest.mark.parametrize(
+    "command, expected",
+    [
+        (
+            "config get slowlog-*",
+            [b"slowlog-log-slower-than", b"10000", b"slowlog-max-len", b"128"],
+        ),
+        (
+            "config get LATENCY-MONITOR-THRESHOLD",
+            [b"latency-monitor-threshold", b"100"],
+        ),
+        ("config get maxclients", []),
+    ],
+    ids=["pattern", "case", "unknown"],
+)
+def test_config_get(command, expected):
+    result = handle_command(encode_command(command), DataStore(), no_persistence)
+    assert result == Array([BulkString(value) for value in expected])
+
+
+@pytest.mark.parametrize(
+    "command, expected",
+    [
+        (
+            "config set maxclients 10",
+            "ERR Unknown option or number of arguments for CONFIG SET - 'maxclients'",
+        ),
+        (
+            "config set slowlog-max-len many",
+            "ERR CONFIG SET failed (possibly related to argument 'slowlog-max-len') - "
+            "argument couldn't be parsed into an integer",
+        ),
+        (
+            "config set slowlog-max-len -1",
+            "ERR CONFIG SET failed - slowlog-max-len must not be negative",
+        ),
+        (
+            "config set slowlog-max-len",
+            "ERR unknown subcommand or wrong number of arguments for 'set'. "
+            "Try CONFIG HELP.",
+        ),
+    ],
+    ids=["unknown", "not an integer", "negative", "missing value"],
+)
+def test_config_set_errors(command, expected):
+    result = handle_command(encode_command(command), DataStore(), no_persistence)
+    assert result == Error(expected)
+
+
+def test_latency_latest_and_history():
+    datastore = DataStore()
+
+    def run(command):
+        return handle_command(encode_command(command), datastore, no_persistence)
+
+    run("latency reset")
+    latency_monitor.add_sample("expire-cycle", 150)
+    latency_monitor.add_sample("aof-write", 120)
+    [latest, _] = run("latency latest")
+    assert latest[0] == BulkString(b"expire-cycle")
+    assert latest[2:] == [Integer(150), Integer(150)]
+    [sample] = run("latency history expire-cycle")
+    assert sample[1] == Integer(150)
+    assert run("latency history missing") == Array([])
+    assert run("latency reset aof-write") == Integer(1)
+    assert run("latency reset") == Integer(1)
+    assert run("latency latest") == Array([])
+
+
+def test_config_set_maxmemory():
+    datastore = DataStore()
+
+    def run(command):
+        return handle_command(encode_command(command), datastore, no_persistence)
+
+    assert run("config set maxmemory 2mb maxmemory-policy ALLKEYS-LFU") == SimpleString(
+        "OK"
+    )
+    assert datastore.maxmemory == 2 * 1024**2
+    assert run("config get maxmemory*") == Array(
+        [
+            BulkString(value)
+            for value in [
+                b"maxmemory",
+                b"2097152",
+                b"maxmemory-policy",
+                b"allkeys-lfu",
+                b"maxmemory-samples",
+                b"5",
+                b"maxmemory-eviction-tenacity",
+                b"10",
+            ]
+        ]
+    )
+    assert run("config set maxmemory-policy fifo") == Error(
+        "ERR CONFIG SET failed (possibly related to argument 'maxmemory-policy') - "
+        "argument(s) must be one of the following: noeviction, allkeys-lru, "
+        "volatile-lru, allkeys-lfu, volatile-lfu, allkeys-random, volatile-random, "
+        "volatile-ttl"
+    )
+    assert run("config set maxmemory lots") == Error(
+        "ERR CONFIG SET failed (possibly related to argument 'maxmemory') - "
+        "argument must be a memory value"
+    )
+    fields = info_fields(run("info memory"))
+    assert fields["maxmemory"] == "2097152"
+    assert fields["maxmemory_policy"] == "allkeys-lfu"
+    assert int(fields["used_memory"]) == datastore.used_memory
+
+
+def test_oom_under_noeviction():
+    datastore = DataStore(maxmemory=1)
+
+    def run(command):
+        return handle_command(encode_command(command), datastore, no_persistence)
+
+    datastore[b"key"] = b"value"
+    assert run("set other value") == OOM_ERROR
+    assert run("lpush list value") == OOM_ERROR
+    assert run("get key") == BulkString(b"value")
+    assert run("del key") == Integer(1)
+    assert run("set other value") == SimpleString("OK")
+
+
+class RecordingPersistence(NoPersistence):
+    def __init__(self):
+        self.commands = []
+
+    def log_command(self, command):
+        self.commands.append(command)
+
+
+def test_set_with_ttl_is_logged_with_absolute_deadline():
+    datastore = DataStore()
+    persistence = RecordingPersistence()
+    command = Array(
+        [
+            BulkString(b"set"),
+            BulkString(b"key"),
+            BulkString(b"value"),
+            BulkString(b"ex"),
+            BulkString(b"10"),
+        ]
+    )
+    before_ms = time.time_ns() // 10**6
+    handle_command(command, datastore, persistence)
+
+    (logged,) = persistence.commands
+    assert list(logged)[:4] == [
+        BulkString(b"SET"),
+        BulkString(b"key"),
+        BulkString(b"value"),
+        BulkString(b"PXAT"),
+    ]
+    assert 0 <= int(bytes(logged[4])) - before_ms - 10000 < 1000
+
+
+def test_set_with_past_pxat_removes_key():
+    datastore = DataStore()
+    handle_command(
+        Array([BulkString(b"set"), BulkString(b"key"), BulkString(b"value")]),
+        datastore,
+        no_persistence,
+    )
+    command = Array(
+        [
+            BulkString(b"set"),
+            BulkString(b"key"),
+            BulkString(b"value"),
+            BulkString(b"pxat"),
+            BulkString(b"1000"),
+        ]
+    )
+    assert handle_command(command, datastore, no_persistence) == SimpleString("OK")
+    assert datastore.dbsize() == 0
+
+
+def test_expire_ttl_and_persist():
+    datastore = DataStore()
+    persistence = RecordingPersistence()
+
+    def run(*args):
+        command = Array([BulkString(arg) for arg in args])
+        return handle_command(command, datastore, persistence)
+
+    assert run(b"ttl", b"key") == Integer(-2)
+    assert run(b"expire", b"key", b"10") == Integer(0)
+    run(b"set", b"key", b"value")
+    assert run(b"ttl", b"key") == Integer(-1)
+    assert run(b"expire", b"key", b"10") == Integer(1)
+    assert run(b"ttl", b"key") == Integer(10)
+    assert 9000 < int(str(run(b"pttl", b"key"))) <= 10000
+    assert persistence.commands[-1][0] == BulkString(b"PEXPIREAT")
+    assert run(b"persist", b"key") == Integer(1)
+    assert run(b"persist", b"key") == Integer(0)
+    assert run(b"ttl", b"key") == Integer(-1)
+    assert run(b"pexpireat", b"key", b"1000") == Integer(1)
+    assert run(b"get", b"key") == BulkString(None)
+
+
+def test_expire_invalid_arguments():
+    datastore = DataStore()
+    command = Array([BulkString(b"expire"), BulkString(b"key")])
+    result = handle_command(command, datastore, no_persistence)
+    assert result == Error("ERR wrong number of arguments for 'expire' command")
+    command = Array([BulkString(b"expire"), BulkString(b"key"), BulkString(b"x")])
+    result = handle_command(command, datastore, no_persistence)
+    assert result == Error("ERR value is not an integer or out of range")
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        Array([BulkString(b"get")]),
+        Array([BulkString(b"get"), BulkString(b"key"), BulkString(b"other")]),
+        Array([BulkString(b"lrange"), BulkString(b"key"), BulkString(b"0")]),
+        Array([BulkString(b"lpush"), BulkString(b"key")]),
+        Array([BulkString(b"bgsave"), BulkString(b"schedule")]),
+    ],
+    ids=["GET", "GET key other", "LRANGE key 0", "LPUSH key", "BGSAVE schedule"],
+)
+def test_arity_is_checked_before_dispatch(command):
+    persistence = RecordingPersistence()
+    result = handle_command(command, DataStore(), persistence)
+    name = str(command[0])
+    assert result == Error(f"ERR wrong number of arguments for '{name}' command")
+    assert persistence.commands == []
+
+
+def test_command_names_are_case_insensitive():
+    datastore = DataStore()
+    for name in (b"SET", b"set", b"SeT"):
+        command = Array([BulkString(name), BulkString(b"key"), BulkString(b"value")])
+        assert handle_command(command, datastore, no_persistence) == SimpleString("OK")
+
+
+def test_only_successful_writes_are_logged():
+    datastore = DataStore()
+    persistence = RecordingPersistence()
+
+    def run(*args):
+        command = Array([BulkString(arg) for arg in args])
+        return handle_command(command, datastore, persistence)
+
+    run(b"get", b"key")
+    run(b"incr", b"counter")
+    run(b"lpush", b"counter", b"value")
+    run(b"del", b"counter")
+    assert persistence.commands == [
+        Array([BulkString(b"incr"), BulkString(b"counter")]),
+        Array([BulkString(b"del"), BulkString(b"counter")]),
+    ]
+
+
+def test_command_count_and_info():
+    command = Array([BulkString(b"command"), BulkString(b"count")])
+    count = handle_command(command, data_store, no_persistence)
+    assert count == Integer(len(COMMANDS))
+    command = Array([BulkString(b"COMMAND")])
+    everything = handle_command(command, data_store, no_persistence)
+    assert len(everything) == len(COMMANDS)
+
+    result = handle_command(
+        Array(
+            [
+                BulkString(b"command"),
+                BulkString(b"info"),
+                BulkString(b"GET"),
+                BulkString(b"nosuchcommand"),
+            ]
+        ),
+        data_store,
+        no_persistence,
+    )
+    assert result == Array(
+        [
+            Array(
+                [
+                    BulkString(b"get"),
+                    Integer(2),
+                    Array([SimpleString("readonly"), SimpleString("fast")]),
+                    Integer(1),
+                    Integer(1),
+                    Integer(1),
+                ]
+            ),
+            Array(None),
+        ]
+    )
+
+
+def test_mset_mget_and_msetnx():
+    datastore = DataStore()
+    persistence = RecordingPersistence()
+
+    def run(*args):
+        command = Array([BulkString(arg) for arg in args])
+        return handle_command(command, datastore, persistence)
+
+    assert run(b"mset", b"key1", b"value1", b"key2", b"value2") == SimpleString("OK")
+    run(b"rpush", b"list", b"item")
+    assert run(b"mget", b"key1", b"missing", b"list", b"key2") == Array(
+        [
+            BulkString(b"value1"),
+            BulkString(None),
+            BulkString(None),
+            BulkString(b"value2"),
+        ]
+    )
+    assert run(b"msetnx", b"key3", b"value3", b"key1", b"other") == Integer(0)
+    assert run(b"get", b"key3") == BulkString(None)
+    assert run(b"msetnx", b"key3", b"value3", b"key4", b"value4") == Integer(1)
+    assert run(b"mset", b"key1") == Error(
+        "ERR wrong number of arguments for 'mset' command"
+    )
+    assert run(b"msetnx", b"key1", b"value1", b"key2") == Error(
+        "ERR wrong number of arguments for 'msetnx' command"
+    )
+    assert [command[0] for command in persistence.commands] == [
+        BulkString(b"mset"),
+        BulkString(b"rpush"),
+        BulkString(b"MSET"),
+    ]
+
+
+def test_dump_and_restore():
+    datastore = DataStore()
+    persistence = RecordingPersistence()
+
+    def run(*args):
+        command = Array([BulkString(arg) for arg in args])
+        return handle_command(command, datastore, persistence)
+
+    run(b"rpush", b"list", b"a", b"b")
+    payload = bytes(run(b"dump", b"list"))
+    assert run(b"dump", b"missing") == BulkString(None)
+    assert run(b"restore", b"list", b"0", payload) == Error(
+        "BUSYKEY Target key name already exists."
+    )
+    assert run(b"restore", b"copy", b"10000", payload) == SimpleString("OK")
+    assert run(b"lrange", b"copy", b"0", b"-1") == Array(
+        [BulkString(b"a"), BulkString(b"b")]
+    )
+    assert 9000 < int(str(run(b"pttl", b"copy"))) <= 10000
+    assert persistence.commands[-1][-2:] == [
+        BulkString(b"REPLACE"),
+        BulkString(b"ABSTTL"),
+    ]
+    assert run(b"restore", b"copy", b"0", b"garbage", b"replace") == Error(
+        "ERR DUMP payload version or checksum are wrong"
+    )
+    assert run(b"restore", b"list", b"0", payload, b"replace") == SimpleString("OK")
+    assert run(b"ttl", b"list") == Integer(-1)
+
+
+def test_evicted_keys_are_logged_as_one_del():
+    datastore = DataStore(maxmemory=1, maxmemory_policy="allkeys-random")
+    persistence = RecordingPersistence()
+    datastore[b"key"] = b"value"
+    datastore[b"key2"] = b"value"
+
+    assert handle_command(
+        encode_command("set other value"), datastore, persistence
+    ) == SimpleString("OK")
+    [deleted, logged] = persistence.commands
+    assert deleted[0] == BulkString(b"DEL")
+    assert sorted(bytes(key) for key in deleted[1:]) == [b"key", b"key2"]
+    assert logged == encode_command("SET other value")
+    assert datastore.evicted_keys == 2
+    assert b"other" in datastore
+
+
+def test_writes_go_ahead_while_eviction_is_pending():
+    datastore = DataStore(
+        maxmemory=1, maxmemory_policy="allkeys-random", maxmemory_eviction_tenacity=0
+    )
+    for i in range(100):
+        datastore[b"key:%d" % i] = b"value"
+
+    assert handle_command(
+        encode_command("set other value"), datastore, no_persistence
+    ) == SimpleString("OK")
+    assert datastore.eviction_pending
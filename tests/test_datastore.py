@@ -2,7 +2,9 @@ import time
 
 import pytest
 
-from pyredis.datastore import DataStore
+from pyredis.datastore import DataStore, entry_size
+from pyredis.eviction import EVICTION_CHECK_KEYS, AccessIndex
+from pyredis.expiry import ExpiryScheduler
 
 
 def test_contains():
@@ -58,3 +60,276 @@ def test_decrement():
     datastore["key"] = "1"
     incremented = datastore.decrement("key")
     assert incremented == 0
+
+
+@pytest.mark.parametrize(
+    "value",
+    [b" 12", b"12 ", b"+1", b"01", b"-0", b"1_0", b"1.5", b"", b"9223372036854775808"],
+    ids=[
+        "leading space",
+        "trailing space",
+        "plus sign",
+        "leading zero",
+        "negative zero",
+        "underscore",
+        "float",
+        "empty",
+        "out of range",
+    ],
+)
+def test_increment_rejects_non_canonical_integers(value):
+    datastore = DataStore()
+    datastore[b"key"] = value
+    with pytest.raises(ValueError):
+        datastore.increment(b"key")
+    assert datastore[b"key"] == value
+
+
+@pytest.mark.parametrize(
+    "value, method",
+    [(b"9223372036854775807", "increment"), (b"-9223372036854775808", "decrement")],
+    ids=["INCR", "DECR"],
+)
+def test_increment_overflow(value, method):
+    datastore = DataStore()
+    datastore[b"key"] = value
+    with pytest.raises(OverflowError):
+        getattr(datastore, method)(b"key")
+    assert datastore[b"key"] == value
+
+
+def test_set_clears_expiry():
+    datastore = DataStore()
+    datastore.set_with_expiry("key", "value", 0.01)
+    datastore["key"] = "value"
+    time.sleep(0.05)
+    assert datastore["key"] == "value"
+
+
+def test_increment_keeps_expiry():
+    datastore = DataStore()
+    datastore.set_with_expiry("key", b"1", 0.01)
+    assert datastore.increment("key") == 2
+    time.sleep(0.05)
+    assert "key" not in datastore
+
+
+def test_contains_expired_key():
+    datastore = DataStore()
+    datastore.set_with_expiry("key", "value", 0.01)
+    time.sleep(0.05)
+    assert "key" not in datastore
+    assert datastore.dbsize() == 0
+
+
+def test_expire_actively_ignores_persistent_keys():
+    datastore = DataStore()
+    for i in range(1000):
+        datastore[f"persistent{i}"] = "value"
+    for i in range(100):
+        datastore.set_with_expiry(f"volatile{i}", "value", 0.01)
+    time.sleep(0.05)
+
+    assert datastore.remove_expired_keys() == 100
+    assert datastore.dbsize() == 1000
+
+
+def test_expire_actively_stops_at_time_budget():
+    datastore = DataStore()
+    for i in range(1000):
+        datastore.set_with_expiry(f"key{i}", "value", 0.01)
+    time.sleep(0.05)
+
+    assert datastore.remove_expired_keys(time_budget=0) == 20
+
+
+def test_expire_with_scheduler():
+    datastore = DataStore(expiry_scheduler=ExpiryScheduler())
+    datastore.set_with_expiry("key1", "value1", 0.01)
+    datastore.set_with_expiry("key2", "value2", 60)
+    datastore.set_with_expiry("key3", "value3", 60)
+    datastore.set_with_expiry("key3", "value3", 0.01)
+    datastore["key4"] = "value4"
+    time.sleep(0.05)
+
+    assert datastore.remove_expired_keys() == 2
+    assert datastore.dbsize() == 2
+    assert datastore.expiry_info()["expire_backlog"] == 2
+
+
+def test_get_and_set_many():
+    datastore = DataStore()
+    datastore.set_with_expiry(b"key1", b"old", 60)
+    datastore.set_many([(b"key1", b"value1"), (b"key2", b"value2")])
+
+    assert datastore.get_many([b"key1", b"missing", b"key2"]) == [
+        b"value1",
+        None,
+        b"value2",
+    ]
+    assert datastore.deadline(b"key1") is None
+
+
+def test_set_many_if_absent():
+    datastore = DataStore()
+    datastore[b"key2"] = b"value2"
+
+    assert not datastore.set_many_if_absent([(b"key1", b"new"), (b"key2", b"new")])
+    assert b"key1" not in datastore
+    datastore.set_with_expiry(b"key2", b"value2", 0.01)
+    time.sleep(0.02)
+    assert datastore.set_many_if_absent([(b"key1", b"new"), (b"key2", b"new")])
+    assert datastore.get_many([b"key1", b"key2"]) == [b"new", b"new"]
+
+
+def test_used_memory_is_tracked_incrementally():
+    datastore = DataStore()
+    datastore[b"string"] = b"value"
+    datastore[b"string"] = b"longer value"
+    datastore.set_many([(b"a", b"1"), (b"b", b"2")])
+    datastore.increment(b"counter")
+    datastore.set_with_expiry(b"volatile", b"value", 60)
+    for i in range(20):
+        datastore.append(b"list", b"element:%d" % i)
+    datastore.prepend(b"list", b"first")
+    datastore.pop_left(b"list", 2)
+    datastore.pop_right(b"list")
+    datastore.trim(b"list", 2, -3)
+    del datastore[b"a"]
+
+    assert datastore.used_memory == sum(
+        entry_size(key, value) for key, value, _ in datastore.dump()
+    )
+    datastore.clear()
+    assert datastore.used_memory == 0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("pyredis.eviction.time", lambda: now[0])
+    return now
+
+
+def fill(datastore: DataStore, keys: list[bytes], clock: list[float]) -> None:
+    """Write keys one second apart, the oldest first."""
+    for key in keys:
+        clock[0] += 1
+        datastore[key] = b"value"
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        ("allkeys-lru", [b"key:%d" % i for i in range(2, 8)]),
+        ("volatile-ttl", [b"key:%d" % i for i in range(6)]),
+        ("noeviction", [b"key:%d" % i for i in range(8)]),
+    ],
+    ids=["lru", "ttl", "noeviction"],
+)
+def test_evict(policy, expected, clock):
+    keys = [b"key:%d" % i for i in range(8)]
+    # Sampling every key makes the approximated policies exact.
+    datastore = DataStore(maxmemory_policy=policy, maxmemory_samples=len(keys))
+    fill(datastore, keys, clock)
+    for i, key in enumerate(keys[5:]):
+        datastore.set_with_expiry(key, b"value", 60 - i)
+    datastore.maxmemory = 6 * entry_size(b"key:0", b"value")
+    clock[0] += 10
+    datastore.get_many(keys[2:])
+
+    evicted = datastore.evict()
+    assert sorted(key for key in keys if key in datastore) == expected
+    assert datastore.evicted_keys == len(evicted) == 8 - len(expected)
+
+
+def test_evict_allkeys_lru_approximates_lru(clock):
+    keys = [b"key:%04d" % i for i in range(1000)]
+    datastore = DataStore(maxmemory=10**9, maxmemory_policy="allkeys-lru")
+    fill(datastore, keys, clock)
+    datastore.maxmemory = datastore.used_memory // 2
+
+    evicted = datastore.evict()
+    while datastore.eviction_pending:
+        evicted += datastore.evict()
+    assert datastore.used_memory <= datastore.maxmemory
+    # Random eviction would take half of them from the newer half.
+    assert sum(key < b"key:0500" for key in evicted) > 0.8 * len(evicted)
+
+
+def test_evict_allkeys_lfu_keeps_hot_keys(clock):
+    keys = [b"key:%d" % i for i in range(100)]
+    datastore = DataStore(maxmemory=10**9, maxmemory_policy="allkeys-lfu")
+    fill(datastore, keys, clock)
+    for _ in range(100):
+        datastore.get_many(keys[:10])
+    datastore.maxmemory = datastore.used_memory // 5
+
+    datastore.evict()
+    while datastore.eviction_pending:
+        datastore.evict()
+    assert all(key in datastore for key in keys[:10])
+
+
+@pytest.mark.parametrize(
+    "policy", ["volatile-lru", "volatile-lfu", "volatile-random", "volatile-ttl"]
+)
+def test_volatile_policies_keep_persistent_keys(policy):
+    datastore = DataStore(maxmemory_policy=policy)
+    datastore[b"persistent"] = b"value"
+    datastore.set_with_expiry(b"volatile", b"value", 60)
+    datastore.maxmemory = 1
+
+    assert datastore.evict() == [b"volatile"]
+    assert b"persistent" in datastore
+    assert datastore.used_memory > datastore.maxmemory
+
+
+@pytest.mark.parametrize(
+    "policy", ["noeviction", "allkeys-random", "volatile-random", "volatile-ttl"]
+)
+def test_untracked_policies_do_not_touch_access_index(policy, monkeypatch):
+    datastore = DataStore(maxmemory=10**9, maxmemory_policy=policy)
+    monkeypatch.setattr(AccessIndex, "touch", None)
+    datastore[b"key"] = b"value"
+    datastore.set_with_expiry(b"volatile", b"value", 60)
+    datastore.append(b"list", b"value")
+    assert datastore[b"key"] == b"value"
+    assert datastore.get_many([b"key", b"volatile"]) == [b"value", b"value"]
+    assert datastore.range(b"list", 0, -1) == [b"value"]
+
+    datastore.maxmemory = 1
+    datastore.evict()
+    if policy == "allkeys-random":
+        assert datastore.dbsize() == 0
+
+
+def test_evict_stops_at_the_time_limit():
+    datastore = DataStore(
+        maxmemory_policy="allkeys-random", maxmemory_eviction_tenacity=0
+    )
+    for i in range(100):
+        datastore[b"key:%d" % i] = b"value"
+    datastore.maxmemory = 1
+
+    assert len(datastore.evict()) == EVICTION_CHECK_KEYS
+    assert datastore.eviction_pending
+    while datastore.eviction_pending:
+        datastore.evict()
+    assert datastore.dbsize() == 0
+    assert datastore.evicted_keys == 100
+
+
+@pytest.mark.parametrize(
+    "attribute, value",
+    [
+        ("maxmemory", -1),
+        ("maxmemory_policy", "fifo"),
+        ("maxmemory_samples", 0),
+        ("maxmemory_eviction_tenacity", 101),
+    ],
+    ids=["negative maxmemory", "unknown policy", "no samples", "tenacity"],
+)
+def test_eviction_settings_are_validated(attribute, value):
+    with pytest.raises(ValueError):
+        setattr(DataStore(), attribute, value)
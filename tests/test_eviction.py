@@ -0,0 +1,129 @@
+import random
+
+import pytest
+
+from pyredis.eviction import (
+    EVICTION_POOL_SIZE,
+    LFU_COUNTER_MAX,
+    LFU_INIT_VAL,
+    LRU_CLOCK_MAX,
+    AccessIndex,
+    EvictionPool,
+    KeyIndex,
+    eviction_time_limit,
+    lfu_decrement,
+    lfu_increment,
+    lfu_time,
+    lru_clock,
+    parse_maxmemory_policy,
+    parse_memory,
+)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("0", 0),
+        ("100", 100),
+        ("1k", 1000),
+        ("1kb", 1024),
+        ("2MB", 2 * 1024**2),
+        ("1gb", 1024**3),
+    ],
+    ids=["zero", "bytes", "k", "kb", "uppercase", "gb"],
+)
+def test_parse_memory(value, expected):
+    assert parse_memory(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "-1", "1tb", "mb"])
+def test_parse_memory_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_memory(value)
+
+
+def test_parse_maxmemory_policy():
+    assert parse_maxmemory_policy("ALLKEYS-LRU") == "allkeys-lru"
+    with pytest.raises(ValueError, match="must be one of the following"):
+        parse_maxmemory_policy("allkeys-fifo")
+
+
+@pytest.mark.parametrize(
+    "tenacity, expected",
+    [(0, 0), (10, 500_000), (20, 500_000 * 1.15**10), (100, float("inf"))],
+    ids=["none", "default", "grown", "unlimited"],
+)
+def test_eviction_time_limit(tenacity, expected):
+    assert eviction_time_limit(tenacity) == pytest.approx(expected)
+
+
+def test_lfu_counter_grows_logarithmically():
+    random.seed(1)
+    counter = LFU_INIT_VAL
+    for _ in range(1000):
+        counter = lfu_increment(counter)
+    assert LFU_INIT_VAL + 5 < counter < LFU_INIT_VAL + 30
+    assert lfu_increment(LFU_COUNTER_MAX) == LFU_COUNTER_MAX
+
+
+@pytest.mark.parametrize(
+    "minutes_idle, expected",
+    [(0, 20), (5, 15), (30, 0)],
+    ids=["fresh", "idle", "fully decayed"],
+)
+def test_lfu_counter_decays_with_idle_time(minutes_idle, expected):
+    now = lfu_time()
+    word = (now - minutes_idle) % (1 << 16) << 8 | 20
+    assert lfu_decrement(word, now) == expected
+
+
+def test_access_index_lru():
+    index = AccessIndex([b"a", b"b"])
+    index.touch(b"c")
+    assert len(index) == 3
+    index.set_word(b"a", (lru_clock() - 100) & LRU_CLOCK_MAX)
+    [(idle_a, _), (idle_c, _)] = index.scores([b"a", b"c"])
+    assert idle_a >= 100
+    assert idle_c <= 1
+
+    index.touch(b"a")
+    assert index.scores([b"a"])[0][0] <= 1
+
+    index.pop(b"a")
+    index.pop(b"missing")
+    assert b"a" not in index
+    assert sorted(index) == [b"b", b"c"]
+    assert set(index.sample(10)) <= {b"b", b"c"}
+    assert index.scores([b"c"]) == [(idle_c, b"c")]
+
+
+def test_access_index_lfu():
+    index = AccessIndex([b"key"], lfu=True)
+    assert index.word(b"key") & 0xFF == LFU_INIT_VAL
+    assert index.scores([b"key"]) == [(LFU_COUNTER_MAX - LFU_INIT_VAL, b"key")]
+    index.touch(b"key")
+    assert index.scores([b"key"])[0][0] <= LFU_COUNTER_MAX - LFU_INIT_VAL
+
+
+def test_key_index():
+    index = KeyIndex([b"a", b"b"])
+    index.add(b"c")
+    index.add(b"a")
+    assert len(index) == 3
+    index.pop(b"a")
+    index.pop(b"missing")
+    assert b"a" not in index
+    assert sorted(index) == [b"b", b"c"]
+    assert set(index.sample(1)) <= {b"b", b"c"}
+    assert sorted(index.sample(10)) == [b"b", b"c"]
+
+
+def test_eviction_pool_keeps_best_candidates():
+    pool = EvictionPool()
+    pool.populate((idle, b"key:%d" % idle) for idle in range(100))
+    assert len(pool) == EVICTION_POOL_SIZE
+    pool.populate([(1, b"fresh"), (500, b"key:0")])
+    assert pool.pop() == b"key:0"
+    assert [pool.pop() for _ in range(3)] == [b"key:99", b"key:98", b"key:97"]
+    pool.clear()
+    assert pool.pop() is None
@@ -0,0 +1,53 @@
+from pyredis.expiry import ExpiryIndex, ExpiryScheduler
+
+
+def test_set_get_and_pop():
+    index = ExpiryIndex()
+    index.set("key1", 10)
+    index.set("key2", 20)
+    index.set("key1", 30)
+    assert len(index) == 2
+    assert index.get("key1") == 30
+    assert index.pop("key1") == 30
+    assert index.get("key1") is None
+    assert index.pop("key1") is None
+    assert list(index.items()) == [("key2", 20)]
+
+
+def test_pop_keeps_positions_consistent():
+    index = ExpiryIndex()
+    for i in range(10):
+        index.set(i, i * 10)
+    for i in range(0, 10, 2):
+        index.pop(i)
+    assert sorted(index) == [1, 3, 5, 7, 9]
+    for i in (1, 3, 5, 7, 9):
+        assert index.get(i) == i * 10
+
+
+def test_sample():
+    index = ExpiryIndex()
+    for i in range(100):
+        index.set(i, i)
+    sample = index.sample(20)
+    assert len(set(sample)) == 20
+    assert all(key in index for key in sample)
+    assert len(ExpiryIndex().sample(20)) == 0
+
+
+def test_scheduler_pops_due_entries_in_deadline_order():
+    scheduler = ExpiryScheduler()
+    scheduler.schedule("key3", 30)
+    scheduler.schedule("key1", 10)
+    scheduler.schedule("key2", 20)
+    assert list(scheduler.pop_due(20)) == [("key1", 10), ("key2", 20)]
+    assert len(scheduler) == 1
+    assert scheduler.lag(35) == 5
+
+
+def test_scheduler_respects_tick_budget():
+    scheduler = ExpiryScheduler(tick_budget=2)
+    for i in range(5):
+        scheduler.schedule(i, i)
+    assert len(list(scheduler.pop_due(10))) == 2
+    assert len(scheduler) == 3
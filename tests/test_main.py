@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+import typer
+from typer.testing import CliRunner
+
+from pyredis.__main__ import SNAPSHOT_FILENAME, eviction_monitor, main, run
+from pyredis.asyncserver import ClientOutputBufferLimit
+from pyredis.datastore import DataStore
+from pyredis.persistence import NO_PERSISTENCE
+from pyredis.snapshot import write_snapshot
+
+
+def typer_app() -> typer.Typer:
+    app = typer.Typer()
+    app.command()(run)
+    return app
+
+
+def test_shutdown_stops_monitors_before_closing_persistence(tmp_path):
+    async def run():
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        server = loop.create_task(main(port=0, directory=str(tmp_path), ready=ready))
+        await ready
+        await asyncio.sleep(0.2)
+        server.cancel()
+        await asyncio.gather(server, return_exceptions=True)
+        return [
+            task for task in asyncio.all_tasks() if task is not asyncio.current_task()
+        ]
+
+    assert asyncio.run(run()) == []
+
+
+async def get_from_server(directory: str, key: bytes) -> bytes:
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    server = loop.create_task(main(port=0, directory=directory, ready=ready))
+    port = await ready
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"*2\r\n$3\r\nGET\r\n$%d\r\n%s\r\n" % (len(key), key))
+    reply = await reader.readuntil(b"\r\n")
+    if not reply.startswith(b"$-"):
+        reply += await reader.readuntil(b"\r\n")
+    writer.close()
+    server.cancel()
+    await asyncio.gather(server, return_exceptions=True)
+    return reply
+
+
+def test_startup_restores_snapshot_without_aof(tmp_path):
+    datastore = DataStore()
+    datastore[b"key"] = b"value"
+    write_snapshot(str(tmp_path / SNAPSHOT_FILENAME), datastore)
+
+    assert asyncio.run(get_from_server(str(tmp_path), b"key")) == b"$5\r\nvalue\r\n"
+    # The AOF created by the first start must not hide the snapshot.
+    assert asyncio.run(get_from_server(str(tmp_path), b"key")) == b"$5\r\nvalue\r\n"
+
+
+def test_eviction_monitor_finishes_pending_evictions():
+    datastore = DataStore(
+        maxmemory_policy="allkeys-random", maxmemory_eviction_tenacity=0
+    )
+    for i in range(100):
+        datastore[b"key:%d" % i] = b"value"
+    datastore.maxmemory = 1
+    datastore.evict()
+    assert datastore.eviction_pending
+
+    async def run():
+        monitor = asyncio.create_task(eviction_monitor(datastore, NO_PERSISTENCE))
+        while datastore.eviction_pending:
+            await asyncio.sleep(0)
+        monitor.cancel()
+
+    asyncio.run(run())
+    assert datastore.dbsize() == 0
+
+
+def test_run_passes_options_to_main(monkeypatch):
+    options = {}
+
+    async def fake_main(**kwargs):
+        options.update(kwargs)
+
+    monkeypatch.setattr("pyredis.__main__.main", fake_main)
+    result = CliRunner().invoke(
+        typer_app(),
+        [
+            "--appendfsync",
+            "always",
+            "--auto-aof-rewrite-percentage",
+            "50",
+            "--auto-aof-rewrite-min-size",
+            "1mb",
+            "--save",
+            "60 10",
+            "--client-output-buffer-limit",
+            "1mb 512kb 10",
+            "--expiry-scheduler",
+            "--event-loop",
+            "asyncio",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert options["appendfsync"] == "always"
+    assert options["auto_aof_rewrite_percentage"] == 50
+    assert options["auto_aof_rewrite_min_size"] == 1024**2
+    assert options["save_rules"] == ((60, 10),)
+    assert options["client_output_buffer_limit"] == ClientOutputBufferLimit(
+        1024**2, 512 * 1024, 10
+    )
+    assert options["expiry_scheduler"]
+
+
+@pytest.mark.parametrize(
+    "option, value",
+    [
+        ("--appendfsync", "sometimes"),
+        ("--save", "60"),
+        ("--client-output-buffer-limit", "1mb"),
+    ],
+    ids=["appendfsync", "save", "client output buffer limit"],
+)
+def test_run_rejects_invalid_options(option, value):
+    result = CliRunner().invoke(typer_app(), [option, value])
+    assert result.exit_code != 0
+    assert "Invalid value" in result.output
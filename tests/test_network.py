@@ -0,0 +1,33 @@
+import socket
+
+import pytest
+
+from pyredis.network import (
+    LOOP_ASYNCIO,
+    SocketOptions,
+    create_listening_socket,
+    install_event_loop,
+)
+
+
+def test_install_asyncio_event_loop():
+    assert install_event_loop(LOOP_ASYNCIO) == LOOP_ASYNCIO
+
+
+def test_install_unknown_event_loop():
+    with pytest.raises(ValueError):
+        install_event_loop("trio")
+
+
+def test_listening_socket_options():
+    options = SocketOptions(backlog=16, reuse_port=True, receive_buffer_size=65536)
+    sock = create_listening_socket("127.0.0.1", 0, options)
+    try:
+        assert not sock.getblocking()
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT) == 1
+        # Linux doubles the requested size to account for bookkeeping.
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) >= 65536
+        other = create_listening_socket("127.0.0.1", sock.getsockname()[1], options)
+        other.close()
+    finally:
+        sock.close()
@@ -1,10 +1,17 @@
+import asyncio
 import os
+import time
 
 import pytest
 
 from pyredis.commands import handle_command
 from pyredis.datastore import DataStore
-from pyredis.persistence import AppendOnlyFilePersistence, restore_from_file
+from pyredis.persistence import (
+    AppendOnlyFilePersistence,
+    RewriteInProgressError,
+    restore_from_file,
+    write_all,
+)
 from pyredis.resp_datatypes import Array, BulkString
 
 
@@ -18,6 +25,7 @@ def setup_persistence():
     yield persistence
 
     # teardown
+    persistence.close()
     os.remove(filename)
 
 
@@ -57,3 +65,282 @@ def test_persists_and_load(setup_persistence):
     existing_key = handle_command(get_command_2, datastore, persistence)
     assert delete_key == BulkString(None)
     assert existing_key == BulkString(b"value")
+
+
+def test_log_command_batches_writes_per_loop_iteration(setup_persistence):
+    persistence = setup_persistence
+    set_command = Array([BulkString(b"set"), BulkString(b"key"), BulkString(b"v")])
+
+    async def log_commands():
+        persistence.log_command(set_command)
+        persistence.log_command(set_command)
+        assert os.path.getsize("ccdbtest.aof") == 0
+        await asyncio.sleep(0)
+        return os.path.getsize("ccdbtest.aof")
+
+    size = asyncio.run(log_commands())
+    assert size == 2 * len(set_command.resp_encode())
+
+
+def test_flush_retries_short_writes(setup_persistence):
+    persistence = setup_persistence
+    file = persistence.file
+    chunks = []
+
+    class ShortWriteFile:
+        closed = False
+
+        def write(self, data):
+            chunks.append(bytes(data[:3]))
+            return file.write(data[:3])
+
+        def fileno(self):
+            return file.fileno()
+
+    persistence.file = ShortWriteFile()
+    set_command = Array([BulkString(b"set"), BulkString(b"key"), BulkString(b"v")])
+    persistence.log_command(set_command)
+    persistence.flush()
+    persistence.file = file
+    assert b"".join(chunks) == set_command.resp_encode()
+    datastore = DataStore()
+    restore_from_file("ccdbtest.aof", datastore)
+    assert datastore[b"key"] == b"v"
+
+
+def test_write_all_retries_short_writes():
+    class ShortWriteFile:
+        def __init__(self):
+            self.written = bytearray()
+
+        def write(self, data):
+            self.written += data[:3]
+            return len(data[:3])
+
+    file = ShortWriteFile()
+    write_all(file, bytearray(b"*1\r\n$4\r\nping\r\n"))
+    assert file.written == b"*1\r\n$4\r\nping\r\n"
+
+
+@pytest.mark.parametrize("appendfsync", ["always", "everysec", "no"])
+def test_appendfsync_policies(appendfsync):
+    filename = "ccdbtest_fsync.aof"
+    persistence = AppendOnlyFilePersistence(filename, appendfsync=appendfsync)
+    set_command = Array([BulkString(b"set"), BulkString(b"key"), BulkString(b"v")])
+    persistence.log_command(set_command)
+    persistence.close()
+    datastore = DataStore()
+    restore_from_file(filename, datastore)
+    os.remove(filename)
+    assert datastore[b"key"] == b"v"
+
+
+def test_invalid_appendfsync_policy():
+    with pytest.raises(ValueError):
+        AppendOnlyFilePersistence("ccdbtest_invalid.aof", appendfsync="sometimes")
+
+
+def wait_for_rewrite(persistence, datastore):
+    while persistence.rewrite_in_progress:
+        persistence.cron(datastore)
+        time.sleep(0.01)
+
+
+def test_rewrite_in_background(setup_persistence):
+    datastore = DataStore()
+    persistence = setup_persistence
+    incr_command = Array([BulkString(b"incr"), BulkString(b"counter")])
+    for _ in range(100):
+        handle_command(incr_command, datastore, persistence)
+    rpush_command = Array(
+        [BulkString(b"rpush"), BulkString(b"list")]
+        + [BulkString(b"%d" % i) for i in range(100)]
+    )
+    handle_command(rpush_command, datastore, persistence)
+    size_before = os.path.getsize("ccdbtest.aof")
+
+    persistence.rewrite_in_background(datastore)
+    with pytest.raises(RewriteInProgressError):
+        persistence.rewrite_in_background(datastore)
+    handle_command(incr_command, datastore, persistence)
+    wait_for_rewrite(persistence, datastore)
+    handle_command(incr_command, datastore, persistence)
+
+    assert os.path.getsize("ccdbtest.aof") < size_before
+    restored = DataStore()
+    restore_from_file("ccdbtest.aof", restored)
+    assert restored[b"counter"] == b"102"
+    assert restored.range(b"list", 0, -1) == [b"%d" % i for i in range(100)]
+
+
+def test_rewrite_keeps_remaining_ttl(setup_persistence):
+    datastore = DataStore()
+    persistence = setup_persistence
+    datastore.set_with_expiry(b"volatile", b"value", 60)
+    datastore.set_with_expiry(b"expired", b"value", 0.01)
+    time.sleep(0.05)
+
+    persistence.rewrite_in_background(datastore)
+    wait_for_rewrite(persistence, datastore)
+
+    restored = DataStore()
+    restore_from_file("ccdbtest.aof", restored)
+    assert restored.dbsize() == 1
+    assert 0 < restored.expiry_info()["expires"]
+
+
+def test_automatic_rewrite():
+    datastore = DataStore()
+    persistence = AppendOnlyFilePersistence(
+        "ccdbtest_auto.aof", auto_rewrite_percentage=100, auto_rewrite_min_size=1024
+    )
+    set_command = Array([BulkString(b"set"), BulkString(b"key"), BulkString(b"v")])
+    for _ in range(100):
+        handle_command(set_command, datastore, persistence)
+
+    persistence.cron(datastore)
+    assert persistence.rewrite_in_progress
+    wait_for_rewrite(persistence, datastore)
+    persistence.close()
+
+    assert os.path.getsize("ccdbtest_auto.aof") == len(set_command.resp_encode())
+    os.remove("ccdbtest_auto.aof")
+
+
+def test_load_values_starting_with_array_marker(setup_persistence):
+    persistence = setup_persistence
+    set_command = Array(
+        [BulkString(b"set"), BulkString(b"key"), BulkString(b"*2\r\nnot a frame")]
+    )
+    persistence.log_command(set_command)
+    persistence.log_command(
+        Array([BulkString(b"rpush"), BulkString(b"list"), BulkString(b"*")])
+    )
+    datastore = DataStore()
+    stats = restore_from_file("ccdbtest.aof", datastore)
+    assert stats.commands == 2
+    assert datastore[b"key"] == b"*2\r\nnot a frame"
+    assert datastore.range(b"list", 0, -1) == [b"*"]
+
+
+def test_load_ignores_truncated_tail(setup_persistence):
+    persistence = setup_persistence
+    set_command = Array([BulkString(b"set"), BulkString(b"key"), BulkString(b"v")])
+    persistence.log_command(set_command)
+    persistence.file.write(b"*3\r\n$3\r\nset\r\n$3\r\nkey")
+    datastore = DataStore()
+    stats = restore_from_file("ccdbtest.aof", datastore)
+    assert stats.commands == 1
+    assert stats.truncated == len(b"*3\r\n$3\r\nset\r\n$3\r\nkey")
+    assert datastore[b"key"] == b"v"
+
+
+def test_load_empty_file(setup_persistence):
+    stats = restore_from_file("ccdbtest.aof", DataStore())
+    assert stats.commands == 0
+
+
+def test_replay_drops_keys_past_their_deadline(setup_persistence):
+    persistence = setup_persistence
+    datastore = DataStore()
+    for key, ttl in ((b"short", b"10"), (b"long", b"60000")):
+        command = Array(
+            [
+                BulkString(b"set"),
+                BulkString(key),
+                BulkString(b"value"),
+                BulkString(b"px"),
+                BulkString(ttl),
+            ]
+        )
+        handle_command(command, datastore, persistence)
+    time.sleep(0.05)
+
+    restored = DataStore()
+    restore_from_file("ccdbtest.aof", restored)
+    assert restored.dbsize() == 1
+    assert 59000 < (restored.deadline(b"long") - time.time_ns()) // 10**6 <= 60000
+
+
+def test_replay_mset(setup_persistence):
+    datastore = DataStore()
+    persistence = setup_persistence
+    mset_command = Array(
+        [
+            BulkString(b"mset"),
+            BulkString(b"key1"),
+            BulkString(b"value1"),
+            BulkString(b"key2"),
+            BulkString(b"value2"),
+        ]
+    )
+    handle_command(mset_command, datastore, persistence)
+    persistence.flush()
+
+    restored = DataStore()
+    restore_from_file("ccdbtest.aof", restored)
+    assert restored.get_many([b"key1", b"key2"]) == [b"value1", b"value2"]
+
+
+def test_replay_skips_commands_that_fail(setup_persistence):
+    persistence = setup_persistence
+    for command in (
+        [b"set", b"string", b"abc"],
+        [b"incr", b"string"],
+        [b"decr", b"string"],
+        [b"lpush", b"string", b"value"],
+        [b"rpush", b"list", b"value"],
+        [b"incr", b"list"],
+        [b"set", b"key", b"value"],
+    ):
+        persistence.log_command(Array([BulkString(arg) for arg in command]))
+    persistence.flush()
+
+    datastore = DataStore()
+    stats = restore_from_file("ccdbtest.aof", datastore)
+    assert stats.commands == 7
+    assert datastore[b"string"] == b"abc"
+    assert datastore.range(b"list", 0, -1) == [b"value"]
+    assert datastore[b"key"] == b"value"
+
+
+@pytest.mark.parametrize("policy", ["noeviction", "allkeys-random"])
+def test_replay_does_not_evict(setup_persistence, policy):
+    persistence = setup_persistence
+    for command in (
+        [b"set", b"key1", b"value"],
+        [b"msetnx", b"key2", b"value"],
+        [b"msetnx", b"key3", b"value"],
+    ):
+        persistence.log_command(Array([BulkString(arg) for arg in command]))
+    persistence.flush()
+
+    datastore = DataStore(maxmemory=1, maxmemory_policy=policy)
+    restore_from_file("ccdbtest.aof", datastore)
+    assert datastore.get_many([b"key1", b"key2", b"key3"]) == [b"value"] * 3
+    assert datastore.evicted_keys == 0
+    assert not datastore.loading
+
+
+def test_replay_is_not_counted_in_command_stats(setup_persistence):
+    persistence = setup_persistence
+    for command in (
+        [b"set", b"string", b"abc"],
+        [b"incr", b"string"],
+        [b"msetnx", b"key", b"value"],
+    ):
+        persistence.log_command(Array([BulkString(arg) for arg in command]))
+    persistence.flush()
+
+    datastore = DataStore()
+    resetstat = Array([BulkString(b"config"), BulkString(b"resetstat")])
+    handle_command(resetstat, datastore, persistence)
+    restore_from_file("ccdbtest.aof", datastore)
+    assert datastore[b"key"] == b"value"
+    info = Array([BulkString(b"info"), BulkString(b"commandstats")])
+    commandstats = bytes(handle_command(info, datastore, persistence))
+    for command in (b"set", b"incr", b"msetnx"):
+        assert b"cmdstat_%s:" % command not in commandstats
+    info = Array([BulkString(b"info"), BulkString(b"errorstats")])
+    errorstats = bytes(handle_command(info, datastore, persistence))
+    assert errorstats.startswith(b"# Errorstats") and b"errorstat_" not in errorstats
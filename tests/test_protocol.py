@@ -45,6 +45,7 @@ from pyredis.resp_datatypes import (
             b"*3\r\n:1\r\n:2\r\n:3\r\n",
             (Array([Integer(1), Integer(2), Integer(3)]), 16),
         ),
+        (b"*2\r\n$5\r\nhello\r\n$5\r\nwor", (None, 0)),
     ],
 )
 def test_protocol_parse(buffer: bytes, expected: RedisType):
@@ -58,6 +59,9 @@ def test_protocol_parse(buffer: bytes, expected: RedisType):
         (SimpleString("OK"), b"+OK\r\n"),
         (Error("Error"), b"-Error\r\n"),
         (Integer(100), b":100\r\n"),
+        (Integer(-100), b":-100\r\n"),
+        (Integer(100000), b":100000\r\n"),
+        (BulkString(b"\xff\x00"), b"$2\r\n\xff\x00\r\n"),
         (BulkString(b"This is a Bulk String"), b"$21\r\nThis is a Bulk String\r\n"),
         (BulkString(b""), b"$0\r\n\r\n"),
         (BulkString(None), b"$-1\r\n"),
@@ -72,3 +76,76 @@ def test_protocol_parse(buffer: bytes, expected: RedisType):
 def test_encode_message(data_type, expected):
     encoded_message = encode_message(data_type)
     assert encoded_message == expected
+
+
+def test_encode_into_shared_buffer():
+    buffer = bytearray()
+    Array([BulkString(b"one"), BulkString(None), Integer(-1)]).resp_encode_into(
+        buffer
+    )
+    SimpleString("OK").resp_encode_into(buffer)
+    assert buffer == b"*3\r\n$3\r\none\r\n$-1\r\n:-1\r\n+OK\r\n"
+
+
+def test_parser_returns_frames_split_across_reads():
+    parser = protocol.Parser()
+    parser.feed(b"*3\r\n$3\r\nset\r\n$3\r\nke")
+    assert parser.get_frame() is None
+    parser.feed(b"y\r\n$5\r\nvalue\r\n*1\r\n$4\r\nping\r\n")
+    assert parser.get_frame() == Array(
+        [BulkString(b"set"), BulkString(b"key"), BulkString(b"value")]
+    )
+    assert parser.get_frame() == Array([BulkString(b"ping")])
+    assert parser.get_frame() is None
+
+
+@pytest.mark.parametrize(
+    "buffer, expected",
+    [
+        (b"$-1\r\n", BulkString(None)),
+        (b"*0\r\n", Array([])),
+        (b"*-1\r\n", Array(None)),
+        (
+            b"*2\r\n*1\r\n:1\r\n$-1\r\n",
+            Array([Array([Integer(1)]), BulkString(None)]),
+        ),
+    ],
+)
+def test_parser_get_frame(buffer, expected):
+    parser = protocol.Parser()
+    parser.feed(buffer)
+    assert parser.get_frame() == expected
+
+
+def test_parser_rejects_unknown_type():
+    parser = protocol.Parser()
+    parser.feed(b"Error message\r\n")
+    with pytest.raises(protocol.ProtocolError):
+        parser.get_frame()
+
+
+@pytest.mark.parametrize(
+    "buffer",
+    [b"*x\r\n", b"$y\r\n", b":1.5\r\n", b"*1\r\n$\r\n"],
+    ids=["array length", "bulk length", "integer", "empty length"],
+)
+def test_parser_rejects_malformed_integers(buffer):
+    parser = protocol.Parser()
+    parser.feed(buffer)
+    with pytest.raises(protocol.ProtocolError):
+        parser.get_frame()
+
+
+@pytest.mark.parametrize(
+    "buffer",
+    [b"$3\r\nfooXY", b"$3\r\nfoo\r\r\n", b"$-5\r\n", b"*-3\r\n", b"*1\r\n$-2\r\n"],
+    ids=["missing CRLF", "bad CRLF", "bulk length", "array length", "nested"],
+)
+def test_parser_rejects_malformed_frames(buffer):
+    parser = protocol.Parser()
+    parser.feed(buffer)
+    with pytest.raises(protocol.ProtocolError):
+        parser.get_frame()
+    with pytest.raises(protocol.ProtocolError):
+        list(protocol.iter_frames(buffer))
+    assert protocol.parse(buffer) == (None, 0)
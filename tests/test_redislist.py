@@ -0,0 +1,79 @@
+import pytest
+
+from pyredis.redislist import RedisList, normalize_range
+
+
+def test_push_both_ends():
+    values = RedisList()
+    for i in range(100):
+        values.append(i)
+        values.appendleft(-i - 1)
+    assert len(values) == 200
+    assert list(values) == list(range(-100, 100))
+
+
+def test_pop_both_ends():
+    values = RedisList(range(50))
+    assert values.popleft() == 0
+    assert values.pop() == 49
+    assert list(values) == list(range(1, 49))
+
+
+def test_pop_empty():
+    with pytest.raises(IndexError):
+        RedisList().popleft()
+    with pytest.raises(IndexError):
+        RedisList().pop()
+
+
+def test_getitem_after_wrap_around():
+    values = RedisList()
+    for i in range(5):
+        values.appendleft(i)
+    values.append(5)
+    assert values[0] == 4
+    assert values[-1] == 5
+    assert values[4] == 0
+    with pytest.raises(IndexError):
+        _ = values[6]
+
+
+def test_range_across_wrap_around():
+    values = RedisList()
+    for i in range(4):
+        values.appendleft(i)
+    for i in range(4, 8):
+        values.append(i)
+    assert values.range(2, 6) == [1, 0, 4, 5]
+
+
+@pytest.mark.parametrize(
+    "start, stop, expected",
+    [(0, 3, [0, 1, 2]), (7, 10, [7, 8, 9]), (2, 9, list(range(2, 9))), (5, 5, [])],
+)
+def test_trim(start, stop, expected):
+    values = RedisList(range(10))
+    values.trim(start, stop)
+    assert list(values) == expected
+
+
+def test_shrinks_after_pops():
+    values = RedisList(range(1000))
+    for _ in range(990):
+        values.pop()
+    assert list(values) == list(range(10))
+    assert len(values._items) < 1000
+
+
+@pytest.mark.parametrize(
+    "start, stop, length, expected",
+    [
+        (0, -1, 3, (0, 3)),
+        (-2, 2, 3, (1, 3)),
+        (-100, 100, 3, (0, 3)),
+        (5, 10, 3, (0, 0)),
+        (2, 1, 3, (0, 0)),
+    ],
+)
+def test_normalize_range(start, stop, length, expected):
+    assert normalize_range(start, stop, length) == expected
@@ -0,0 +1,321 @@
+import asyncio
+
+import pytest
+
+from pyredis.asyncserver import RedisServerProtocol
+from pyredis.commands import handle_command
+from pyredis.datastore import DataStore
+from pyredis.persistence import NoPersistence, RewriteInProgressError
+from pyredis.replication import (
+    ReplicaHandoff,
+    ReplicationBacklog,
+    ReplicationPersistence,
+)
+from pyredis.resp_datatypes import Array, BulkString, Error, SimpleString
+from pyredis.snapshot import load_snapshot_buffer
+
+
+def command(*args: bytes) -> Array:
+    return Array([BulkString(arg) for arg in args])
+
+
+@pytest.mark.parametrize(
+    "writes, expected",
+    [
+        ([b"abc"], b"abc"),
+        ([b"abcdef", b"gh"], b"cdefgh"),
+        ([b"abcd", b"efgh", b"ij"], b"efghij"),
+        ([b"abcdefghijk"], b"fghijk"),
+    ],
+    ids=["fits", "wraps", "wraps twice", "longer than the ring"],
+)
+def test_backlog_keeps_the_tail_of_the_stream(writes, expected):
+    backlog = ReplicationBacklog(size=6, offset=100)
+    for data in writes:
+        backlog.append(data)
+    total = sum(len(data) for data in writes)
+    assert backlog.offset == 100 + total
+    assert backlog.first_offset == backlog.offset - len(expected)
+    assert backlog.read_from(backlog.first_offset) == expected
+    assert backlog.read_from(backlog.offset - 2) == expected[-2:]
+    assert backlog.read_from(backlog.offset) == b""
+
+
+def test_backlog_forgets_offsets_it_no_longer_holds():
+    backlog = ReplicationBacklog(size=4)
+    backlog.append(b"abcdef")
+    assert backlog.read_from(1) is None
+    assert backlog.read_from(7) is None
+
+
+def test_psync_continues_from_backlog_or_falls_back_to_full_resync():
+    datastore = DataStore()
+    datastore[b"key"] = b"value"
+    replication = ReplicationPersistence(backlog_size=64)
+
+    full = handle_command(command(b"psync", b"?", b"-1"), datastore, replication)
+    assert type(full) is ReplicaHandoff
+    assert full.data.startswith(b"+FULLRESYNC %s 0\r\n$" % replication.replication_id)
+
+    handle_command(command(b"set", b"key", b"other"), datastore, replication)
+    offset = replication.offset
+    handle_command(command(b"incr", b"counter"), datastore, replication)
+    partial = handle_command(
+        command(b"psync", replication.replication_id, b"%d" % offset),
+        datastore,
+        replication,
+    )
+    assert partial.data == b"+CONTINUE %s\r\n%s" % (
+        replication.replication_id,
+        command(b"incr", b"counter").resp_encode(),
+    )
+
+    handle_command(command(b"set", b"key", b"x" * 100), datastore, replication)
+    handle_command(
+        command(b"psync", replication.replication_id, b"%d" % offset),
+        datastore,
+        replication,
+    )
+    assert (replication.full_syncs, replication.partial_syncs_ok) == (2, 1)
+    assert replication.partial_syncs_err == 1
+
+
+def test_sync_sends_only_the_snapshot():
+    replication = ReplicationPersistence()
+    result = handle_command(command(b"sync"), DataStore(), replication)
+    assert result.data.startswith(b"$")
+
+
+def test_replica_rejects_writes():
+    replication = ReplicationPersistence()
+    replication.read_only = True
+    datastore = DataStore()
+    result = handle_command(command(b"set", b"key", b"value"), datastore, replication)
+    assert result == Error("READONLY You can't write against a read only replica.")
+    assert handle_command(command(b"get", b"key"), datastore, replication) == (
+        BulkString(None)
+    )
+
+
+def test_replication_commands_without_replication():
+    result = handle_command(
+        command(b"replicaof", b"no", b"one"), DataStore(), NoPersistence()
+    )
+    assert result == Error("ERR This instance has replication disabled")
+
+
+def test_promoted_replica_lets_its_replicas_continue():
+    datastore = DataStore()
+    replication = ReplicationPersistence()
+    replication.full_sync(b"a" * 40, 10, _empty_snapshot(), datastore)
+    replication.apply_stream(
+        bytearray(command(b"set", b"key", b"value").resp_encode()), datastore
+    )
+    offset = replication.offset
+    replication._primary = _StoppedLink()
+    replication.promote()
+
+    assert not replication.read_only
+    assert replication.replication_id != b"a" * 40
+    result = replication.sync(datastore, b"a" * 40, offset)
+    assert result.data == b"+CONTINUE %s\r\n" % replication.replication_id
+    result = replication.sync(datastore, b"a" * 40, offset + 1)
+    assert result.data.startswith(b"+FULLRESYNC")
+
+
+class RewritingPersistence(NoPersistence):
+    def __init__(self):
+        self.rewrite_in_progress = True
+        self.rewrites = 0
+
+    def rewrite_in_background(self, datastore):
+        if self.rewrite_in_progress:
+            raise RewriteInProgressError
+        self.rewrites += 1
+
+
+def test_full_sync_defers_the_rewrite_while_one_runs():
+    persistence = RewritingPersistence()
+    replication = ReplicationPersistence(persistence)
+    datastore = DataStore()
+    replication.full_sync(b"a" * 40, 10, _empty_snapshot(), datastore)
+    replication.cron(datastore)
+    assert persistence.rewrites == 0
+
+    persistence.rewrite_in_progress = False
+    replication.cron(datastore)
+    replication.cron(datastore)
+    assert persistence.rewrites == 1
+
+
+class FakeReplica:
+    peer = ("127.0.0.1", 50000)
+    writing_paused = False
+
+    def __init__(self):
+        self.received = bytearray()
+
+    def feed_replica(self, data):
+        self.received += data
+
+    def call_when_drained(self, callback):
+        callback()
+
+    def close_replica(self):
+        raise AssertionError("transfer failed")
+
+
+def test_full_sync_streams_snapshot_from_a_child():
+    async def run():
+        datastore = DataStore()
+        for i in range(5000):
+            datastore[b"key:%d" % i] = b"value:%d" % i
+        replication = ReplicationPersistence()
+        handoff = replication.sync(datastore, b"?", -1)
+        assert handoff.transfer is not None
+        assert handoff.data == b""
+        mark = handoff.transfer.mark
+
+        replica = FakeReplica()
+        replication.attach(replica, handoff.transfer)
+        write = command(b"rpush", b"list", b"a")
+        handle_command(write, datastore, replication)
+
+        def transferred():
+            replication.cron(datastore)
+            return replica.received.endswith(write.resp_encode())
+
+        await _until(transferred)
+        assert not replication._transfer_children
+        header = b"+FULLRESYNC %s 0\r\n$EOF:%s\r\n" % (
+            replication.replication_id,
+            mark,
+        )
+        return replica.received, header, mark, write.resp_encode()
+
+    received, header, mark, stream = asyncio.run(run())
+    assert received.startswith(header)
+    snapshot, rest = received[len(header) :].split(mark)
+    assert rest == stream
+    loaded = DataStore()
+    load_snapshot_buffer(snapshot, loaded)
+    assert loaded.dbsize() == 5000
+    assert b"list" not in loaded
+
+
+class SavingPersistence(NoPersistence):
+    save_in_progress = True
+
+
+def test_full_sync_waits_for_a_running_child():
+    async def run():
+        datastore = DataStore()
+        datastore[b"before"] = b"value"
+        persistence = SavingPersistence()
+        replication = ReplicationPersistence(persistence)
+        handoff = replication.sync(datastore, b"?", -1)
+        replica = FakeReplica()
+        replication.attach(replica, handoff.transfer)
+        handle_command(command(b"set", b"key", b"value"), datastore, replication)
+        replication.cron(datastore)
+        assert not handoff.transfer.forked
+        assert replica.received == b""
+
+        persistence.save_in_progress = False
+        replication.cron(datastore)
+        assert handoff.transfer.forked
+        offset = replication.offset
+        write = command(b"rpush", b"list", b"a")
+        handle_command(write, datastore, replication)
+
+        def transferred():
+            replication.cron(datastore)
+            return replica.received.endswith(write.resp_encode())
+
+        await _until(transferred)
+        return replica.received, offset, handoff.transfer.mark, replication
+
+    received, offset, mark, replication = asyncio.run(run())
+    header = b"+FULLRESYNC %s %d\r\n$EOF:%s\r\n" % (
+        replication.replication_id,
+        offset,
+        mark,
+    )
+    assert offset > 0
+    assert received.startswith(header)
+    snapshot, rest = received[len(header) :].split(mark)
+    # The write made while waiting is in the snapshot, not in the stream.
+    assert rest == command(b"rpush", b"list", b"a").resp_encode()
+    loaded = DataStore()
+    load_snapshot_buffer(snapshot, loaded)
+    assert loaded.get_many([b"before", b"key"]) == [b"value", b"value"]
+
+
+def test_replica_follows_primary_and_resumes_after_disconnect():
+    async def run():
+        loop = asyncio.get_running_loop()
+        primary_store = DataStore()
+        primary = ReplicationPersistence()
+        server = await loop.create_server(
+            lambda: RedisServerProtocol(primary_store, primary), "127.0.0.1", 0
+        )
+        port = server.sockets[0].getsockname()[1]
+        replica_store = DataStore()
+        replica = ReplicationPersistence()
+        cron = loop.create_task(_cron(primary, primary_store))
+        try:
+            handle_command(command(b"set", b"before", b"1"), primary_store, primary)
+            result = handle_command(
+                command(b"replicaof", b"127.0.0.1", b"%d" % port),
+                replica_store,
+                replica,
+            )
+            assert result == SimpleString("OK")
+            await _until(lambda: replica_store.dbsize() == 1)
+
+            handle_command(
+                command(b"rpush", b"list", b"a", b"b"), primary_store, primary
+            )
+            await _until(lambda: replica.offset == primary.offset)
+            assert replica_store[b"before"] == b"1"
+            assert primary.replicas == 1
+
+            replica.primary.stop()
+            await _until(lambda: primary.replicas == 0)
+            handle_command(command(b"incr", b"counter"), primary_store, primary)
+            replica.replicaof("127.0.0.1", port, replica_store)
+            await _until(lambda: replica.offset == primary.offset)
+            assert replica_store[b"counter"] == b"1"
+            assert (primary.full_syncs, primary.partial_syncs_ok) == (1, 1)
+        finally:
+            cron.cancel()
+            replica.close()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+
+async def _cron(persistence: ReplicationPersistence, datastore: DataStore):
+    while True:
+        persistence.cron(datastore)
+        await asyncio.sleep(0.01)
+
+
+async def _until(condition, timeout: float = 2):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met in time")
+
+
+def _empty_snapshot() -> bytes:
+    replication = ReplicationPersistence()
+    data = replication.sync(DataStore(), None, -1).data
+    return data[data.index(b"\r\n") + 2 :]
+
+
+class _StoppedLink:
+    def stop(self):
+        pass
@@ -0,0 +1,32 @@
+import pytest
+
+from pyredis.slots import crc16, key_hash_slot
+
+
+def test_crc16():
+    assert crc16(b"123456789") == 0x31C3
+
+
+@pytest.mark.parametrize(
+    "key, expected",
+    [
+        (b"foo", 12182),
+        (b"bar", 5061),
+        (b"{user1000}.following", 3443),
+        (b"{user1000}.followers", 3443),
+        (b"foo{}{bar}", key_hash_slot(b"foo{}{bar}")),
+        (b"foo{{bar}}zap", key_hash_slot(b"{bar")),
+        (b"foo{bar}{zap}", key_hash_slot(b"bar")),
+    ],
+    ids=[
+        "foo",
+        "bar",
+        "hashtag following",
+        "hashtag followers",
+        "empty hashtag",
+        "nested braces",
+        "first hashtag only",
+    ],
+)
+def test_key_hash_slot(key, expected):
+    assert key_hash_slot(key) == expected
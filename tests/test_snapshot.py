@@ -0,0 +1,229 @@
+import os
+import time
+
+import pytest
+
+from pyredis.commands import handle_command
+from pyredis.datastore import DataStore
+from pyredis.persistence import AppendOnlyFilePersistence, SaveInProgressError
+from pyredis.redislist import RedisList
+from pyredis.resp_datatypes import Array, BulkString, Error, SimpleString
+from pyredis.snapshot import (
+    SnapshotError,
+    SnapshotPersistence,
+    dump_value,
+    load_snapshot,
+    load_value,
+    parse_save_rules,
+    restore,
+    write_snapshot,
+)
+
+AOF_FILENAME = "ccdbtest_snapshot.aof"
+SNAPSHOT_FILENAME = "ccdbtest.snapshot"
+
+
+@pytest.fixture()
+def cleanup():
+    yield
+    for filename in (AOF_FILENAME, SNAPSHOT_FILENAME):
+        if os.path.exists(filename):
+            os.remove(filename)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [b"", b"value", b"0", b"-128", b"32767", b"-2147483648", b"99999999999", b"007"],
+)
+def test_write_and_load_string(cleanup, value):
+    datastore = DataStore()
+    datastore[b"key"] = value
+    write_snapshot(SNAPSHOT_FILENAME, datastore)
+    loaded = DataStore()
+    load_snapshot(SNAPSHOT_FILENAME, loaded)
+    assert loaded[b"key"] == value
+
+
+def test_write_and_load_lists_and_expiry(cleanup):
+    datastore = DataStore()
+    datastore[b"list"] = RedisList(b"%d" % i for i in range(1000))
+    datastore[b"long"] = b"x" * 70000
+    datastore.set_with_expiry(b"volatile", b"value", 60)
+    datastore.set_with_expiry(b"expired", b"value", 0.01)
+    time.sleep(0.05)
+    write_snapshot(SNAPSHOT_FILENAME, datastore)
+
+    loaded = DataStore()
+    load_snapshot(SNAPSHOT_FILENAME, loaded)
+    assert loaded.range(b"list", 0, -1) == [b"%d" % i for i in range(1000)]
+    assert loaded[b"long"] == b"x" * 70000
+    assert loaded[b"volatile"] == b"value"
+    assert loaded.expiry_info()["expires"] == 1
+    assert loaded.dbsize() == 3
+
+
+def test_load_detects_corruption(cleanup):
+    datastore = DataStore()
+    datastore[b"key"] = b"value"
+    write_snapshot(SNAPSHOT_FILENAME, datastore)
+    with open(SNAPSHOT_FILENAME, "r+b") as file:
+        file.seek(-6, os.SEEK_END)
+        file.write(b"X")
+    with pytest.raises(SnapshotError):
+        load_snapshot(SNAPSHOT_FILENAME, DataStore())
+
+
+def set_command(key: bytes, value: bytes) -> Array:
+    return Array([BulkString(b"set"), BulkString(key), BulkString(value)])
+
+
+def test_restore_snapshot_and_aof_tail(cleanup):
+    datastore = DataStore()
+    aof = AppendOnlyFilePersistence(AOF_FILENAME)
+    persistence = SnapshotPersistence(SNAPSHOT_FILENAME, aof)
+    handle_command(set_command(b"key1", b"before"), datastore, persistence)
+    result = handle_command(Array([BulkString(b"save")]), datastore, persistence)
+    assert result == SimpleString("OK")
+    assert persistence.dirty == 0
+    handle_command(set_command(b"key2", b"after"), datastore, persistence)
+    persistence.close()
+
+    restored = DataStore()
+    restore(restored, AOF_FILENAME, SNAPSHOT_FILENAME)
+    assert restored[b"key1"] == b"before"
+    assert restored[b"key2"] == b"after"
+
+
+def test_restore_ignores_snapshot_older_than_aof_rewrite(cleanup):
+    datastore = DataStore()
+    aof = AppendOnlyFilePersistence(AOF_FILENAME)
+    persistence = SnapshotPersistence(SNAPSHOT_FILENAME, aof)
+    handle_command(set_command(b"key", b"old"), datastore, persistence)
+    persistence.save(datastore)
+    handle_command(set_command(b"key", b"new"), datastore, persistence)
+    persistence.rewrite_in_background(datastore)
+    while aof.rewrite_in_progress:
+        persistence.cron(datastore)
+        time.sleep(0.01)
+    persistence.close()
+
+    restored = DataStore()
+    restore(restored, AOF_FILENAME, SNAPSHOT_FILENAME)
+    assert restored[b"key"] == b"new"
+
+
+def test_restore_ignores_snapshot_of_replaced_aof(cleanup):
+    datastore = DataStore()
+    aof = AppendOnlyFilePersistence(AOF_FILENAME)
+    persistence = SnapshotPersistence(SNAPSHOT_FILENAME, aof)
+    handle_command(set_command(b"key", b"old"), datastore, persistence)
+    persistence.save(datastore)
+    persistence.close()
+    size = os.path.getsize(AOF_FILENAME)
+    os.remove(AOF_FILENAME)
+    value = b"x" * (size - len(set_command(b"new", b"").resp_encode()) - 1)
+    with open(AOF_FILENAME, mode="wb") as file:
+        file.write(set_command(b"new", value).resp_encode())
+    assert os.path.getsize(AOF_FILENAME) == size
+
+    restored = DataStore()
+    restore(restored, AOF_FILENAME, SNAPSHOT_FILENAME)
+    assert b"key" not in restored
+    assert restored[b"new"] == value
+
+
+def test_bgsave(cleanup):
+    datastore = DataStore()
+    persistence = SnapshotPersistence(SNAPSHOT_FILENAME)
+    handle_command(set_command(b"key", b"value"), datastore, persistence)
+    result = handle_command(Array([BulkString(b"bgsave")]), datastore, persistence)
+    assert result == SimpleString("Background saving started")
+    result = handle_command(Array([BulkString(b"bgsave")]), datastore, persistence)
+    assert result == Error("ERR Background save already in progress")
+    with pytest.raises(SaveInProgressError):
+        persistence.save(datastore)
+    while persistence.save_in_progress:
+        persistence.cron(datastore)
+        time.sleep(0.01)
+
+    assert persistence.dirty == 0
+    restored = DataStore()
+    load_snapshot(SNAPSHOT_FILENAME, restored)
+    assert restored[b"key"] == b"value"
+
+
+def test_bgsave_and_bgrewriteaof_do_not_run_together(cleanup):
+    datastore = DataStore()
+    aof = AppendOnlyFilePersistence(AOF_FILENAME)
+    persistence = SnapshotPersistence(SNAPSHOT_FILENAME, aof)
+    handle_command(set_command(b"key", b"value"), datastore, persistence)
+    bgsave = Array([BulkString(b"bgsave")])
+    bgrewriteaof = Array([BulkString(b"bgrewriteaof")])
+
+    handle_command(bgsave, datastore, persistence)
+    result = handle_command(bgrewriteaof, datastore, persistence)
+    assert result == SimpleString("Background append only file rewriting scheduled")
+    assert not aof.rewrite_in_progress
+    assert persistence.persistence_info()["aof_rewrite_scheduled"] == 1
+    while persistence.save_in_progress:
+        persistence.cron(datastore)
+        time.sleep(0.01)
+
+    assert aof.rewrite_in_progress
+    assert persistence.persistence_info()["aof_rewrite_scheduled"] == 0
+    result = handle_command(bgsave, datastore, persistence)
+    assert result == Error(
+        "ERR Another child process is active (AOF?): can't BGSAVE right now"
+    )
+    while aof.rewrite_in_progress:
+        persistence.cron(datastore)
+        time.sleep(0.01)
+    persistence.close()
+
+
+def test_save_rules_trigger_background_save(cleanup):
+    datastore = DataStore()
+    persistence = SnapshotPersistence(SNAPSHOT_FILENAME, save_rules=((0, 2),))
+    handle_command(set_command(b"key", b"value"), datastore, persistence)
+    persistence.cron(datastore)
+    assert not persistence.save_in_progress
+    handle_command(set_command(b"key", b"value"), datastore, persistence)
+    persistence.cron(datastore)
+    assert persistence.save_in_progress
+    while persistence.save_in_progress:
+        persistence.cron(datastore)
+        time.sleep(0.01)
+    assert os.path.exists(SNAPSHOT_FILENAME)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("", ()), ("3600 1 300 100", ((3600, 1), (300, 100)))],
+    ids=["disabled", "rules"],
+)
+def test_parse_save_rules(value, expected):
+    assert parse_save_rules(value) == expected
+
+
+@pytest.mark.parametrize("value", ["3600", "3600 one", "-1 1"])
+def test_parse_save_rules_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_save_rules(value)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [b"", b"-42", b"a" * 100, RedisList([b"%d" % i for i in range(300)])],
+    ids=["empty", "integer", "string", "list"],
+)
+def test_dump_value_round_trip(value):
+    assert load_value(dump_value(value)) == value
+
+
+def test_load_value_rejects_corrupted_payload():
+    payload = bytearray(dump_value(b"value"))
+    payload[1] ^= 0xFF
+    with pytest.raises(SnapshotError):
+        load_value(bytes(payload))
+    with pytest.raises(SnapshotError):
+        load_value(b"")
@@ -0,0 +1,132 @@
+import asyncio
+import sys
+import time
+
+import pytest
+
+from pyredis.__main__ import loop_lag_monitor
+from pyredis.stats import (
+    SLOWLOG_ENTRY_MAX_ARGC,
+    CommandStats,
+    LatencyMonitor,
+    ServerStats,
+    SlowLog,
+    latency_monitor,
+)
+
+
+def test_command_stats_buckets_by_power_of_two_usec():
+    stats = CommandStats()
+    for duration_ns in (500, 1500, 3000, 3500, 900_000):
+        stats.record(duration_ns)
+    assert stats.calls == 5
+    assert stats.usec == 908
+    assert stats.usec_per_call == pytest.approx(181.7)
+    assert stats.histogram() == [(1, 1), (2, 2), (4, 4), (1024, 5)]
+
+
+@pytest.mark.parametrize(
+    "percent, expected",
+    [(50, 2), (99, 2), (99.9, 1024), (1, 1)],
+    ids=["p50", "p99", "p999", "p1"],
+)
+def test_command_stats_percentiles(percent, expected):
+    stats = CommandStats()
+    for _ in range(60):
+        stats.record(1500)
+    for _ in range(39):
+        stats.record(500)
+    stats.record(1_000_000)
+    assert stats.percentile(percent) == expected
+
+
+def test_empty_command_stats():
+    stats = CommandStats()
+    assert stats.calls == 0
+    assert stats.usec_per_call == 0
+    assert stats.histogram() == []
+    assert stats.percentile(99) == 0
+
+
+def test_error_replies_are_counted_by_prefix():
+    stats = ServerStats()
+    stats.error_reply("ERR unknown command")
+    stats.error_reply("ERR syntax error")
+    stats.error_reply("WRONGTYPE Operation against a key")
+    assert stats.error_replies == {"ERR": 2, "WRONGTYPE": 1}
+    assert stats.total_error_replies == 3
+    stats.reset()
+    assert stats.total_error_replies == 0
+
+
+def test_slow_log_keeps_newest_entries_first():
+    slow_log = SlowLog(threshold_usec=0, max_len=2)
+    for i in range(3):
+        slow_log.add([b"GET", b"key%d" % i], 5000 + i, "127.0.0.1:5000")
+    assert len(slow_log) == 2
+    newest, oldest = slow_log.get()
+    assert (newest.id, newest.args, newest.duration_usec) == (2, (b"GET", b"key2"), 5)
+    assert oldest.client == "127.0.0.1:5000"
+    assert slow_log.get(1) == [newest]
+
+    slow_log.max_len = 1
+    assert slow_log.get() == [newest]
+    slow_log.reset()
+    assert len(slow_log) == 0
+
+
+def test_slow_log_truncates_long_commands():
+    slow_log = SlowLog()
+    slow_log.add([b"RPUSH", b"list", *[b"x" * 200] * 40], 1, "")
+    [entry] = slow_log.get()
+    assert len(entry.args) == SLOWLOG_ENTRY_MAX_ARGC
+    assert entry.args[-1] == b"... (11 more arguments)"
+    assert entry.args[2] == b"x" * 128 + b"... (72 more bytes)"
+
+
+@pytest.mark.parametrize(
+    "threshold_usec, threshold_ns",
+    [(10000, 10**7), (0, 0), (-1, sys.maxsize)],
+    ids=["default", "log everything", "disabled"],
+)
+def test_slow_log_threshold(threshold_usec, threshold_ns):
+    assert SlowLog(threshold_usec).threshold_ns == threshold_ns
+
+
+def test_latency_monitor_keeps_worst_sample_per_second():
+    monitor = LatencyMonitor(threshold_ms=10)
+    monitor.add_sample("expire-cycle", 5)
+    assert monitor.events == {}
+
+    monitor.add_sample("expire-cycle", 30)
+    monitor.add_sample("expire-cycle", 20)
+    event = monitor.events["expire-cycle"]
+    assert (event.latest_ms, event.max_ms) == (20, 30)
+    assert [latency for _, latency in event.history] == [30]
+
+    monitor.add_sample("aof-write", 15)
+    assert monitor.reset(["aof-write", "missing"]) == 1
+    assert monitor.reset() == 1
+    assert monitor.events == {}
+
+
+def test_latency_monitor_disabled():
+    monitor = LatencyMonitor(threshold_ms=0)
+    monitor.add_sample("command", 1000)
+    assert monitor.events == {}
+    with pytest.raises(ValueError):
+        monitor.threshold_ms = -1
+
+
+def test_loop_lag_monitor_records_blocked_loop():
+    async def block_loop():
+        task = asyncio.create_task(loop_lag_monitor(interval=0.01))
+        await asyncio.sleep(0.02)
+        time.sleep(0.15)
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    latency_monitor.reset()
+    asyncio.run(block_loop())
+    assert latency_monitor.events["event-loop-lag"].max_ms >= 100
+    latency_monitor.reset()
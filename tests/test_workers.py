@@ -0,0 +1,115 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+
+from pyredis.asyncserver import RedisServerProtocol
+from pyredis.datastore import DataStore
+from pyredis.persistence import NoPersistence
+from pyredis.resp_datatypes import Array, BulkString, Error, SimpleString
+from pyredis.workers import ShardRouter, plan_shards
+
+# b"bar" hashes to slot 5061, owned by worker 0; b"foo" to 12182, worker 1.
+LOCAL_KEY = b"bar"
+REMOTE_KEY = b"foo"
+
+
+def make_shards(tmp_path, workers=2):
+    shards = plan_shards(workers, "127.0.0.1", 7000, "ccdb.aof", "ccdb.snapshot")
+    return [
+        replace(shard, socket_path=str(tmp_path / f"worker-{shard.index}.sock"))
+        for shard in shards
+    ]
+
+
+def command(*args):
+    return Array([BulkString(arg) for arg in args])
+
+
+def test_plan_shards_covers_every_slot_once():
+    shards = plan_shards(3, "127.0.0.1", 7000, "ccdb.aof", "ccdb.snapshot")
+    assert [(shard.first_slot, shard.last_slot) for shard in shards] == [
+        (0, 5460),
+        (5461, 10921),
+        (10922, 16383),
+    ]
+    assert [shard.port for shard in shards] == [7001, 7002, 7003]
+    assert shards[2].aof_filename == "ccdb-2.aof"
+    with pytest.raises(ValueError):
+        plan_shards(0, "127.0.0.1", 7000, "ccdb.aof", "ccdb.snapshot")
+
+
+def test_router_runs_local_and_keyless_commands_here(tmp_path):
+    router = ShardRouter(make_shards(tmp_path), 0)
+    datastore = DataStore()
+    persistence = NoPersistence()
+    result = router.handle(command(b"set", LOCAL_KEY, b"1"), datastore, persistence)
+    assert result == SimpleString("OK")
+    assert router.handle(command(b"ping"), datastore, persistence) == SimpleString(
+        "PONG"
+    )
+    assert datastore[LOCAL_KEY] == b"1"
+
+
+def test_router_rejects_keys_on_several_workers(tmp_path):
+    router = ShardRouter(make_shards(tmp_path), 0)
+    result = router.handle(
+        command(b"mget", LOCAL_KEY, REMOTE_KEY), DataStore(), NoPersistence()
+    )
+    assert result == Error("CROSSSLOT Keys in request don't hash to the same slot")
+
+
+def test_router_redirects_in_cluster_compatible_mode(tmp_path):
+    router = ShardRouter(make_shards(tmp_path), 0, redirect=True)
+    result = router.handle(command(b"get", REMOTE_KEY), DataStore(), NoPersistence())
+    assert result == Error("MOVED 12182 127.0.0.1:7002")
+
+
+def test_commands_are_forwarded_to_the_owning_worker(tmp_path):
+    shards = make_shards(tmp_path)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        local = DataStore()
+        remote = DataStore()
+        remote_server = await loop.create_unix_server(
+            lambda: RedisServerProtocol(remote, NoPersistence()),
+            path=shards[1].socket_path,
+        )
+        router = ShardRouter(shards, 0)
+        server = await loop.create_server(
+            lambda: RedisServerProtocol(local, NoPersistence(), router=router),
+            "127.0.0.1",
+            0,
+        )
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            command(b"set", REMOTE_KEY, b"remote").resp_encode()
+            + command(b"set", LOCAL_KEY, b"local").resp_encode()
+            + command(b"get", REMOTE_KEY).resp_encode()
+            + command(b"get", LOCAL_KEY).resp_encode()
+        )
+        expected = b"+OK\r\n+OK\r\n$6\r\nremote\r\n$5\r\nlocal\r\n"
+        replies = await reader.readexactly(len(expected))
+        writer.close()
+        router.close()
+        server.close()
+        remote_server.close()
+        return replies, local, remote
+
+    replies, local, remote = asyncio.run(run())
+    assert replies == b"+OK\r\n+OK\r\n$6\r\nremote\r\n$5\r\nlocal\r\n"
+    assert remote[REMOTE_KEY] == b"remote"
+    assert REMOTE_KEY not in local
+
+
+def test_unavailable_worker(tmp_path):
+    router = ShardRouter(make_shards(tmp_path), 0)
+
+    async def run():
+        return await router.handle(
+            command(b"get", REMOTE_KEY), DataStore(), NoPersistence()
+        )
+
+    assert asyncio.run(run()) == Error("ERR worker 1 is unavailable")